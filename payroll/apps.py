@@ -39,8 +39,11 @@ DEFAULT_CONFIG = {
     "csv_reconciliation_code_column": "code",
     "csv_reconciliation_paid_yes": "Yes",
     "csv_reconciliation_paid_no": "No",
+    "csv_reconciliation_chunk_size": 10000,
+    "csv_reconciliation_spool_max_size": 10 * 1024 * 1024,
     "payroll_delete_event": "payroll.payroll_delete",
     "benefit_delete_event": "payroll.benefit_delete",
+    "benefit_batch_delete_event": "payroll.benefit_batch_delete",
 
     "gateway_base_url": "http://41.175.18.170:8070/api/mobile/v1/",
     "endpoint_payment": "mock/payment",
@@ -51,7 +54,21 @@ DEFAULT_CONFIG = {
     "payment_gateway_timeout": 5,
     "payment_gateway_auth_type": "basic",  # can be 'token' or 'basic'
     "payment_gateway_class": "payroll.payment_gateway.MockedPaymentGatewayConnector",
-    "receipt_length": 8
+    "receipt_length": 8,
+    "bulk_operation_chunk_size": 1000,
+    "parallel_benefit_generation": False,
+    "benefit_generation_shard_size": 5000,
+    "benefits_summary_cache_timeout": 300,
+    "async_task_completion": False,
+    "task_completion_execution_key_timeout": 86400,
+    "task_completion_lock_timeout": 300,
+    "gateway_callback_idempotency_timeout": 3600,
+    "gateway_callback_in_progress_timeout": 60,
+    "gateway_log_retention_days": 90,
+    "opensearch_bulk_index_chunk_size": 500,
+    "opensearch_bulk_refresh_threshold": 5000,
+    "payment_gateway_max_workers": 1,
+    "validation_error_max_ids": 20,
 }
 
 
@@ -79,8 +96,11 @@ class PayrollConfig(AppConfig):
     csv_reconciliation_code_column = None
     csv_reconciliation_paid_yes = None
     csv_reconciliation_paid_no = None
+    csv_reconciliation_chunk_size = None
+    csv_reconciliation_spool_max_size = None
     payroll_delete_event = None
     benefit_delete_event = None
+    benefit_batch_delete_event = None
 
     gateway_base_url = None
     endpoint_payment = None
@@ -91,7 +111,21 @@ class PayrollConfig(AppConfig):
     payment_gateway_timeout = None
     payment_gateway_auth_type = None
     payment_gateway_class = None
+    payment_gateway_max_workers = None
     receipt_length = None
+    bulk_operation_chunk_size = None
+    parallel_benefit_generation = None
+    benefit_generation_shard_size = None
+    benefits_summary_cache_timeout = None
+    async_task_completion = None
+    task_completion_execution_key_timeout = None
+    task_completion_lock_timeout = None
+    gateway_callback_idempotency_timeout = None
+    gateway_callback_in_progress_timeout = None
+    gateway_log_retention_days = None
+    opensearch_bulk_index_chunk_size = None
+    opensearch_bulk_refresh_threshold = None
+    validation_error_max_ids = None
 
     def ready(self):
         from core.models import ModuleConfiguration
@@ -99,6 +133,7 @@ class PayrollConfig(AppConfig):
         cfg = ModuleConfiguration.get_or_default(self.name, DEFAULT_CONFIG)
         self.__load_config(cfg)
         self.__register_filters_and_payment_methods()
+        self.__connect_payment_gateway_config_invalidation()
 
     @classmethod
     def __load_config(cls, cfg):
@@ -109,6 +144,15 @@ class PayrollConfig(AppConfig):
             if hasattr(PayrollConfig, field):
                 setattr(PayrollConfig, field, cfg[field])
 
+    @classmethod
+    def reload_config(cls):
+        """
+        Reload the config fields from the stored module configuration, used when the configuration changes at runtime
+        """
+        from core.models import ModuleConfiguration
+
+        cls.__load_config(ModuleConfiguration.get_or_default(cls.name, DEFAULT_CONFIG))
+
     def __register_filters_and_payment_methods(cls):
         from social_protection.custom_filters import BenefitPlanCustomFilterWizard
         CustomFilterRegistryPoint.register_custom_filters(
@@ -127,6 +171,21 @@ class PayrollConfig(AppConfig):
             ]
         )
 
+    def __connect_payment_gateway_config_invalidation(self):
+        from django.db.models.signals import post_save
+        from django.test.signals import setting_changed
+        from core.models import ModuleConfiguration
+        from payroll.payment_gateway.payment_gateway_config import invalidate_payment_gateway_configs
+        post_save.connect(
+            invalidate_payment_gateway_configs,
+            sender=ModuleConfiguration,
+            dispatch_uid='payroll_invalidate_payment_gateway_configs',
+        )
+        setting_changed.connect(
+            invalidate_payment_gateway_configs,
+            dispatch_uid='payroll_invalidate_payment_gateway_configs_on_setting_changed',
+        )
+
     @staticmethod
     def get_payroll_payment_file_path(payroll_id, file_name=None):
         if file_name:
@@ -6,6 +6,14 @@ is_unit_test_env = getattr(settings, 'IS_UNIT_TEST_ENV', False)
 # Check if the 'opensearch_reports' app is in INSTALLED_APPS
 if 'opensearch_reports' in apps.app_configs and not is_unit_test_env:
     from opensearch_reports.service import BaseSyncDocument
+    from django.db.models import Prefetch
+    from django.db.models.signals import post_init, post_save, pre_save
+    from payroll.indexing import (
+        DeferredIndexingMixin,
+        capture_payroll_index_changes,
+        remember_payroll_indexed_values,
+        update_related_payroll_fields,
+    )
     from django_opensearch_dsl import fields as opensearch_fields
     from django_opensearch_dsl.registries import registry
     from payroll.models import (
@@ -19,8 +27,48 @@ if 'opensearch_reports' in apps.app_configs and not is_unit_test_env:
     from individual.models import Individual
     from invoice.models import Bill
 
+    PAYMENT_PLAN_COLUMNS = ('code', 'name')
+    PAYMENT_CYCLE_COLUMNS = ('code', 'status', 'start_date', 'end_date')
+    INDIVIDUAL_COLUMNS = ('first_name', 'last_name', 'dob')
+    PAYROLL_COLUMNS = ('id', 'name', 'status', 'payment_method', 'date_created', 'payment_plan', 'payment_cycle')
+    BILL_COLUMNS = (
+        'code', 'code_ext', 'code_tp', 'status', 'currency_code', 'note', 'terms',
+        'date_created', 'date_due', 'date_payed', 'amount_total',
+    )
+    BENEFIT_COLUMNS = ('id', 'code', 'status', 'type', 'receipt', 'amount', 'photo', 'date_due', 'individual')
+
+    def _prefixed(prefix, columns):
+        return tuple(f'{prefix}__{column}' for column in columns)
+
+    def _payroll_columns(prefix=None):
+        columns = (
+            *PAYROLL_COLUMNS,
+            *_prefixed('payment_plan', PAYMENT_PLAN_COLUMNS),
+            *_prefixed('payment_cycle', PAYMENT_CYCLE_COLUMNS),
+        )
+        return _prefixed(prefix, columns) if prefix else columns
+
+    def _benefit_columns(prefix):
+        return _prefixed(prefix, (*BENEFIT_COLUMNS, *_prefixed('individual', INDIVIDUAL_COLUMNS)))
+
+    def _serialize_related(instance, columns):
+        if instance is None:
+            return None
+        return {column: getattr(instance, column) for column in columns}
+
+    def _serialize_payroll(payroll):
+        return {
+            'id': str(payroll.id),
+            'name': payroll.name,
+            'status': payroll.status,
+            'payment_method': payroll.payment_method,
+            'date_created': payroll.date_created,
+            'payment_plan': _serialize_related(payroll.payment_plan, PAYMENT_PLAN_COLUMNS),
+            'payment_cycle': _serialize_related(payroll.payment_cycle, PAYMENT_CYCLE_COLUMNS),
+        }
+
     @registry.register_document
-    class PayrollDocument(BaseSyncDocument):
+    class PayrollDocument(DeferredIndexingMixin, BaseSyncDocument):
         DASHBOARD_NAME = 'Payment'
 
         name = opensearch_fields.KeywordField()
@@ -54,6 +102,11 @@ if 'opensearch_reports' in apps.app_configs and not is_unit_test_env:
             related_models = [PaymentPlan, PaymentCycle]
             queryset_pagination = 5000
 
+        def get_queryset(self, *args, **kwargs):
+            return super().get_queryset(*args, **kwargs) \
+                .select_related('payment_plan', 'payment_cycle') \
+                .only(*_payroll_columns())
+
         def get_instances_from_related(self, related_instance):
             if isinstance(related_instance, PaymentPlan):
                 return Payroll.objects.filter(payment_plan=related_instance)
@@ -61,7 +114,7 @@ if 'opensearch_reports' in apps.app_configs and not is_unit_test_env:
                 return Payroll.objects.filter(payment_cycle=related_instance)
 
     @registry.register_document
-    class BenefitConsumptionDocument(BaseSyncDocument):
+    class BenefitConsumptionDocument(DeferredIndexingMixin, BaseSyncDocument):
         DASHBOARD_NAME = 'Payment'
 
         photo = opensearch_fields.KeywordField()
@@ -95,15 +148,21 @@ if 'opensearch_reports' in apps.app_configs and not is_unit_test_env:
             ]
             queryset_pagination = 5000
 
+        def get_queryset(self, *args, **kwargs):
+            return super().get_queryset(*args, **kwargs) \
+                .select_related('individual') \
+                .only(*BENEFIT_COLUMNS, 'date_created', 'json_ext', *_prefixed('individual', INDIVIDUAL_COLUMNS))
+
         def get_instances_from_related(self, related_instance):
             if isinstance(related_instance, Individual):
                 return BenefitConsumption.objects.filter(individual=related_instance)
 
     @registry.register_document
-    class PayrollBenefitConsumptionDocument(BaseSyncDocument):
+    class PayrollBenefitConsumptionDocument(DeferredIndexingMixin, BaseSyncDocument):
         DASHBOARD_NAME = 'Payment'
 
         payroll = opensearch_fields.ObjectField(properties={
+            'id': opensearch_fields.KeywordField(),
             'name': opensearch_fields.KeywordField(),
             'status': opensearch_fields.KeywordField(),
             'payment_method': opensearch_fields.KeywordField(),
@@ -152,14 +211,22 @@ if 'opensearch_reports' in apps.app_configs and not is_unit_test_env:
             ]
             queryset_pagination = 5000
 
+        def get_queryset(self, *args, **kwargs):
+            return super().get_queryset(*args, **kwargs) \
+                .select_related('payroll__payment_plan', 'payroll__payment_cycle', 'benefit__individual') \
+                .only('id', 'payroll', 'benefit', *_payroll_columns('payroll'), *_benefit_columns('benefit'))
+
         def get_instances_from_related(self, related_instance):
             if isinstance(related_instance, Payroll):
-                return PayrollBenefitConsumption.objects.filter(payroll=related_instance)
+                related = PayrollBenefitConsumption.objects.filter(payroll=related_instance)
+                if update_related_payroll_fields(self, related_instance, related):
+                    return None
+                return related
             elif isinstance(related_instance, BenefitConsumption):
                 return PayrollBenefitConsumption.objects.filter(benefit=related_instance)
 
     @registry.register_document
-    class BenefitAttachmentDocument(BaseSyncDocument):
+    class BenefitAttachmentDocument(DeferredIndexingMixin, BaseSyncDocument):
         DASHBOARD_NAME = 'Invoice'
 
         bill = opensearch_fields.ObjectField(properties={
@@ -190,6 +257,7 @@ if 'opensearch_reports' in apps.app_configs and not is_unit_test_env:
             })
         })
         payroll = opensearch_fields.NestedField(properties={
+            'id': opensearch_fields.KeywordField(),
             'name': opensearch_fields.KeywordField(),
             'status': opensearch_fields.KeywordField(),
             'payment_method': opensearch_fields.KeywordField(),
@@ -222,12 +290,38 @@ if 'opensearch_reports' in apps.app_configs and not is_unit_test_env:
             ]
             queryset_pagination = 5000
 
+        def get_queryset(self, *args, **kwargs):
+            payroll_links = PayrollBenefitConsumption.objects \
+                .filter(is_deleted=False) \
+                .select_related('payroll__payment_plan', 'payroll__payment_cycle') \
+                .only('id', 'is_deleted', 'benefit', 'payroll', *_payroll_columns('payroll'))
+            return super().get_queryset(*args, **kwargs) \
+                .select_related('bill', 'benefit__individual') \
+                .prefetch_related(Prefetch('benefit__payrollbenefitconsumption_set', queryset=payroll_links)) \
+                .only('id', 'bill', 'benefit', *_prefixed('bill', BILL_COLUMNS), *_benefit_columns('benefit'))
+
+        def prepare_payroll(self, instance):
+            return [
+                _serialize_payroll(payroll_link.payroll)
+                for payroll_link in instance.benefit.payrollbenefitconsumption_set.all()
+                if not payroll_link.is_deleted
+            ]
+
         def get_instances_from_related(self, related_instance):
             if isinstance(related_instance, Payroll):
-                return BenefitAttachment.objects.filter(
+                related = BenefitAttachment.objects.filter(
                     benefit__payrollbenefitconsumption__payroll=related_instance
                 )
+                if update_related_payroll_fields(self, related_instance, related, nested=True):
+                    return None
+                return related
             elif isinstance(related_instance, Bill):
                 return BenefitAttachment.objects.filter(bill=related_instance)
             elif isinstance(related_instance, BenefitConsumption):
                 return BenefitAttachment.objects.filter(benefit=related_instance)
+
+    post_init.connect(remember_payroll_indexed_values, sender=Payroll,
+                      dispatch_uid='payroll_remember_indexed_values')
+    post_save.connect(remember_payroll_indexed_values, sender=Payroll,
+                      dispatch_uid='payroll_remember_indexed_values_on_save')
+    pre_save.connect(capture_payroll_index_changes, sender=Payroll, dispatch_uid='payroll_capture_index_changes')
@@ -0,0 +1,60 @@
+from collections import defaultdict
+
+from promise import Promise
+from promise.dataloader import DataLoader
+
+from contribution_plan.models import PaymentPlan
+from payroll.models import BenefitAttachment, PayrollBenefitConsumption
+from social_protection.models import BenefitPlan
+
+
+def get_loader(info, loader_class):
+    """
+    Returns the instance of ``loader_class`` bound to the current request, so that all the nested
+    fields resolved within one query share the same batches.
+    """
+    loaders = getattr(info.context, '_payroll_loaders', None)
+    if loaders is None:
+        loaders = {}
+        setattr(info.context, '_payroll_loaders', loaders)
+    if loader_class not in loaders:
+        loaders[loader_class] = loader_class()
+    return loaders[loader_class]
+
+
+class BenefitConsumptionByPayrollLoader(DataLoader):
+    def batch_load_fn(self, payroll_ids):
+        links = PayrollBenefitConsumption.objects.filter(
+            payroll_id__in=payroll_ids,
+            is_deleted=False,
+            benefit__is_deleted=False,
+        ).select_related('benefit')
+        benefits = defaultdict(list)
+        for link in links:
+            benefits[link.payroll_id].append(link.benefit)
+        return Promise.resolve([benefits.get(payroll_id, []) for payroll_id in payroll_ids])
+
+
+class BenefitPlanNameCodeByPaymentPlanLoader(DataLoader):
+    def batch_load_fn(self, payment_plan_ids):
+        benefit_plan_ids = dict(
+            PaymentPlan.objects.filter(id__in=payment_plan_ids).values_list('id', 'benefit_plan_id')
+        )
+        benefit_plans = {
+            benefit_plan.id: f"{benefit_plan.code} - {benefit_plan.name}"
+            for benefit_plan in BenefitPlan.objects.filter(
+                id__in=set(benefit_plan_ids.values()),
+                is_deleted=False,
+            ).only('id', 'code', 'name')
+        }
+        return Promise.resolve([
+            benefit_plans.get(benefit_plan_ids.get(payment_plan_id)) for payment_plan_id in payment_plan_ids
+        ])
+
+
+class BenefitAttachmentByBenefitLoader(DataLoader):
+    def batch_load_fn(self, benefit_ids):
+        attachments = defaultdict(list)
+        for attachment in BenefitAttachment.objects.filter(benefit_id__in=benefit_ids, is_deleted=False):
+            attachments[attachment.benefit_id].append(attachment)
+        return Promise.resolve([attachments.get(benefit_id, []) for benefit_id in benefit_ids])
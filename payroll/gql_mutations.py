@@ -189,8 +189,9 @@ class DeletePayrollMutation(BaseHistoryModelDeleteMutationMixin, BaseMutation):
         ids = data.get('ids')
         if ids:
             with transaction.atomic():
-                for id in ids:
-                    service.delete({'id': id, 'user': user})
+                response = service.delete_bulk(ids)
+            if not response['success']:
+                return response
 
     class Input(DeletePayrollInputType):
         pass
@@ -218,8 +219,9 @@ class ClosePayrollMutation(BaseHistoryModelDeleteMutationMixin, BaseMutation):
         ids = data.get('ids')
         if ids:
             with transaction.atomic():
-                for id in ids:
-                    service.close_payroll({'id': id})
+                response = service.close_payroll_bulk(ids)
+            if not response['success']:
+                return response
 
     class Input(DeletePayrollInputType):
         pass
@@ -247,8 +249,9 @@ class MakePaymentForPayrollMutation(BaseHistoryModelDeleteMutationMixin, BaseMut
         ids = data.get('ids')
         if ids:
             with transaction.atomic():
-                for id in ids:
-                    service.make_payment_for_payroll({'id': id})
+                response = service.make_payment_for_payroll_bulk(ids)
+            if not response['success']:
+                return response
 
     class Input(DeletePayrollInputType):
         pass
@@ -276,8 +279,9 @@ class RejectPayrollMutation(BaseHistoryModelDeleteMutationMixin, BaseMutation):
         ids = data.get('ids')
         if ids:
             with transaction.atomic():
-                for id in ids:
-                    service.reject_approved_payroll({'id': id})
+                response = service.reject_approved_payroll_bulk(ids)
+            if not response['success']:
+                return response
 
     class Input(DeletePayrollInputType):
         pass
@@ -305,8 +309,12 @@ class DeleteBenefitConsumptionMutation(BaseHistoryModelDeleteMutationMixin, Base
         ids = data.get('ids')
         if ids:
             with transaction.atomic():
-                for id in ids:
-                    service.delete({'id': id})
+                if len(ids) > 1:
+                    response = service.delete_batch(ids)
+                else:
+                    response = service.delete_bulk(ids)
+                if not response['success']:
+                    return response
 
     class Input(DeletePayrollInputType):
         pass
@@ -0,0 +1,103 @@
+import json
+
+import graphene
+from django.db import connections
+from graphene.relay import PageInfo
+from graphene_django.utils import maybe_queryset
+from graphql.error import GraphQLError
+from graphql_relay.utils import base64, unbase64
+
+from core.data_masking import anonymize_gql
+from core.schema import OrderedDjangoFilterConnectionField
+
+KEYSET_CURSOR_PREFIX = 'keyset:'
+
+
+class TotalCountModeEnum(graphene.Enum):
+    EXACT = 'exact'
+    APPROXIMATE = 'approximate'
+    SKIP = 'skip'
+
+
+class KeysetDjangoFilterConnectionField(OrderedDjangoFilterConnectionField):
+    """
+    Connection field supporting keyset pagination next to the default offset based one.
+    With ``keyset: true`` the rows are ordered by primary key and the ``after`` cursor holds the key of the last
+    row seen, so every page is an index range scan regardless of its depth. ``totalCountMode`` allows to skip
+    the total count or to replace it with the planner estimate. Keyset pages only go forward, ``last`` and
+    ``before`` are rejected.
+    """
+
+    def __init__(self, type, *args, **kwargs):
+        kwargs.setdefault('keyset', graphene.Boolean())
+        kwargs.setdefault('totalCountMode', TotalCountModeEnum())
+        super().__init__(type, *args, **kwargs)
+
+    @classmethod
+    def resolve_connection(cls, connection, args, iterable, max_limit=None, user=None):
+        if not args.get('keyset'):
+            return super().resolve_connection(connection, args, iterable, max_limit=max_limit, user=user)
+        return cls._resolve_keyset_connection(connection, args, iterable, max_limit=max_limit, user=user)
+
+    @classmethod
+    @anonymize_gql()
+    def _resolve_keyset_connection(cls, connection, args, iterable, max_limit=None, user=None):
+        if args.get('last') or args.get('before'):
+            raise GraphQLError("'last' and 'before' are not supported with keyset pagination, use 'first' and 'after'")
+
+        queryset = maybe_queryset(iterable).order_by('id')
+        after = args.get('after')
+        if after:
+            queryset = queryset.filter(id__gt=cls._get_key_from_cursor(after))
+
+        first = args.get('first') or max_limit
+        rows = list(queryset[:first + 1]) if first else list(queryset)
+        has_next_page = bool(first) and len(rows) > first
+        rows = rows[:first] if first else rows
+
+        edges = [connection.Edge(node=row, cursor=cls._get_cursor(row)) for row in rows]
+        page_info = PageInfo(
+            start_cursor=edges[0].cursor if edges else None,
+            end_cursor=edges[-1].cursor if edges else None,
+            has_previous_page=bool(after),
+            has_next_page=has_next_page,
+        )
+        resolved = connection(edges=edges, page_info=page_info)
+        resolved.iterable = queryset
+        resolved.length = cls._get_total_count(maybe_queryset(iterable), args.get('totalCountMode'))
+        return resolved
+
+    @staticmethod
+    def _get_cursor(row):
+        return base64(f'{KEYSET_CURSOR_PREFIX}{row.id}')
+
+    @staticmethod
+    def _get_key_from_cursor(cursor):
+        key = unbase64(cursor)
+        if not key.startswith(KEYSET_CURSOR_PREFIX):
+            raise GraphQLError(f"Invalid keyset cursor: {cursor}")
+        return key[len(KEYSET_CURSOR_PREFIX):]
+
+    @staticmethod
+    def _get_total_count(queryset, total_count_mode):
+        if total_count_mode == TotalCountModeEnum.SKIP.value:
+            return None
+        if total_count_mode == TotalCountModeEnum.APPROXIMATE.value:
+            return estimate_count(queryset)
+        return queryset.count()
+
+
+def estimate_count(queryset):
+    """
+    Returns the planner row estimate of ``queryset`` on PostgreSQL, the exact count on other databases.
+    """
+    connection = connections[queryset.db]
+    if connection.vendor != 'postgresql':
+        return queryset.count()
+    sql, params = queryset.order_by().query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]['Plan']['Plan Rows'])
@@ -10,7 +10,8 @@ from payroll.models import PaymentPoint, Payroll, BenefitConsumption, \
     PayrollBenefitConsumption, BenefitAttachment, CsvReconciliationUpload
 from contribution_plan.gql import PaymentPlanGQLType
 from payment_cycle.gql_queries import PaymentCycleGQLType
-from social_protection.models import BenefitPlan
+from payroll.gql_loaders import get_loader, BenefitAttachmentByBenefitLoader, BenefitConsumptionByPayrollLoader, \
+    BenefitPlanNameCodeByPaymentPlanLoader
 
 
 class PaymentPointGQLType(DjangoObjectType):
@@ -81,10 +82,7 @@ class BenefitConsumptionGQLType(DjangoObjectType):
         connection_class = ExtendedConnection
 
     def resolve_benefit_attachment(self, info):
-        return BenefitAttachment.objects.filter(
-            benefit_id=self.id,
-            is_deleted=False
-        )
+        return get_loader(info, BenefitAttachmentByBenefitLoader).load(self.id)
 
 
 class PayrollGQLType(DjangoObjectType):
@@ -114,13 +112,12 @@ class PayrollGQLType(DjangoObjectType):
         connection_class = ExtendedConnection
 
     def resolve_benefit_consumption(self, info):
-        return BenefitConsumption.objects.filter(payrollbenefitconsumption__payroll__id=self.id,
-                                                 is_deleted=False,
-                                                 payrollbenefitconsumption__is_deleted=False)
+        return get_loader(info, BenefitConsumptionByPayrollLoader).load(self.id)
 
     def resolve_benefit_plan_name_code(self, info):
-        benefit_plan = BenefitPlan.objects.get(id=self.payment_plan.benefit_plan.id, is_deleted=False)
-        return f"{benefit_plan.code} - {benefit_plan.name}"
+        if not self.payment_plan_id:
+            return None
+        return get_loader(info, BenefitPlanNameCodeByPaymentPlanLoader).load(self.payment_plan_id)
 
 
 class PaymentMethodGQLType(graphene.ObjectType):
@@ -195,6 +192,21 @@ class PayrollBenefitConsumptionGQLType(DjangoObjectType):
         connection_class = ExtendedConnection
 
 
+class BenefitStatusSummaryGQLType(graphene.ObjectType):
+    status = graphene.String()
+    count = graphene.Int()
+    amount = graphene.String()
+
+
+class BenefitsSummaryGroupGQLType(graphene.ObjectType):
+    group_id = graphene.String()
+    total_amount_received = graphene.String()
+    total_amount_due = graphene.String()
+    statuses = graphene.List(BenefitStatusSummaryGQLType)
+
+
 class BenefitsSummaryGQLType(graphene.ObjectType):
     total_amount_received = graphene.String()
     total_amount_due = graphene.String()
+    statuses = graphene.List(BenefitStatusSummaryGQLType)
+    groups = graphene.List(BenefitsSummaryGroupGQLType)
@@ -0,0 +1,229 @@
+import logging
+import threading
+from collections import defaultdict
+from contextlib import contextmanager
+
+from django.apps import apps
+from django.conf import settings
+from django.db import transaction
+from django.db.models import QuerySet
+
+from payroll.apps import PayrollConfig
+from payroll.utils import chunked_iterable
+
+logger = logging.getLogger(__name__)
+
+_state = threading.local()
+# names of the indices known to map the payroll id used by the partial updates
+_payroll_id_mapped_indices = set()
+
+# payroll fields denormalized into the related documents that can be updated in place
+PAYROLL_PARTIAL_UPDATE_FIELDS = ('name', 'status', 'payment_method')
+# other denormalized payroll fields, a change of those requires a full reindex of the related documents
+PAYROLL_FULL_REINDEX_FIELDS = ('payment_plan_id', 'payment_cycle_id', 'date_created')
+
+_PAYROLL_PARTIAL_UPDATE_SCRIPT = """
+def payrolls = ctx._source.payroll instanceof List ? ctx._source.payroll : [ctx._source.payroll];
+for (payroll in payrolls) {
+    if (payroll != null && payroll.id == params.payroll_id) {
+        payroll.putAll(params.changes);
+    }
+}
+"""
+
+
+def is_indexing_enabled():
+    return 'opensearch_reports' in apps.app_configs and not getattr(settings, 'IS_UNIT_TEST_ENV', False)
+
+
+def is_indexing_deferred():
+    return getattr(_state, 'pending', None) is not None
+
+
+@contextmanager
+def deferred_indexing():
+    """
+    Collect the ids of the documents changed within the block instead of indexing them on every save.
+    The collected ids are bulk indexed by a celery worker once the surrounding transaction is committed.
+    Nested blocks are merged into the outermost one. Can also be used as a decorator.
+    """
+    if is_indexing_deferred():
+        yield
+        return
+    _state.pending = defaultdict(set)
+    try:
+        yield
+    except Exception:
+        _state.pending = None
+        raise
+    pending, _state.pending = _state.pending, None
+    _schedule_flush(pending)
+
+
+def register_for_indexing(model, ids):
+    """
+    Register ``model`` rows for bulk indexing, used by bulk updates that do not send model signals.
+    """
+    if not is_indexing_enabled():
+        return
+    if is_indexing_deferred():
+        _state.pending[model._meta.label].update(str(pk) for pk in ids)
+    else:
+        _schedule_flush({model._meta.label: {str(pk) for pk in ids}})
+
+
+def bulk_index(pending, chunk_size=None):
+    """
+    Index the rows of a deferred batch, ``pending`` maps the models to the ids of their changed rows, in every
+    document registered for the models, through the bulk API in chunks. The refresh of an index is disabled once
+    for the whole batch when it receives at least ``opensearch_bulk_refresh_threshold`` documents, smaller batches
+    keep the refresh interval untouched. Every index is refreshed once at the end.
+    """
+    chunk_size = chunk_size or PayrollConfig.opensearch_bulk_index_chunk_size
+    documents = [
+        (document_class(), ids)
+        for model, ids in pending.items()
+        for document_class in _get_document_classes(model)
+    ]
+    indices = {}
+    sizes = defaultdict(int)
+    for document, ids in documents:
+        indices[document._index._name] = document._index
+        sizes[document._index._name] += len(ids)
+    refresh_disabled = [
+        index for name, index in indices.items() if sizes[name] >= PayrollConfig.opensearch_bulk_refresh_threshold
+    ]
+    for index in refresh_disabled:
+        index.put_settings(body={'index': {'refresh_interval': '-1'}})
+    try:
+        for document, ids in documents:
+            for chunk in chunked_iterable(ids, chunk_size):
+                document.update(document.get_queryset().filter(pk__in=chunk), 'index', refresh=False)
+    finally:
+        for index in refresh_disabled:
+            index.put_settings(body={'index': {'refresh_interval': None}})
+        for index in indices.values():
+            index.refresh()
+
+
+def _get_document_classes(model):
+    from django_opensearch_dsl.registries import registry
+
+    return registry.get_documents(models=[model])
+
+
+def remember_payroll_indexed_values(sender, instance, **kwargs):
+    """
+    post_init and post_save receiver keeping on the payroll the loaded values of its denormalized fields,
+    compared by ``capture_payroll_index_changes`` instead of reading the stored row again.
+    Deferred fields are not loaded, their values are read from the database on save.
+    """
+    instance._indexed_values = {
+        field: instance.__dict__[field]
+        for field in (*PAYROLL_PARTIAL_UPDATE_FIELDS, *PAYROLL_FULL_REINDEX_FIELDS)
+        if field in instance.__dict__
+    }
+
+
+def capture_payroll_index_changes(sender, instance, **kwargs):
+    """
+    pre_save receiver storing on the payroll which of its denormalized fields are changed by the save.
+    ``None`` means the changes are unknown or need a full reindex of the related documents.
+    """
+    instance._index_changes = None
+    if instance._state.adding or not instance.pk:
+        return
+    previous = getattr(instance, '_indexed_values', {})
+    if len(previous) < len(PAYROLL_PARTIAL_UPDATE_FIELDS) + len(PAYROLL_FULL_REINDEX_FIELDS):
+        previous = sender.objects.filter(pk=instance.pk).values(
+            *PAYROLL_PARTIAL_UPDATE_FIELDS, *PAYROLL_FULL_REINDEX_FIELDS
+        ).first()
+        if previous is None:
+            return
+    if any(previous[field] != getattr(instance, field) for field in PAYROLL_FULL_REINDEX_FIELDS):
+        return
+    instance._index_changes = {
+        field: getattr(instance, field)
+        for field in PAYROLL_PARTIAL_UPDATE_FIELDS
+        if previous[field] != getattr(instance, field)
+    }
+
+
+def update_related_payroll_fields(document, payroll, related_queryset, nested=False):
+    """
+    Apply the changed payroll fields to the documents embedding the payroll with a single update by query,
+    ``nested`` tells whether the payroll is mapped as a nested field of the document.
+    Returns False when the related documents have to be reindexed in full: the changes are unknown, the index
+    does not map the payroll id yet, or the update did not reach every document of ``related_queryset``.
+    """
+    changes = getattr(payroll, '_index_changes', None)
+    if changes is None:
+        return False
+    if not changes:
+        return True
+    if not _is_payroll_id_mapped(document):
+        logger.warning(f"The {document._index._name} index does not map payroll.id, reindexing in full, "
+                       f"rebuild the index to enable partial updates")
+        return False
+    payroll_id = str(payroll.id)
+    term = {'term': {'payroll.id': payroll_id}}
+    query = {'nested': {'path': 'payroll', 'query': term}} if nested else term
+    try:
+        response = document._index.updateByQuery() \
+            .update_from_dict({'query': query}) \
+            .script(source=_PAYROLL_PARTIAL_UPDATE_SCRIPT, params={'payroll_id': payroll_id, 'changes': changes}) \
+            .params(conflicts='proceed') \
+            .execute()
+    except Exception as exc:
+        logger.warning(f"Partial update of the {document._index._name} index failed, reindexing in full",
+                       exc_info=exc)
+        return False
+    expected = related_queryset.count()
+    if response.updated != expected:
+        logger.warning(f"Partial update of the {document._index._name} index updated {response.updated} "
+                       f"of {expected} documents, reindexing in full")
+        return False
+    return True
+
+
+def _is_payroll_id_mapped(document):
+    # only positive results are remembered, the field does not disappear from an index once mapped
+    index_name = document._index._name
+    if index_name in _payroll_id_mapped_indices:
+        return True
+    try:
+        mappings = document._index.get_field_mapping(fields='payroll.id')
+    except Exception as exc:
+        logger.warning(f"Could not read the {index_name} index mapping", exc_info=exc)
+        return False
+    if any(index_mapping.get('mappings') for index_mapping in mappings.values()):
+        _payroll_id_mapped_indices.add(index_name)
+        return True
+    return False
+
+
+class DeferredIndexingMixin:
+    """
+    Document mixin registering the indexed objects for a bulk flush while a deferred_indexing block is active.
+    Deletions are always applied immediately since the objects will not exist anymore at flush time.
+    """
+
+    def update(self, thing, *args, **kwargs):
+        action = args[0] if args else kwargs.get('action', 'index')
+        if not is_indexing_deferred() or action == 'delete':
+            return super().update(thing, *args, **kwargs)
+        if isinstance(thing, QuerySet):
+            ids = thing.values_list('pk', flat=True)
+        elif isinstance(thing, (list, tuple, set)):
+            ids = [instance.pk for instance in thing]
+        else:
+            ids = [thing.pk]
+        _state.pending[self.Django.model._meta.label].update(str(pk) for pk in ids)
+
+
+def _schedule_flush(pending):
+    pending = {model_label: list(ids) for model_label, ids in pending.items() if ids}
+    if not pending:
+        return
+    from payroll.tasks import flush_deferred_index
+    transaction.on_commit(lambda: flush_deferred_index.delay(pending))
@@ -0,0 +1,49 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from payroll.models import BenefitConsumption, BenefitConsumptionStatus, Payroll, PayrollBenefitConsumption
+
+
+class Command(BaseCommand):
+    help = "Print the query plans and timings of the hot payroll benefit queries for a given payroll."
+
+    def add_arguments(self, parser):
+        parser.add_argument('payroll_id', help="Id of the payroll used in the benchmarked queries.")
+        parser.add_argument('--repeat', type=int, default=5, help="Number of timed executions of every query.")
+        parser.add_argument('--analyze', action='store_true', help="Run EXPLAIN ANALYZE (PostgreSQL only).")
+
+    def handle(self, *args, **options):
+        payroll = Payroll.objects.filter(id=options['payroll_id']).first()
+        if not payroll:
+            raise CommandError(f"Payroll {options['payroll_id']} not found")
+
+        sample = BenefitConsumption.objects.filter(payrollbenefitconsumption__payroll=payroll).first()
+        queries = {
+            'payroll links': PayrollBenefitConsumption.objects.filter(payroll=payroll, is_deleted=False),
+            'benefits attached to payroll': BenefitConsumption.objects.filter(
+                payrollbenefitconsumption__payroll_id=payroll.id,
+                is_deleted=False,
+                status=BenefitConsumptionStatus.ACCEPTED,
+                payrollbenefitconsumption__is_deleted=False,
+            ),
+            'benefits by status': BenefitConsumption.objects.filter(
+                status=BenefitConsumptionStatus.APPROVE_FOR_PAYMENT, is_deleted=False
+            ),
+            'benefit by code': BenefitConsumption.objects.filter(
+                code=sample.code if sample else '', is_deleted=False
+            ),
+            'benefit by receipt': BenefitConsumption.objects.filter(receipt=sample.receipt if sample else ''),
+        }
+        explain_options = {'analyze': True} if options['analyze'] else {}
+        for name, queryset in queries.items():
+            timings = []
+            for __ in range(options['repeat']):
+                start = time.perf_counter()
+                list(queryset.values_list('id', flat=True))
+                timings.append((time.perf_counter() - start) * 1000)
+            self.stdout.write(self.style.MIGRATE_HEADING(
+                f"{name}: best {min(timings):.2f} ms, avg {sum(timings) / len(timings):.2f} ms"
+            ))
+            self.stdout.write(queryset.explain(**explain_options))
+            self.stdout.write('')
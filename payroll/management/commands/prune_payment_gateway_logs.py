@@ -0,0 +1,31 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from payroll.apps import PayrollConfig
+from payroll.services import PaymentGatewayLogService
+
+
+class Command(BaseCommand):
+    help = "Delete payment gateway logs and callbacks older than the retention period."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=None,
+            help="Retention period in days, defaults to the gateway_log_retention_days configuration.",
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=None,
+            help="Number of rows deleted per statement, defaults to the bulk_operation_chunk_size configuration.",
+        )
+
+    def handle(self, *args, **options):
+        days = options.get('days') or PayrollConfig.gateway_log_retention_days
+        older_than = timezone.now() - timedelta(days=days)
+        removed = PaymentGatewayLogService.prune(older_than, options.get('chunk_size'))
+        self.stdout.write(self.style.SUCCESS(f"Removed {removed} payment gateway log(s) older than {days} day(s)."))
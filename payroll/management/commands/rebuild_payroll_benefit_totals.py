@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from payroll.services import PayrollBenefitTotalsService
+
+
+class Command(BaseCommand):
+    help = "Recompute the denormalized benefit totals of payrolls from their benefits."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--payroll',
+            dest='payroll_ids',
+            action='append',
+            help="Id of the payroll to rebuild, can be repeated. All payrolls are rebuilt by default.",
+        )
+
+    def handle(self, *args, **options):
+        payroll_ids = options.get('payroll_ids')
+        PayrollBenefitTotalsService.rebuild(payroll_ids)
+        scope = f"{len(payroll_ids)} payroll(s)" if payroll_ids else "all payrolls"
+        self.stdout.write(self.style.SUCCESS(f"Benefit totals rebuilt for {scope}."))
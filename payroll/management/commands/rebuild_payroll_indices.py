@@ -0,0 +1,214 @@
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from payroll.indexing import is_indexing_enabled
+from payroll.utils import chunked_iterable
+
+# rows saved shortly before the rebuild start are caught up too, the application servers clocks may drift
+CATCH_UP_MARGIN = timedelta(minutes=1)
+
+
+def _init_worker():
+    """
+    Open fresh connections in a worker process, the OpenSearch clients and database connections inherited
+    from the parent process share its sockets.
+    """
+    from opensearchpy.connection.connections import connections as opensearch_connections
+
+    connections.close_all()
+    for alias, connection_settings in getattr(settings, 'OPENSEARCH_DSL', {}).items():
+        opensearch_connections.create_connection(alias, **connection_settings)
+
+
+def _index_id_range(document_path, index_name, start_id, end_id, chunk_size):
+    """
+    Index the rows of the document model with ``start_id <= id < end_id`` into ``index_name``.
+    Runs in a worker process started with ``_init_worker``.
+    """
+    from opensearchpy.helpers import bulk
+
+    document = import_string(document_path)()
+    # the document querysets load the serialized relations with the rows
+    queryset = document.get_queryset().filter(id__gte=start_id).order_by('id')
+    if end_id is not None:
+        queryset = queryset.filter(id__lt=end_id)
+    actions = (
+        {
+            '_op_type': 'index',
+            '_index': index_name,
+            '_id': document.generate_id(instance),
+            '_source': document.prepare(instance),
+        } for instance in queryset.iterator(chunk_size=chunk_size)
+    )
+    indexed, __ = bulk(document._get_connection(), actions, chunk_size=chunk_size, refresh=False)
+    return indexed
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuild the payroll OpenSearch indices in parallel into fresh indices and swap their aliases. "
+        "Rows saved while a new index is built are written to the previous index, they are indexed again "
+        "into the new index by their date_updated before and after the alias swap. Rows deleted from the "
+        "database and documents changed only through a related row (e.g. a renamed payroll) during the rebuild "
+        "are not caught up, rebuild outside of payroll processing or rebuild again."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--index',
+            dest='index_names',
+            action='append',
+            help="Name of the payroll index to rebuild, can be repeated. All payroll indices are rebuilt by default.",
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=os.cpu_count(),
+            help="Number of worker processes.",
+        )
+        parser.add_argument(
+            '--range-size',
+            type=int,
+            default=5000,
+            help="Number of rows indexed by a worker per id range.",
+        )
+        parser.add_argument(
+            '--keep-old',
+            action='store_true',
+            help="Keep the previous indices after the alias swap.",
+        )
+        parser.add_argument(
+            '--replace-index',
+            action='store_true',
+            help="Delete a concrete index named like the alias instead of failing, the index is replaced by the alias.",
+        )
+
+    def handle(self, *args, **options):
+        if not is_indexing_enabled():
+            raise CommandError("OpenSearch indexing is not enabled, the opensearch_reports module is not installed.")
+        for document_class in self._get_document_classes(options.get('index_names')):
+            self._rebuild(
+                document_class, options['workers'], options['range_size'], options['keep_old'],
+                options['replace_index']
+            )
+
+    def _get_document_classes(self, index_names):
+        from django_opensearch_dsl.registries import registry
+
+        document_classes = [
+            document_class for document_class in registry.get_documents()
+            if document_class.Django.model._meta.app_label == 'payroll'
+            and (not index_names or document_class._index._name in index_names)
+        ]
+        if not document_classes:
+            raise CommandError(f"No payroll index found for {index_names}")
+        return document_classes
+
+    def _rebuild(self, document_class, workers, range_size, keep_old, replace_index):
+        document = document_class()
+        alias = document._index._name
+        client = document._get_connection()
+        is_alias = client.indices.exists_alias(name=alias)
+        if not is_alias and client.indices.exists(index=alias) and not replace_index:
+            raise CommandError(
+                f"{alias} is a concrete index and not an alias, use --replace-index to replace it by an alias"
+            )
+        index_name = f"{alias}-{timezone.now().strftime('%Y%m%d%H%M%S')}"
+
+        new_index = document._index.clone(name=index_name)
+        new_index.settings(refresh_interval='-1')
+        new_index.create()
+
+        rebuild_start = timezone.now() - CATCH_UP_MARGIN
+        ranges = self._get_id_ranges(document, range_size)
+        document_path = f"{document_class.__module__}.{document_class.__name__}"
+        self.stdout.write(f"Rebuilding {alias} into {index_name} with {len(ranges)} range(s)")
+
+        # forked workers must not share the connections of the parent process
+        connections.close_all()
+        indexed = 0
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as executor:
+            futures = [
+                executor.submit(_index_id_range, document_path, index_name, start_id, end_id, range_size)
+                for start_id, end_id in ranges
+            ]
+            for future in as_completed(futures):
+                indexed += future.result()
+
+        client.indices.put_settings(index=index_name, body={'index': {'refresh_interval': None}})
+        # the signals still write to the previous index until the alias is swapped, the rows saved meanwhile
+        # are caught up before the swap, those saved during the catch up once the alias points to the new index
+        swap_start = timezone.now() - CATCH_UP_MARGIN
+        caught_up = self._catch_up(document, client, index_name, rebuild_start, range_size)
+        client.indices.refresh(index=index_name)
+        old_indices = self._swap_alias(client, alias, index_name, is_alias)
+        caught_up += self._catch_up(document, client, index_name, swap_start, range_size)
+        if caught_up:
+            self.stdout.write(f"Caught up {caught_up} document(s) changed during the rebuild of {alias}")
+        if not keep_old:
+            for old_index in old_indices:
+                client.indices.delete(index=old_index)
+        self.stdout.write(self.style.SUCCESS(f"Indexed {indexed} document(s) into {index_name}, aliased as {alias}"))
+
+    def _catch_up(self, document, client, index_name, since, chunk_size):
+        """
+        Index again the rows of the document model updated since ``since`` and remove the documents of the rows
+        that left the document queryset meanwhile.
+        """
+        from opensearchpy.helpers import bulk
+
+        changed_ids = document.Django.model.objects.filter(date_updated__gte=since) \
+            .order_by('id').values_list('id', flat=True)
+        count = 0
+        for chunk in chunked_iterable(changed_ids.iterator(chunk_size=chunk_size), chunk_size):
+            instances = list(document.get_queryset().filter(id__in=chunk))
+            indexed_ids = {str(instance.pk) for instance in instances}
+            actions = [
+                {
+                    '_op_type': 'index',
+                    '_index': index_name,
+                    '_id': document.generate_id(instance),
+                    '_source': document.prepare(instance),
+                } for instance in instances
+            ] + [
+                {'_op_type': 'delete', '_index': index_name, '_id': str(row_id)}
+                for row_id in chunk if str(row_id) not in indexed_ids
+            ]
+            succeeded, errors = bulk(client, actions, chunk_size=chunk_size, refresh=False, raise_on_error=False)
+            # removing a document that was not indexed is not an error
+            errors = [error for error in errors if error.get('delete', {}).get('status') != 404]
+            if errors:
+                raise CommandError(f"Could not catch up {len(errors)} document(s) of {index_name}: {errors[:3]}")
+            count += len(actions)
+        return count
+
+    def _get_id_ranges(self, document, range_size):
+        # keyset boundaries, every worker reads its range with an index range scan instead of an offset,
+        # the boundaries are found by stepping over the id index, only one id per range is fetched
+        ids = document.get_queryset().order_by('id').values_list('id', flat=True)
+        boundary = ids.first()
+        boundaries = []
+        while boundary is not None:
+            boundaries.append(str(boundary))
+            boundary = ids.filter(id__gt=boundary)[range_size - 1:range_size].first()
+        return list(zip(boundaries, boundaries[1:] + [None]))
+
+    def _swap_alias(self, client, alias, index_name, is_alias):
+        actions = []
+        old_indices = []
+        if is_alias:
+            old_indices = list(client.indices.get_alias(name=alias).keys())
+            actions += [{'remove': {'index': old_index, 'alias': alias}} for old_index in old_indices]
+        elif client.indices.exists(index=alias):
+            # the index was created without an alias, it is replaced by the alias atomically (--replace-index)
+            actions.append({'remove_index': {'index': alias}})
+        actions.append({'add': {'index': index_name, 'alias': alias}})
+        client.indices.update_aliases(body={'actions': actions})
+        return old_indices
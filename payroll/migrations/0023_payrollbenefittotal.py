@@ -0,0 +1,45 @@
+from django.db import migrations, models
+from django.db.models import Count, Sum
+import django.db.models.deletion
+
+
+def populate_payroll_benefit_totals(apps, schema_editor):
+    payroll_benefit_total_model = apps.get_model('payroll', 'PayrollBenefitTotal')
+    payroll_benefit_consumption_model = apps.get_model('payroll', 'PayrollBenefitConsumption')
+    rows = payroll_benefit_consumption_model.objects.filter(
+        is_deleted=False,
+        benefit__is_deleted=False,
+    ).values('payroll_id', 'benefit__status').annotate(benefit_count=Count('id'), total_amount=Sum('benefit__amount'))
+    payroll_benefit_total_model.objects.bulk_create([
+        payroll_benefit_total_model(
+            payroll_id=row['payroll_id'],
+            status=row['benefit__status'],
+            benefit_count=row['benefit_count'],
+            total_amount=row['total_amount'] or 0,
+        ) for row in rows
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payroll', '0022_alter_csvreconciliationupload_user_created_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PayrollBenefitTotal',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('ACCEPTED', 'ACCEPTED'), ('CREATED', 'CREATED'), ('APPROVE_FOR_PAYMENT', 'APPROVE_FOR_PAYMENT'), ('REJECTED', 'REJECTED'), ('DUPLICATE', 'DUPLICATE'), ('RECONCILED', 'RECONCILED'), ('PENDING_DELETION', 'PENDING_DELETION')], max_length=100)),
+                ('benefit_count', models.IntegerField(default=0)),
+                ('total_amount', models.DecimalField(decimal_places=2, default=0, max_digits=18)),
+                ('payroll', models.ForeignKey(on_delete=django.db.models.deletion.DO_NOTHING, related_name='benefit_totals', to='payroll.payroll')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='payrollbenefittotal',
+            constraint=models.UniqueConstraint(fields=('payroll', 'status'), name='payroll_benefit_total_payroll_status_unique'),
+        ),
+        migrations.RunPython(populate_payroll_benefit_totals, migrations.RunPython.noop),
+    ]
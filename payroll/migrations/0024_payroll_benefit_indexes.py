@@ -0,0 +1,31 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payroll', '0023_payrollbenefittotal'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='benefitconsumption',
+            index=models.Index(fields=['status', 'is_deleted'], name='bc_status_deleted_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='benefitconsumption',
+            index=models.Index(condition=models.Q(is_deleted=False), fields=['code'], name='bc_code_active_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='benefitconsumption',
+            index=models.Index(condition=models.Q(receipt__isnull=False), fields=['receipt'], name='bc_receipt_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='payrollbenefitconsumption',
+            index=models.Index(fields=['payroll', 'is_deleted'], name='pbc_payroll_deleted_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='payrollbenefitconsumption',
+            index=models.Index(fields=['benefit', 'is_deleted'], name='pbc_benefit_deleted_idx'),
+        ),
+    ]
@@ -0,0 +1,28 @@
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payroll', '0024_payroll_benefit_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PaymentGatewayCallback',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('invoice_id', models.CharField(max_length=255)),
+                ('success', models.BooleanField()),
+                ('response', models.JSONField(blank=True, default=dict)),
+                ('date_received', models.DateTimeField(auto_now_add=True)),
+                ('benefit', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.DO_NOTHING, to='payroll.benefitconsumption')),
+                ('payroll', models.ForeignKey(on_delete=django.db.models.deletion.DO_NOTHING, related_name='gateway_callbacks', to='payroll.payroll')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='paymentgatewaycallback',
+            index=models.Index(fields=['payroll', 'date_received'], name='pgc_payroll_received_idx'),
+        ),
+    ]
@@ -0,0 +1,33 @@
+import django.core.serializers.json
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payroll', '0025_paymentgatewaycallback'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PaymentGatewayLog',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('operation', models.CharField(choices=[('PAYMENT', 'Payment'), ('CALLBACK', 'Callback'), ('RECONCILIATION', 'Reconciliation')], max_length=50)),
+                ('success', models.BooleanField(blank=True, null=True)),
+                ('response', models.JSONField(blank=True, default=dict, encoder=django.core.serializers.json.DjangoJSONEncoder)),
+                ('date_created', models.DateTimeField(auto_now_add=True, db_index=True)),
+                ('benefit', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.DO_NOTHING, to='payroll.benefitconsumption')),
+                ('payroll', models.ForeignKey(on_delete=django.db.models.deletion.DO_NOTHING, related_name='gateway_logs', to='payroll.payroll')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='paymentgatewaylog',
+            index=models.Index(fields=['payroll', 'date_created'], name='pgl_payroll_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='paymentgatewaylog',
+            index=models.Index(fields=['benefit', 'date_created'], name='pgl_benefit_created_idx'),
+        ),
+    ]
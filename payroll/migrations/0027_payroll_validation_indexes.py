@@ -0,0 +1,19 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payroll', '0026_paymentgatewaylog'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='payroll',
+            index=models.Index(condition=models.Q(is_deleted=False), fields=['name'], name='payroll_name_active_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='payrollbill',
+            index=models.Index(fields=['bill', 'is_deleted'], name='payroll_bill_bill_deleted_idx'),
+        ),
+    ]
@@ -1,3 +1,4 @@
+from django.core.serializers.json import DjangoJSONEncoder
 from django.db import models
 from django.utils.translation import gettext as _
 
@@ -46,12 +47,22 @@ class Payroll(HistoryBusinessModel):
     def __str__(self):
         return f"Payroll {self.name} - {self.uuid}"
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['name'], name='payroll_name_active_idx', condition=models.Q(is_deleted=False)),
+        ]
+
 
 class PayrollBill(HistoryModel):
     # 1:n it is ensured by the service
     payroll = models.ForeignKey(Payroll, on_delete=models.DO_NOTHING)
     bill = models.ForeignKey(Bill, on_delete=models.DO_NOTHING)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['bill', 'is_deleted'], name='payroll_bill_bill_deleted_idx'),
+        ]
+
 
 class PaymentAdaptorHistory(HistoryModel):
     payroll = models.ForeignKey(Payroll, on_delete=models.DO_NOTHING)
@@ -74,6 +85,13 @@ class BenefitConsumption(HistoryBusinessModel):
     def __str__(self):
         return f"Benefit Consumption {self.code} - {self.receipt} - {self.amount}"
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'is_deleted'], name='bc_status_deleted_idx'),
+            models.Index(fields=['code'], name='bc_code_active_idx', condition=models.Q(is_deleted=False)),
+            models.Index(fields=['receipt'], name='bc_receipt_idx', condition=models.Q(receipt__isnull=False)),
+        ]
+
 
 class BenefitAttachment(HistoryBusinessModel):
     benefit = models.ForeignKey(BenefitConsumption, on_delete=models.DO_NOTHING)
@@ -85,6 +103,61 @@ class PayrollBenefitConsumption(HistoryModel):
     payroll = models.ForeignKey(Payroll, on_delete=models.DO_NOTHING)
     benefit = models.ForeignKey(BenefitConsumption, on_delete=models.DO_NOTHING)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['payroll', 'is_deleted'], name='pbc_payroll_deleted_idx'),
+            models.Index(fields=['benefit', 'is_deleted'], name='pbc_benefit_deleted_idx'),
+        ]
+
+
+class PayrollBenefitTotal(models.Model):
+    # denormalized totals of the payroll benefits per status, maintained by PayrollBenefitTotalsService
+    payroll = models.ForeignKey(Payroll, on_delete=models.DO_NOTHING, related_name='benefit_totals')
+    status = models.CharField(max_length=100, choices=BenefitConsumptionStatus.choices, null=False)
+    benefit_count = models.IntegerField(default=0)
+    total_amount = models.DecimalField(max_digits=18, decimal_places=2, default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['payroll', 'status'], name='payroll_benefit_total_payroll_status_unique'),
+        ]
+
+
+class PaymentGatewayCallback(models.Model):
+    # append-only log of invoice results received from payment gateways, written in bulk
+    payroll = models.ForeignKey(Payroll, on_delete=models.DO_NOTHING, related_name='gateway_callbacks')
+    benefit = models.ForeignKey(BenefitConsumption, on_delete=models.DO_NOTHING, null=True, blank=True)
+    invoice_id = models.CharField(max_length=255)
+    success = models.BooleanField()
+    response = models.JSONField(blank=True, default=dict)
+    date_received = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['payroll', 'date_received'], name='pgc_payroll_received_idx'),
+        ]
+
+
+class PaymentGatewayLog(models.Model):
+    # append-only log of payment gateway interactions, kept out of the payroll and benefit json_ext
+    class Operation(models.TextChoices):
+        PAYMENT = 'PAYMENT', _('Payment')
+        CALLBACK = 'CALLBACK', _('Callback')
+        RECONCILIATION = 'RECONCILIATION', _('Reconciliation')
+
+    payroll = models.ForeignKey(Payroll, on_delete=models.DO_NOTHING, related_name='gateway_logs')
+    benefit = models.ForeignKey(BenefitConsumption, on_delete=models.DO_NOTHING, null=True, blank=True)
+    operation = models.CharField(max_length=50, choices=Operation.choices)
+    success = models.BooleanField(null=True, blank=True)
+    response = models.JSONField(blank=True, default=dict, encoder=DjangoJSONEncoder)
+    date_created = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['payroll', 'date_created'], name='pgl_payroll_created_idx'),
+            models.Index(fields=['benefit', 'date_created'], name='pgl_benefit_created_idx'),
+        ]
+
 
 class CsvReconciliationUpload(HistoryModel):
     class Status(models.TextChoices):
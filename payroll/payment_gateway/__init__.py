@@ -3,3 +3,4 @@
 from payroll.payment_gateway.payment_gateway_connector import PaymentGatewayConnector
 from payroll.payment_gateway.mocked_payment_gateway_connector import MockedPaymentGatewayConnector
 from payroll.payment_gateway.payment_gateway_config import PaymentGatewayConfig
+from payroll.payment_gateway.payment_gateway_router import PaymentGatewayRouter
@@ -1,6 +1,11 @@
+import base64
 import importlib
+import threading
+import uuid
+from functools import cached_property
 
 from django.conf import settings
+from django.core.cache import cache
 from payroll.apps import PayrollConfig
 
 
@@ -8,41 +13,111 @@ class PaymentGatewayConfig:
     """
     Configuration handler for payment gateway integrations.
     Supports payment point specific configurations with fallback to global settings.
+
+    Instances are immutable, use `for_payment_point` or `for_gateway` to get the memoized configuration
+    of a payment point or of a gateway routed to by the payment point (see PaymentGatewayRouter).
+    The memoized configurations are dropped by `invalidate`, called when the gateway settings change. The
+    invalidation bumps a version stored in the shared cache, other processes drop their configurations and reload
+    the PayrollConfig values on their next lookup, see `sync`.
     """
-    def __init__(self, payment_point=None):
-        # Load gateway configuration based on payment point if provided
-        gateway_config = self._get_gateway_config(payment_point)
-
-        self.gateway_base_url = gateway_config.get('gateway_base_url', PayrollConfig.gateway_base_url)
-        self.endpoint_payment = gateway_config.get('endpoint_payment', PayrollConfig.endpoint_payment)
-        self.endpoint_reconciliation = gateway_config.get('endpoint_reconciliation', PayrollConfig.endpoint_reconciliation)
-        self.auth_type = gateway_config.get('payment_gateway_auth_type', PayrollConfig.payment_gateway_auth_type)
-        self.api_key = gateway_config.get('payment_gateway_api_key', PayrollConfig.payment_gateway_api_key)
-        self.basic_auth_username = gateway_config.get('payment_gateway_basic_auth_username', PayrollConfig.payment_gateway_basic_auth_username)
-        self.basic_auth_password = gateway_config.get('payment_gateway_basic_auth_password', PayrollConfig.payment_gateway_basic_auth_password)
-        self.timeout = gateway_config.get('payment_gateway_timeout', PayrollConfig.payment_gateway_timeout)
-
-        # Payment gateway connector implementation class
-        self.payment_gateway_class = gateway_config.get('payment_gateway_class', PayrollConfig.payment_gateway_class)
-
-    def _get_gateway_config(self, payment_point):
+    VERSION_CACHE_KEY = 'payroll_payment_gateway_config_version'
+
+    _configs = {}
+    _configs_lock = threading.Lock()
+    _version = None
+
+    def __init__(self, payment_point=None, gateway_name=None):
+        # Load gateway configuration based on payment point or gateway name if provided
+        gateway_config = self._get_gateway_config(gateway_name or (payment_point.name if payment_point else None))
+
+        values = {
+            'gateway_base_url': gateway_config.get('gateway_base_url', PayrollConfig.gateway_base_url),
+            'endpoint_payment': gateway_config.get('endpoint_payment', PayrollConfig.endpoint_payment),
+            'endpoint_reconciliation': gateway_config.get(
+                'endpoint_reconciliation', PayrollConfig.endpoint_reconciliation),
+            'auth_type': gateway_config.get('payment_gateway_auth_type', PayrollConfig.payment_gateway_auth_type),
+            'api_key': gateway_config.get('payment_gateway_api_key', PayrollConfig.payment_gateway_api_key),
+            'basic_auth_username': gateway_config.get(
+                'payment_gateway_basic_auth_username', PayrollConfig.payment_gateway_basic_auth_username),
+            'basic_auth_password': gateway_config.get(
+                'payment_gateway_basic_auth_password', PayrollConfig.payment_gateway_basic_auth_password),
+            'timeout': gateway_config.get('payment_gateway_timeout', PayrollConfig.payment_gateway_timeout),
+            # Payment gateway connector implementation class
+            'payment_gateway_class': gateway_config.get(
+                'payment_gateway_class', PayrollConfig.payment_gateway_class),
+            # maximum number of concurrent requests sent to the gateway
+            'max_workers': gateway_config.get('payment_gateway_max_workers', PayrollConfig.payment_gateway_max_workers),
+            # rules routing benefits to other gateways, see PaymentGatewayRouter
+            'routes': tuple(gateway_config.get('routes', ())),
+        }
+        for name, value in values.items():
+            object.__setattr__(self, name, value)
+        object.__setattr__(self, '_headers', self._build_headers())
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"{self.__class__.__name__} is immutable")
+
+    @classmethod
+    def for_payment_point(cls, payment_point=None):
+        return cls.for_gateway(payment_point.name if payment_point else None)
+
+    @classmethod
+    def for_gateway(cls, gateway_name=None):
+        cls.sync()
+        config = cls._configs.get(gateway_name)
+        if config is None:
+            with cls._configs_lock:
+                config = cls._configs.get(gateway_name)
+                if config is None:
+                    config = cls(gateway_name=gateway_name)
+                    cls._configs[gateway_name] = config
+        return config
+
+    @classmethod
+    def invalidate(cls):
+        """
+        Drop the memoized configurations of all processes, the PayrollConfig values are reloaded by each of them.
+        """
+        version = uuid.uuid4().hex
+        cache.set(cls.VERSION_CACHE_KEY, version, None)
+        cls._apply_version(version)
+
+    @classmethod
+    def sync(cls):
         """
-        Retrieve the gateway configuration for a specific payment point.
+        Drop the memoized configurations and connectors if another process invalidated them.
+        """
+        version = cache.get(cls.VERSION_CACHE_KEY)
+        if version != cls._version:
+            cls._apply_version(version)
+
+    @classmethod
+    def _apply_version(cls, version):
+        with cls._configs_lock:
+            if version == cls._version and version is not None:
+                return
+            PayrollConfig.reload_config()
+            cls._configs.clear()
+            _reset_payment_gateways()
+            cls._version = version
+
+    def _get_gateway_config(self, gateway_name):
         """
-        if not payment_point:
+        Retrieve the gateway configuration for a specific payment point or gateway name.
+        """
+        if not gateway_name:
             return {}
 
         payment_gateways = getattr(settings, 'PAYMENT_GATEWAYS', {})
-        return payment_gateways.get(payment_point.name, {})
+        return payment_gateways.get(gateway_name, {})
 
-    def get_headers(self):
+    def _build_headers(self):
         if self.auth_type == 'token':
             return {
                 'Authorization': f'Bearer {self.api_key}',
                 'Content-Type': 'application/json',
             }
         elif self.auth_type == 'basic':
-            import base64
             auth_str = f"{self.basic_auth_username}:{self.basic_auth_password}"
             auth_bytes = auth_str.encode('utf-8')
             auth_base64 = base64.b64encode(auth_bytes).decode('utf-8')
@@ -55,13 +130,39 @@ class PaymentGatewayConfig:
                 'Content-Type': 'application/json',
             }
 
-    def get_payment_gateway_connector(self):
+    def get_headers(self):
+        return dict(self._headers)
+
+    @cached_property
+    def _payment_gateway_connector(self):
         module_name, class_name = self.payment_gateway_class.rsplit('.', 1)
         module = importlib.import_module(module_name)
         return getattr(module, class_name)
 
+    def get_payment_gateway_connector(self):
+        return self._payment_gateway_connector
+
     def get_payment_endpoint(self):
         return self.endpoint_payment
 
     def get_reconciliation_endpoint(self):
         return self.endpoint_reconciliation
+
+
+def invalidate_payment_gateway_configs(**kwargs):
+    """
+    Receiver reloading the PayrollConfig values and dropping the memoized gateway configurations and the connectors
+    built from them, in this process and, through the cached version, in the other ones.
+    """
+    if kwargs.get('setting') not in (None, 'PAYMENT_GATEWAYS'):
+        return
+    instance = kwargs.get('instance')
+    if instance is not None and getattr(instance, 'module', None) != PayrollConfig.name:
+        return
+    PaymentGatewayConfig.invalidate()
+
+
+def _reset_payment_gateways():
+    from payroll.payments_registry import PaymentMethodStorage
+    for payment_method in PaymentMethodStorage.get_all_available_payment_methods():
+        payment_method['class_reference'].reset_payment_gateways()
@@ -1,4 +1,6 @@
 import logging
+import threading
+
 import requests
 from payroll.payment_gateway.payment_gateway_config import PaymentGatewayConfig
 
@@ -6,10 +8,25 @@ logger = logging.getLogger(__name__)
 
 
 class PaymentGatewayConnector:
-    def __init__(self, payment_point=None):
-        self.config = PaymentGatewayConfig(payment_point)
-        self.session = requests.Session()
-        self.session.headers.update(self.config.get_headers())
+    def __init__(self, payment_point=None, gateway_name=None):
+        if gateway_name:
+            self.config = PaymentGatewayConfig.for_gateway(gateway_name)
+        else:
+            self.config = PaymentGatewayConfig.for_payment_point(payment_point)
+        # connectors are shared by the threads dispatching to the gateways, requests sessions are not thread safe
+        self._local = threading.local()
+
+    @property
+    def session(self):
+        """
+        HTTP session of the calling thread, its connections are reused by the later requests of the thread.
+        """
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            session = requests.Session()
+            session.headers.update(self.config.get_headers())
+            self._local.session = session
+        return session
 
     def send_request(self, endpoint, payload):
         url = f'{self.config.gateway_base_url}{endpoint}'
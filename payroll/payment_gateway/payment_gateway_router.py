@@ -0,0 +1,74 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from payroll.payment_gateway.payment_gateway_config import PaymentGatewayConfig
+
+logger = logging.getLogger(__name__)
+
+
+class PaymentGatewayRouter:
+    """
+    Routes the benefits of a payroll to the payment gateways configured for its payment point.
+
+    The `routes` of the payment point configuration are evaluated in order, each route sends the benefits matching
+    its `filters` (Django lookups on BenefitConsumption) to the `gateway` configured under the same name
+    in PAYMENT_GATEWAYS. Benefits not matched by any route use the gateway of the payment point.
+    The gateways are called concurrently, every gateway with at most `payment_gateway_max_workers` parallel requests.
+    Only the gateway calls run in worker threads, the results are returned to the caller to be stored.
+    """
+    DEFAULT_GATEWAY = None
+
+    def __init__(self, payment_point, get_connector):
+        """
+        :param payment_point: payment point of the payroll, or None for the global gateway configuration
+        :param get_connector: callable returning the connector for a gateway name, None being the default gateway
+        """
+        self.payment_point = payment_point
+        self.config = PaymentGatewayConfig.for_payment_point(payment_point)
+        self.get_connector = get_connector
+
+    def partition(self, benefits):
+        """
+        Split the benefits queryset into lists of benefits per gateway name, keeping the queryset order.
+        """
+        gateway_by_benefit = {}
+        for route in self.config.routes:
+            matched_ids = benefits.filter(**route.get('filters', {})).values_list('id', flat=True)
+            for benefit_id in matched_ids:
+                gateway_by_benefit.setdefault(benefit_id, route['gateway'])
+        partitions = {}
+        for benefit in benefits:
+            gateway = gateway_by_benefit.get(benefit.id, self.DEFAULT_GATEWAY)
+            partitions.setdefault(gateway, []).append(benefit)
+        return partitions
+
+    def dispatch(self, partitions, operation):
+        """
+        Call ``operation`` ('send_payment' or 'reconcile') of the gateway connector for every benefit.
+        Returns the list of (benefit, result) pairs.
+        """
+        if not partitions:
+            return []
+        with ThreadPoolExecutor(max_workers=len(partitions)) as executor:
+            futures = [
+                executor.submit(self._dispatch_to_gateway, gateway, benefits, operation)
+                for gateway, benefits in partitions.items()
+            ]
+            return [result for future in futures for result in future.result()]
+
+    def _dispatch_to_gateway(self, gateway, benefits, operation):
+        connector = self.get_connector(gateway)
+        call = getattr(connector, operation)
+        max_workers = self._get_gateway_config(gateway).max_workers or 1
+        logger.debug(f"Dispatching {len(benefits)} benefits to gateway {gateway or 'default'} "
+                     f"with {max_workers} worker(s)")
+        if max_workers == 1:
+            return [(benefit, call(benefit.code, benefit.amount)) for benefit in benefits]
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            results = executor.map(lambda benefit: call(benefit.code, benefit.amount), benefits)
+            return list(zip(benefits, results))
+
+    def _get_gateway_config(self, gateway):
+        if gateway is self.DEFAULT_GATEWAY:
+            return self.config
+        return PaymentGatewayConfig.for_gateway(gateway)
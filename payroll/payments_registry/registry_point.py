@@ -15,9 +15,16 @@ class PaymentsMethodRegistryPoint:
     REGISTERED_PAYMENT_METHODS:
     A dictionary that collects registered implementations of payments method.
     The structure of the dictionary is as follows:
+    {
+        "<payment method name>": {
+            "class_reference": <payment method implementation>,
+            "name": "<payment method name>"
+        }
+    }
+    Registering a payment method under an already registered name replaces the previous entry.
     """
 
-    REGISTERED_PAYMENT_METHODS = []
+    REGISTERED_PAYMENT_METHODS = {}
 
     @classmethod
     def register_payment_method(
@@ -43,7 +50,10 @@ class PaymentsMethodRegistryPoint:
         cls,
         strategy_payment_method_class: StrategyOfPaymentInterface
     ) -> None:
-        cls.REGISTERED_PAYMENT_METHODS.append({
+        name = strategy_payment_method_class.__class__.__name__
+        if name in cls.REGISTERED_PAYMENT_METHODS:
+            logger.debug(f"Payment method {name} already registered, replacing the previous registration")
+        cls.REGISTERED_PAYMENT_METHODS[name] = {
             "class_reference": strategy_payment_method_class,
-            "name": strategy_payment_method_class.__class__.__name__
-        })
+            "name": name
+        }
@@ -11,12 +11,24 @@ class PaymentMethodStorage:
 
     @classmethod
     def get_all_available_payment_methods(cls) -> List[StrategyOfPaymentInterface]:
-        return PaymentsMethodRegistryPoint.REGISTERED_PAYMENT_METHODS
+        return list(PaymentsMethodRegistryPoint.REGISTERED_PAYMENT_METHODS.values())
 
     @classmethod
     def get_chosen_payment_method(cls, payment_method_name: str) -> StrategyOfPaymentInterface:
-        chosen_method = None
-        for method_info in PaymentsMethodRegistryPoint.REGISTERED_PAYMENT_METHODS:
-            if method_info['name'] == payment_method_name:
-                chosen_method = method_info['class_reference']
-        return chosen_method
+        method_info = PaymentsMethodRegistryPoint.REGISTERED_PAYMENT_METHODS.get(payment_method_name)
+        return method_info['class_reference'] if method_info else None
+
+    @classmethod
+    def get_chosen_payment_method_with_gateway(
+        cls,
+        payment_method_name: str,
+        payment_point=None
+    ) -> StrategyOfPaymentInterface:
+        """
+        Resolve the payment method and initialize its payment gateway for the given payment point.
+        Gateway connectors are cached by the strategy, so repeated calls reuse the same connector.
+        """
+        strategy = cls.get_chosen_payment_method(payment_method_name)
+        if strategy:
+            strategy.initialize_payment_gateway(payment_point)
+        return strategy
@@ -2,7 +2,7 @@ import graphene
 import graphene_django_optimizer as gql_optimizer
 from gettext import gettext as _
 from django.contrib.auth.models import AnonymousUser
-from django.db.models import Q, Sum
+from django.db.models import Q
 
 from core.schema import OrderedDjangoFilterConnectionField
 from core.services import wait_for_mutation
@@ -14,15 +14,17 @@ from payroll.apps import PayrollConfig
 from payroll.gql_mutations import CreatePaymentPointMutation, UpdatePaymentPointMutation, DeletePaymentPointMutation, \
     CreatePayrollMutation, DeletePayrollMutation, ClosePayrollMutation, \
     RejectPayrollMutation, MakePaymentForPayrollMutation, DeleteBenefitConsumptionMutation
+from payroll.gql_pagination import KeysetDjangoFilterConnectionField
 from payroll.gql_queries import BenefitConsumptionGQLType, PaymentPointGQLType, \
     PayrollGQLType, PaymentMethodGQLType, \
     PaymentMethodListGQLType, BenefitAttachmentListGQLType, \
     CsvReconciliationUploadGQLType, PayrollBenefitConsumptionGQLType, \
-    PaymentGatewayConfigGQLType, BenefitsSummaryGQLType
+    PaymentGatewayConfigGQLType, BenefitsSummaryGQLType, BenefitsSummaryGroupGQLType, BenefitStatusSummaryGQLType
 from payroll.models import PaymentPoint, Payroll, \
     BenefitConsumption, BenefitAttachment, \
     CsvReconciliationUpload, PayrollBenefitConsumption, BenefitConsumptionStatus
 from payroll.payments_registry import PaymentMethodStorage
+from payroll.services import BenefitsSummaryService
 from social_protection.models import BenefitPlan
 
 
@@ -68,7 +70,7 @@ class Query(graphene.ObjectType):
         PaymentGatewayConfigGQLType,
     )
 
-    benefit_consumption_by_payroll = OrderedDjangoFilterConnectionField(
+    benefit_consumption_by_payroll = KeysetDjangoFilterConnectionField(
         BenefitConsumptionGQLType,
         orderBy=graphene.List(of_type=graphene.String),
         dateValidFrom__Gte=graphene.DateTime(),
@@ -94,7 +96,7 @@ class Query(graphene.ObjectType):
         orderBy=graphene.List(of_type=graphene.String),
     )
 
-    payroll_benefit_consumption = OrderedDjangoFilterConnectionField(
+    payroll_benefit_consumption = KeysetDjangoFilterConnectionField(
         PayrollBenefitConsumptionGQLType,
         orderBy=graphene.List(of_type=graphene.String),
         dateValidFrom__Gte=graphene.DateTime(),
@@ -111,6 +113,7 @@ class Query(graphene.ObjectType):
         payrollId=graphene.String(),
         benefitPlanUuid=graphene.String(),
         paymentCycleUuid=graphene.String(),
+        groupBy=graphene.String(),
     )
 
     def resolve_bill_by_payroll(self, info, **kwargs):
@@ -260,42 +263,37 @@ class Query(graphene.ObjectType):
     def resolve_benefits_summary(self, info, **kwargs):
         Query._check_permissions(info.context.user,
                                  PayrollConfig.gql_payroll_search_perms)
-        filters = append_validity_filter(**kwargs)
-        individual_id = kwargs.get("individualId", None)
-        payroll_id = kwargs.get("payrollId", None)
-        benefit_plan_uuid = kwargs.get("benefitPlanUuid", None)
-        payment_cycle_uuid = kwargs.get("paymentCycleUuid", None)
-
-        if individual_id:
-            filters.append(Q(individual__id=individual_id))
-
-        if payroll_id:
-            filters.append(Q(payrollbenefitconsumption__payroll_id=payroll_id))
-
-        if benefit_plan_uuid:
-            filters.append(Q(payrollbenefitconsumption__payroll__payment_plan__benefit_plan_id=benefit_plan_uuid))
-
-        if payment_cycle_uuid:
-            filters.append(Q(payrollbenefitconsumption__payroll__payment_cycle_id=payment_cycle_uuid))
-
-        amount_received = BenefitConsumption.objects.filter(
-            *filters,
-            is_deleted=False,
-            payrollbenefitconsumption__is_deleted=False,
-            status=BenefitConsumptionStatus.RECONCILED
-        ).aggregate(total_received=Sum('amount'))['total_received'] or 0
-
-        amount_due = BenefitConsumption.objects.filter(
-            *filters,
-            is_deleted=False,
-            payrollbenefitconsumption__is_deleted=False
-        ).exclude(status=BenefitConsumptionStatus.RECONCILED).aggregate(total_due=Sum('amount'))['total_due'] or 0
-
+        group_by = kwargs.get("groupBy", None)
+        if group_by and group_by not in BenefitsSummaryService.GROUP_BY_FIELDS:
+            raise ValueError(_("payroll.benefits_summary.invalid_group_by") % {'group_by': group_by})
+
+        summary = BenefitsSummaryService.get_summary(
+            validity_filters=append_validity_filter(**kwargs),
+            individual_id=kwargs.get("individualId", None),
+            payroll_id=kwargs.get("payrollId", None),
+            benefit_plan_uuid=kwargs.get("benefitPlanUuid", None),
+            payment_cycle_uuid=kwargs.get("paymentCycleUuid", None),
+            group_by=group_by,
+            cache_key_data=kwargs,
+        )
         return BenefitsSummaryGQLType(
-            total_amount_received=amount_received,
-            total_amount_due=amount_due,
+            total_amount_received=summary['total_amount_received'],
+            total_amount_due=summary['total_amount_due'],
+            statuses=Query._build_benefit_status_summaries(summary['statuses']),
+            groups=[
+                BenefitsSummaryGroupGQLType(
+                    group_id=group['group_id'],
+                    total_amount_received=group['total_amount_received'],
+                    total_amount_due=group['total_amount_due'],
+                    statuses=Query._build_benefit_status_summaries(group['statuses']),
+                ) for group in summary['groups']
+            ],
         )
 
+    @staticmethod
+    def _build_benefit_status_summaries(statuses):
+        return [BenefitStatusSummaryGQLType(**status) for status in statuses]
+
     @staticmethod
     def _build_payment_method_options(payment_methods):
         gql_payment_methods = []
@@ -1,10 +1,19 @@
+import hashlib
+import json
 import logging
+import uuid
+
 import pandas as pd
+from celery import group
+from decimal import Decimal, InvalidOperation
 from io import BytesIO
+from tempfile import SpooledTemporaryFile
 
 from django.contrib.contenttypes.models import ContentType
-from django.db import transaction
-from django.db.models import Q
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Max, Q, Sum
 from django.utils.translation import gettext as _
 
 from core import datetime
@@ -12,31 +21,78 @@ from core.custom_filters import CustomFilterWizardStorage
 from core.models import InteractiveUser
 from core.services import BaseService
 from core.signals import register_service_signal
+from core.utils import DefaultStorageFileHandler
 from invoice.models import Bill, PaymentInvoice, DetailPaymentInvoice
 from invoice.services import PaymentInvoiceService
 from payment_cycle.models import PaymentCycle
 from payroll.apps import PayrollConfig
+from payroll.indexing import deferred_indexing
 from payroll.models import (
     PaymentPoint,
     Payroll,
     PayrollBenefitConsumption,
     BenefitConsumption,
     BenefitAttachment,
-    BenefitConsumptionStatus
+    BenefitConsumptionStatus,
+    PayrollBenefitTotal,
+    PaymentGatewayCallback,
+    PaymentGatewayLog
 )
-from payroll.tasks import send_requests_to_gateway_payment
+from payroll.payments_registry import PaymentMethodStorage
+from payroll.tasks import send_requests_to_gateway_payment, dispatch_benefit_generation_shards
+from payroll.utils import chunked_iterable, update_in_chunks_with_history
 from payroll.validation import PaymentPointValidation, PayrollValidation, BenefitConsumptionValidation
 from calculation.services import get_calculation_object
-from core.services.utils import output_exception, check_authentication
+from core.services.utils import output_exception, output_result_success, check_authentication
 from contribution_plan.models import PaymentPlan
 from social_protection.models import Beneficiary, BeneficiaryStatus
 from tasks_management.apps import TasksManagementConfig
-from tasks_management.models import Task
+from tasks_management.models import Task, TaskGroup
 from tasks_management.services import TaskService, _get_std_task_data_payload
 
 logger = logging.getLogger(__name__)
 
 
+class BulkTaskService:
+    """
+    Create one task per entity with a single bulk insert (and bulk history) instead of TaskService.create per entity.
+    The task group of the source is assigned as TaskService.create does. Receivers of ``task_service.create``
+    are not called for these tasks, the ``payroll_service.bulk_create_tasks`` signal is sent once per call instead,
+    its result is the list of created tasks.
+    """
+
+    def __init__(self, user):
+        self.user = user
+
+    @register_service_signal('payroll_service.bulk_create_tasks')
+    def create_tasks(self, entities, source, business_event, data_builder):
+        """
+        ``data_builder`` returns the task data for the given entity.
+        """
+        task_group = TaskGroup.objects.filter(json_ext__contains={"task_sources": [source]}).first()
+        now = datetime.datetime.now()
+        tasks = [
+            Task(
+                # bulk_create bypasses HistoryModel.save, the primary key and audit fields have to be set here
+                id=uuid.uuid4(),
+                source=source,
+                entity=entity,
+                task_group=task_group,
+                status=Task.Status.ACCEPTED if task_group else Task.Status.RECEIVED,
+                executor_action_event=TasksManagementConfig.default_executor_event,
+                business_event=business_event,
+                data=_get_std_task_data_payload(data_builder(entity)),
+                user_created=self.user,
+                user_updated=self.user,
+                date_created=now,
+                date_updated=now,
+            ) for entity in entities
+        ]
+        Task.objects.bulk_create(tasks, batch_size=PayrollConfig.bulk_operation_chunk_size)
+        Task.history.bulk_history_create(tasks, default_user=self.user)
+        return tasks
+
+
 class PaymentPointService(BaseService):
     OBJECT_TYPE = PaymentPoint
 
@@ -66,26 +122,32 @@ class PayrollService(BaseService):
     @register_service_signal('payroll_service.create')
     def create(self, obj_data):
         try:
-            with transaction.atomic():
+            with deferred_indexing(), transaction.atomic():
                 obj_data = self._adjust_create_payload(obj_data)
                 from_failed_invoices_payroll_id = obj_data.pop("from_failed_invoices_payroll_id", None)
                 payment_plan = self._get_payment_plan(obj_data)
                 payment_cycle = self._get_payment_cycle(obj_data)
                 date_valid_from, date_valid_to = self._get_dates_parameter(obj_data)
                 payroll, dict_representation = self._save_payroll(obj_data)
+                generation_dispatched = False
                 if not bool(from_failed_invoices_payroll_id):
                     beneficiaries_queryset = self._select_beneficiary_based_on_criteria(obj_data, payment_plan)
-                    self._generate_benefits(
+                    generation_dispatched = self._generate_benefits(
                         payment_plan,
                         beneficiaries_queryset,
                         date_valid_from,
                         date_valid_to,
                         payroll,
-                        payment_cycle
+                        payment_cycle,
+                        obj_data
                     )
                 else:
-                    self._move_benefit_consumptions(payroll, from_failed_invoices_payroll_id)
-                self.create_accept_payroll_task(payroll.id, obj_data)
+                    moved = self._move_benefit_consumptions(payroll, from_failed_invoices_payroll_id)
+                    logger.info(f"Moved {moved['moved_links']} benefits from payroll {from_failed_invoices_payroll_id} "
+                                f"to payroll {payroll.id}, {moved['reset_benefits']} benefits reset to ACCEPTED")
+                if not generation_dispatched:
+                    # the accept task of a payroll generated in shards is created once all the shards succeeded
+                    self.create_accept_payroll_task(payroll.id, obj_data)
                 return dict_representation
         except Exception as exc:
             return output_exception(model_name=self.OBJECT_TYPE.__name__, method="create", exception=exc)
@@ -157,6 +219,55 @@ class PayrollService(BaseService):
         payroll_id = obj_data['id']
         send_requests_to_gateway_payment.delay(payroll_id, self.user.id)
 
+    @check_authentication
+    @register_service_signal('payroll_service.delete_bulk')
+    def delete_bulk(self, ids):
+        return self._create_bulk_tasks(
+            ids, 'delete_bulk', 'payroll_delete', PayrollConfig.payroll_delete_event
+        )
+
+    @register_service_signal('payroll_service.close_payroll_bulk')
+    def close_payroll_bulk(self, ids):
+        return self._create_bulk_tasks(
+            ids, 'close_payroll_bulk', 'payroll_reconciliation', PayrollConfig.payroll_reconciliation_event
+        )
+
+    @register_service_signal('payroll_service.reject_approve_payroll_bulk')
+    def reject_approved_payroll_bulk(self, ids):
+        return self._create_bulk_tasks(
+            ids, 'reject_approved_payroll_bulk', 'payroll_reject', PayrollConfig.payroll_reject_event
+        )
+
+    @register_service_signal('payroll_service.make_payment_for_payroll_bulk')
+    def make_payment_for_payroll_bulk(self, ids):
+        try:
+            payrolls = self._get_payrolls(ids)
+            group(
+                send_requests_to_gateway_payment.s(str(payroll.id), str(self.user.id)) for payroll in payrolls
+            ).apply_async()
+            return output_result_success({'ids': [payroll.id for payroll in payrolls]})
+        except Exception as exc:
+            return output_exception(model_name=self.OBJECT_TYPE.__name__, method="make_payment_for_payroll_bulk",
+                                    exception=exc)
+
+    def _create_bulk_tasks(self, ids, method, source, business_event):
+        try:
+            with transaction.atomic():
+                payrolls = self._get_payrolls(ids)
+                tasks = BulkTaskService(self.user).create_tasks(
+                    payrolls, source, business_event, lambda payroll: {'id': payroll.id}
+                )
+                return output_result_success({'task_ids': [task.id for task in tasks]})
+        except Exception as exc:
+            return output_exception(model_name=self.OBJECT_TYPE.__name__, method=method, exception=exc)
+
+    def _get_payrolls(self, ids):
+        payrolls = list(Payroll.objects.filter(id__in=ids))
+        missing_ids = set(str(id) for id in ids) - set(str(payroll.id) for payroll in payrolls)
+        if missing_ids:
+            raise Payroll.DoesNotExist(f"Payrolls {', '.join(sorted(missing_ids))} do not exist")
+        return payrolls
+
     def _save_payroll(self, obj_data):
         obj_ = self.OBJECT_TYPE(**obj_data)
         dict_representation = self.save_instance(obj_)
@@ -219,7 +330,21 @@ class PayrollService(BaseService):
 
         return beneficiaries_queryset
 
-    def _generate_benefits(self, payment_plan, beneficiaries_queryset, date_from, date_to, payroll, payment_cycle):
+    def _generate_benefits(self, payment_plan, beneficiaries_queryset, date_from, date_to, payroll, payment_cycle,
+                           obj_data=None):
+        """
+        Generate the benefits of the payroll. Returns True when the generation was dispatched to the celery workers.
+        """
+        if PayrollConfig.parallel_benefit_generation:
+            shards = self._get_beneficiary_shards(beneficiaries_queryset)
+            if len(shards) > 1:
+                # the accept task data is sent to the workers, it has to be serializable
+                task_data = json.loads(json.dumps(obj_data or {}, cls=DjangoJSONEncoder))
+                # shard workers use their own connections, they have to wait until the payroll is committed
+                transaction.on_commit(lambda: dispatch_benefit_generation_shards(
+                    payroll.id, self.user.id, shards, date_from, date_to, task_data
+                ))
+                return True
         calculation = get_calculation_object(payment_plan.calculation)
         calculation.calculate_if_active_for_object(
             payment_plan,
@@ -229,16 +354,44 @@ class PayrollService(BaseService):
             payroll=payroll,
             payment_cycle=payment_cycle
         )
+        PayrollBenefitTotalsService.rebuild([payroll.id])
+        return False
+
+    def _get_beneficiary_shards(self, beneficiaries_queryset):
+        beneficiary_ids = beneficiaries_queryset.order_by('id').values_list('id', flat=True)
+        return [
+            [str(beneficiary_id) for beneficiary_id in shard]
+            for shard in chunked_iterable(beneficiary_ids, PayrollConfig.benefit_generation_shard_size)
+        ]
 
     @transaction.atomic
     def _move_benefit_consumptions(self, payroll, from_payroll_id):
-        payroll_benefits = PayrollBenefitConsumption.objects.filter(
+        """
+        Carry the unpaid benefits of a failed payroll forward to ``payroll``.
+        Links and benefits are updated with chunked set-based statements and their history is written in bulk.
+        """
+        link_ids, benefit_ids = self._get_unpaid_benefit_links(from_payroll_id)
+        chunk_size = PayrollConfig.bulk_operation_chunk_size
+        PayrollBenefitTotalsService.record_move(
+            benefit_ids, from_payroll_id, payroll.id, BenefitConsumptionStatus.ACCEPTED
+        )
+        moved_links = update_in_chunks_with_history(
+            PayrollBenefitConsumption, link_ids, self.user, chunk_size, payroll_id=payroll.id
+        )
+        reset_benefits = update_in_chunks_with_history(
+            BenefitConsumption, benefit_ids, self.user, chunk_size, status=BenefitConsumptionStatus.ACCEPTED
+        )
+        return {'moved_links': moved_links, 'reset_benefits': reset_benefits}
+
+    def _get_unpaid_benefit_links(self, from_payroll_id):
+        rows = list(PayrollBenefitConsumption.objects.filter(
             payroll_id=from_payroll_id,
             benefit__status__in=[BenefitConsumptionStatus.ACCEPTED, BenefitConsumptionStatus.APPROVE_FOR_PAYMENT]
-        )
-        payroll_benefits.update(payroll=payroll)
-        benefits = BenefitConsumption.objects.filter(payrollbenefitconsumption__payroll=payroll)
-        benefits.update(status=BenefitConsumptionStatus.ACCEPTED)
+        ).values_list('id', 'benefit_id'))
+        if not rows:
+            return [], []
+        link_ids, benefit_ids = zip(*rows)
+        return list(link_ids), list(benefit_ids)
 
 
 class BenefitConsumptionService(BaseService):
@@ -254,14 +407,23 @@ class BenefitConsumptionService(BaseService):
 
     @register_service_signal('benefit_consumption_service.update')
     def update(self, obj_data):
-        return super().update(obj_data)
+        previous_status = BenefitConsumption.objects.filter(id=obj_data.get('id')) \
+            .values_list('status', flat=True).first()
+        result = super().update(obj_data)
+        if result.get('success') and obj_data.get('status'):
+            PayrollBenefitTotalsService.record_status_change([obj_data['id']], previous_status, obj_data['status'])
+        return result
 
     @check_authentication
     @register_service_signal('benefit_consumption_service.delete')
     def delete(self, obj_data):
         benefit_to_delete = BenefitConsumption.objects.get(id=obj_data['id'])
+        previous_status = benefit_to_delete.status
         benefit_to_delete.status = BenefitConsumptionStatus.PENDING_DELETION
         benefit_to_delete.save(user=self.user)
+        PayrollBenefitTotalsService.record_status_change(
+            [benefit_to_delete.id], previous_status, BenefitConsumptionStatus.PENDING_DELETION
+        )
         data = {'id': benefit_to_delete.id}
         TaskService(self.user).create({
             'source': 'benefit_delete',
@@ -272,6 +434,98 @@ class BenefitConsumptionService(BaseService):
             'data': _get_std_task_data_payload(data)
         })
 
+    @check_authentication
+    @register_service_signal('benefit_consumption_service.delete_bulk')
+    def delete_bulk(self, ids):
+        try:
+            with transaction.atomic():
+                benefits = self._mark_pending_deletion(ids)
+                tasks = BulkTaskService(self.user).create_tasks(
+                    benefits, 'benefit_delete', PayrollConfig.benefit_delete_event,
+                    lambda benefit: {'id': benefit.id}
+                )
+                return output_result_success({'task_ids': [task.id for task in tasks]})
+        except Exception as exc:
+            return output_exception(model_name=self.OBJECT_TYPE.__name__, method="delete_bulk", exception=exc)
+
+    @check_authentication
+    @register_service_signal('benefit_consumption_service.delete_batch')
+    def delete_batch(self, ids):
+        """
+        Mark the benefits as pending deletion and create one task per payroll covering its benefits.
+        The benefits are removed with chunked deletes once the task is approved. Benefits not attached
+        to any payroll get a task each, as with delete_bulk.
+        """
+        try:
+            with transaction.atomic():
+                benefits = self._mark_pending_deletion(ids)
+                payroll_by_benefit = {}
+                for benefit_id, payroll_id in PayrollBenefitConsumption.objects.filter(
+                        benefit_id__in=ids, is_deleted=False).values_list('benefit_id', 'payroll_id'):
+                    payroll_by_benefit.setdefault(benefit_id, payroll_id)
+                benefit_ids_by_payroll = {}
+                unattached_benefits = []
+                for benefit in benefits:
+                    if benefit.id in payroll_by_benefit:
+                        benefit_ids_by_payroll.setdefault(payroll_by_benefit[benefit.id], []).append(str(benefit.id))
+                    else:
+                        unattached_benefits.append(benefit)
+
+                task_ids = []
+                for payroll in Payroll.objects.filter(id__in=benefit_ids_by_payroll):
+                    benefit_ids = benefit_ids_by_payroll[payroll.id]
+                    result = TaskService(self.user).create({
+                        'source': 'benefit_batch_delete',
+                        'entity': payroll,
+                        'status': Task.Status.RECEIVED,
+                        'executor_action_event': TasksManagementConfig.default_executor_event,
+                        'business_event': PayrollConfig.benefit_batch_delete_event,
+                        'data': _get_std_task_data_payload({'ids': benefit_ids}),
+                        'json_ext': {'benefit_ids': benefit_ids},
+                    })
+                    if not result.get('success'):
+                        raise ValueError(result.get('detail') or result.get('message'))
+                    task_ids.append(result['data']['id'])
+                if unattached_benefits:
+                    tasks = BulkTaskService(self.user).create_tasks(
+                        unattached_benefits, 'benefit_delete', PayrollConfig.benefit_delete_event,
+                        lambda benefit: {'id': benefit.id}
+                    )
+                    task_ids += [task.id for task in tasks]
+                return output_result_success({'task_ids': task_ids})
+        except Exception as exc:
+            return output_exception(model_name=self.OBJECT_TYPE.__name__, method="delete_batch", exception=exc)
+
+    def revert_pending_deletion(self, ids):
+        benefit_ids = list(BenefitConsumption.objects.filter(
+            id__in=ids, status=BenefitConsumptionStatus.PENDING_DELETION
+        ).values_list('id', flat=True))
+        PayrollBenefitTotalsService.record_status_change(
+            benefit_ids, BenefitConsumptionStatus.PENDING_DELETION, BenefitConsumptionStatus.ACCEPTED
+        )
+        update_in_chunks_with_history(
+            BenefitConsumption, benefit_ids, self.user,
+            PayrollConfig.bulk_operation_chunk_size, status=BenefitConsumptionStatus.ACCEPTED
+        )
+
+    def _mark_pending_deletion(self, ids):
+        benefits = list(BenefitConsumption.objects.filter(id__in=ids))
+        missing_ids = set(str(id) for id in ids) - set(str(benefit.id) for benefit in benefits)
+        if missing_ids:
+            raise BenefitConsumption.DoesNotExist(f"Benefits {', '.join(sorted(missing_ids))} do not exist")
+        benefit_ids_by_status = {}
+        for benefit in benefits:
+            benefit_ids_by_status.setdefault(benefit.status, []).append(benefit.id)
+        for previous_status, benefit_ids in benefit_ids_by_status.items():
+            PayrollBenefitTotalsService.record_status_change(
+                benefit_ids, previous_status, BenefitConsumptionStatus.PENDING_DELETION
+            )
+        update_in_chunks_with_history(
+            BenefitConsumption, [benefit.id for benefit in benefits], self.user,
+            PayrollConfig.bulk_operation_chunk_size, status=BenefitConsumptionStatus.PENDING_DELETION
+        )
+        return benefits
+
     @check_authentication
     @register_service_signal('benefit_consumption_service.create_or_update_benefit_attachment')
     def create_or_update_benefit_attachment(self, bills_queryset, benefit_id):
@@ -283,11 +537,472 @@ class BenefitConsumptionService(BaseService):
             benefit_attachment.save(user=self.user)
 
 
+class PayrollBenefitTotalsService:
+    """
+    Maintains the denormalized benefit counts and amounts per payroll and status (PayrollBenefitTotal).
+    Status changes, removals and moves are recorded incrementally by the payroll services and payment strategies,
+    generated benefits are counted by ``rebuild`` once the generation is finished. ``rebuild`` also recomputes
+    the totals from the benefits in case of drift.
+    """
+
+    @classmethod
+    def record_status_change(cls, benefit_ids, from_status, to_status):
+        if from_status == to_status:
+            return
+        deltas = {}
+        for (payroll_id, __), (count, amount) in cls._group(benefit_ids).items():
+            cls._add_delta(deltas, payroll_id, from_status, -count, -amount)
+            cls._add_delta(deltas, payroll_id, to_status, count, amount)
+        cls._apply(deltas)
+
+    @classmethod
+    def record_removal(cls, benefit_ids):
+        # call before the benefits or their payroll links are deleted
+        deltas = {}
+        for (payroll_id, status), (count, amount) in cls._group(benefit_ids).items():
+            cls._add_delta(deltas, payroll_id, status, -count, -amount)
+        cls._apply(deltas)
+
+    @classmethod
+    def record_move(cls, benefit_ids, from_payroll_id, to_payroll_id, to_status):
+        # call before the payroll links and statuses of the benefits are updated, only the totals of the payroll
+        # the benefits leave are decremented, their links to other payrolls are kept
+        deltas = {}
+        for (payroll_id, status), (count, amount) in cls._group(benefit_ids, payroll_id=from_payroll_id).items():
+            cls._add_delta(deltas, payroll_id, status, -count, -amount)
+            cls._add_delta(deltas, to_payroll_id, to_status, count, amount)
+        cls._apply(deltas)
+
+    @classmethod
+    @transaction.atomic
+    def rebuild(cls, payroll_ids=None):
+        totals = PayrollBenefitTotal.objects.all()
+        links = PayrollBenefitConsumption.objects.filter(is_deleted=False, benefit__is_deleted=False)
+        if payroll_ids is not None:
+            totals = totals.filter(payroll_id__in=payroll_ids)
+            links = links.filter(payroll_id__in=payroll_ids)
+        totals.delete()
+        BenefitsSummaryService.invalidate_cache()
+        rows = links.values('payroll_id', 'benefit__status').annotate(
+            benefit_count=Count('id'), total_amount=Sum('benefit__amount')
+        )
+        PayrollBenefitTotal.objects.bulk_create([
+            PayrollBenefitTotal(
+                payroll_id=row['payroll_id'],
+                status=row['benefit__status'],
+                benefit_count=row['benefit_count'],
+                total_amount=row['total_amount'] or 0,
+            ) for row in rows
+        ], batch_size=PayrollConfig.bulk_operation_chunk_size)
+
+    @classmethod
+    def get_totals(cls, **filters):
+        """
+        Returns {status: {'count': ..., 'amount': ...}} summed over the payroll totals matching ``filters``.
+        """
+        rows = PayrollBenefitTotal.objects.filter(**filters).values('status').annotate(
+            count=Sum('benefit_count'), amount=Sum('total_amount')
+        )
+        return {row['status']: {'count': row['count'] or 0, 'amount': row['amount'] or 0} for row in rows}
+
+    @classmethod
+    def _group(cls, benefit_ids, payroll_id=None):
+        groups = {}
+        for chunk in chunked_iterable(benefit_ids, PayrollConfig.bulk_operation_chunk_size):
+            links = PayrollBenefitConsumption.objects.filter(
+                benefit_id__in=chunk,
+                is_deleted=False,
+                benefit__is_deleted=False,
+            )
+            if payroll_id:
+                links = links.filter(payroll_id=payroll_id)
+            rows = links.values('payroll_id', 'benefit__status').annotate(
+                benefit_count=Count('id'), total_amount=Sum('benefit__amount')
+            )
+            for row in rows:
+                count, amount = groups.get((row['payroll_id'], row['benefit__status']), (0, 0))
+                groups[(row['payroll_id'], row['benefit__status'])] = (
+                    count + row['benefit_count'], amount + (row['total_amount'] or 0)
+                )
+        return groups
+
+    @staticmethod
+    def _add_delta(deltas, payroll_id, status, count, amount):
+        previous_count, previous_amount = deltas.get((payroll_id, status), (0, 0))
+        deltas[(payroll_id, status)] = (previous_count + count, previous_amount + amount)
+
+    @classmethod
+    def _apply(cls, deltas):
+        """
+        Add the (count, amount) deltas of one operation to the totals rows, in a stable order so that concurrent
+        operations lock the rows in the same order. The summary cache is invalidated once per operation.
+        """
+        deltas = {key: delta for key, delta in deltas.items() if delta != (0, 0)}
+        if not deltas:
+            return
+        with transaction.atomic():
+            for (payroll_id, status) in sorted(deltas, key=lambda key: (str(key[0]), key[1])):
+                count, amount = deltas[(payroll_id, status)]
+                cls._upsert(payroll_id, status, count, amount)
+        BenefitsSummaryService.invalidate_cache()
+
+    @classmethod
+    def _upsert(cls, payroll_id, status, count, amount):
+        if cls._increment(payroll_id, status, count, amount):
+            return
+        try:
+            # savepoint, the row can be created by a concurrent operation between the update and the insert
+            with transaction.atomic():
+                PayrollBenefitTotal.objects.create(
+                    payroll_id=payroll_id, status=status, benefit_count=count, total_amount=amount
+                )
+        except IntegrityError:
+            cls._increment(payroll_id, status, count, amount)
+
+    @classmethod
+    def _increment(cls, payroll_id, status, count, amount):
+        return PayrollBenefitTotal.objects.filter(payroll_id=payroll_id, status=status).update(
+            benefit_count=F('benefit_count') + count,
+            total_amount=F('total_amount') + amount,
+        )
+
+
+class BenefitsSummaryService:
+    """
+    Computes the benefit amounts and counts per status for the benefits summary query.
+    Summaries are cached per filter set, the cache is invalidated whenever payroll benefit totals change.
+    """
+    CACHE_VERSION_KEY = 'payroll_benefits_summary_version'
+    GROUP_BY_FIELDS = {
+        'payroll': ('payroll_id', 'payrollbenefitconsumption__payroll_id'),
+        'paymentCycle': ('payroll__payment_cycle_id', 'payrollbenefitconsumption__payroll__payment_cycle_id'),
+    }
+
+    @classmethod
+    def get_summary(cls, validity_filters=None, individual_id=None, payroll_id=None, benefit_plan_uuid=None,
+                    payment_cycle_uuid=None, group_by=None, cache_key_data=None):
+        cache_key = cls._get_cache_key(cache_key_data or {})
+        summary = cache.get(cache_key)
+        if summary is None:
+            if not individual_id and not validity_filters:
+                rows = cls._get_rows_from_totals(payroll_id, benefit_plan_uuid, payment_cycle_uuid, group_by)
+            else:
+                rows = cls._get_rows_from_benefits(
+                    validity_filters, individual_id, payroll_id, benefit_plan_uuid, payment_cycle_uuid, group_by
+                )
+            summary = cls._build_summary(rows)
+            cache.set(cache_key, summary, PayrollConfig.benefits_summary_cache_timeout)
+        return summary
+
+    @classmethod
+    def invalidate_cache(cls):
+        cache.set(cls.CACHE_VERSION_KEY, uuid.uuid4().hex, None)
+
+    @classmethod
+    def _get_cache_key(cls, cache_key_data):
+        version = cache.get(cls.CACHE_VERSION_KEY)
+        if version is None:
+            version = uuid.uuid4().hex
+            cache.set(cls.CACHE_VERSION_KEY, version, None)
+        filters = ','.join(f'{key}={cache_key_data[key]}' for key in sorted(cache_key_data))
+        filters_hash = hashlib.sha256(filters.encode('utf-8')).hexdigest()
+        return f'payroll_benefits_summary:{version}:{filters_hash}'
+
+    @classmethod
+    def _get_rows_from_totals(cls, payroll_id, benefit_plan_uuid, payment_cycle_uuid, group_by):
+        filters = {}
+        if payroll_id:
+            filters['payroll_id'] = payroll_id
+        if benefit_plan_uuid:
+            filters['payroll__payment_plan__benefit_plan_id'] = benefit_plan_uuid
+        if payment_cycle_uuid:
+            filters['payroll__payment_cycle_id'] = payment_cycle_uuid
+        group_field = cls.GROUP_BY_FIELDS[group_by][0] if group_by else None
+        values = [group_field, 'status'] if group_field else ['status']
+        rows = PayrollBenefitTotal.objects.filter(**filters).values(*values).annotate(
+            count=Sum('benefit_count'), amount=Sum('total_amount')
+        )
+        return [{
+            'group_id': row[group_field] if group_field else None,
+            'status': row['status'],
+            'count': row['count'] or 0,
+            'amount': row['amount'] or 0,
+        } for row in rows]
+
+    @classmethod
+    def _get_rows_from_benefits(cls, validity_filters, individual_id, payroll_id, benefit_plan_uuid,
+                                payment_cycle_uuid, group_by):
+        filters = [*(validity_filters or [])]
+        if individual_id:
+            filters.append(Q(individual__id=individual_id))
+        if payroll_id:
+            filters.append(Q(payrollbenefitconsumption__payroll_id=payroll_id))
+        if benefit_plan_uuid:
+            filters.append(Q(payrollbenefitconsumption__payroll__payment_plan__benefit_plan_id=benefit_plan_uuid))
+        if payment_cycle_uuid:
+            filters.append(Q(payrollbenefitconsumption__payroll__payment_cycle_id=payment_cycle_uuid))
+
+        # a single pass over the benefits with one conditional aggregate per status
+        aggregates = {}
+        for status in BenefitConsumptionStatus.values:
+            aggregates[f'{status}_count'] = Count('id', filter=Q(status=status))
+            aggregates[f'{status}_amount'] = Sum('amount', filter=Q(status=status))
+        queryset = BenefitConsumption.objects.filter(
+            *filters,
+            is_deleted=False,
+            payrollbenefitconsumption__is_deleted=False,
+        )
+        group_field = cls.GROUP_BY_FIELDS[group_by][1] if group_by else None
+        if group_field:
+            grouped = queryset.values(group_field).annotate(**aggregates).order_by(group_field)
+        else:
+            grouped = [queryset.aggregate(**aggregates)]
+
+        rows = []
+        for group in grouped:
+            for status in BenefitConsumptionStatus.values:
+                if group[f'{status}_count']:
+                    rows.append({
+                        'group_id': group[group_field] if group_field else None,
+                        'status': status,
+                        'count': group[f'{status}_count'],
+                        'amount': group[f'{status}_amount'] or 0,
+                    })
+        return rows
+
+    @classmethod
+    def _build_summary(cls, rows):
+        groups = {}
+        for row in rows:
+            if row['group_id'] is not None:
+                groups.setdefault(str(row['group_id']), []).append(row)
+        summary = cls._summarize(rows)
+        summary['groups'] = [{'group_id': group_id, **cls._summarize(group_rows)}
+                             for group_id, group_rows in groups.items()]
+        return summary
+
+    @classmethod
+    def _summarize(cls, rows):
+        statuses = {}
+        for row in rows:
+            count, amount = statuses.get(row['status'], (0, 0))
+            statuses[row['status']] = (count + row['count'], amount + row['amount'])
+        return {
+            'total_amount_received': sum(
+                amount for status, (__, amount) in statuses.items() if status == BenefitConsumptionStatus.RECONCILED
+            ),
+            'total_amount_due': sum(
+                amount for status, (__, amount) in statuses.items() if status != BenefitConsumptionStatus.RECONCILED
+            ),
+            'statuses': [{'status': status, 'count': count, 'amount': amount}
+                         for status, (count, amount) in statuses.items()],
+        }
+
+
+class PaymentGatewayCallbackService:
+    """
+    Ingest batches of invoice results sent back by payment gateways. The results are appended to the
+    PaymentGatewayCallback table, the benefits of failed invoices are rejected in bulk and every payroll
+    in the batch is acknowledged once.
+    """
+
+    def __init__(self, user: InteractiveUser):
+        self.user = user
+
+    @transaction.atomic
+    def ingest(self, results):
+        results = self._validate_results(results)
+        payrolls = self._resolve_payrolls({result['payroll_id'] for result in results})
+        benefit_ids = self._resolve_benefit_ids(results)
+
+        callbacks = [
+            PaymentGatewayCallback(
+                payroll_id=result['payroll_id'],
+                benefit_id=benefit_ids.get((result['payroll_id'], result['invoice_id'])),
+                invoice_id=result['invoice_id'],
+                success=result['success'],
+                response=result['response'],
+            ) for result in results
+        ]
+        PaymentGatewayCallback.objects.bulk_create(callbacks, batch_size=PayrollConfig.bulk_operation_chunk_size)
+
+        rejected_benefit_ids = {callback.benefit_id for callback in callbacks if callback.benefit_id and not callback.success}
+        self._reject_benefits(rejected_benefit_ids)
+
+        for payroll in payrolls.values():
+            strategy = PaymentMethodStorage.get_chosen_payment_method(payroll.payment_method)
+            if strategy:
+                strategy.acknowledge_of_gateway_callbacks(payroll, self.user)
+
+        return {
+            'received': len(callbacks),
+            'rejected': len(rejected_benefit_ids),
+            'unmatched': [callback.invoice_id for callback in callbacks if not callback.benefit_id],
+        }
+
+    def _validate_results(self, results):
+        if not results or not isinstance(results, list):
+            raise ValueError('payment_gateway_callback.validation.results_required')
+        validated = []
+        for result in results:
+            if not isinstance(result, dict) or not result.get('payroll_id') or not result.get('invoice_id'):
+                raise ValueError('payment_gateway_callback.validation.payroll_id_and_invoice_id_required')
+            if not isinstance(result.get('success'), bool):
+                raise ValueError('payment_gateway_callback.validation.success_required')
+            validated.append({
+                'payroll_id': str(result['payroll_id']),
+                'invoice_id': str(result['invoice_id']),
+                'success': result['success'],
+                'response': result.get('response') or {},
+            })
+        return validated
+
+    def _resolve_payrolls(self, payroll_ids):
+        payrolls = {str(payroll.id): payroll for payroll in Payroll.objects.filter(id__in=payroll_ids, is_deleted=False)}
+        if len(payrolls) != len(payroll_ids):
+            raise ValueError('payment_gateway_callback.validation.payroll_not_found')
+        return payrolls
+
+    def _resolve_benefit_ids(self, results):
+        # invoices are sent to the gateway with the benefit code as invoice id
+        benefit_ids = {}
+        invoice_ids = {result['invoice_id'] for result in results}
+        payroll_ids = {result['payroll_id'] for result in results}
+        for chunk in chunked_iterable(invoice_ids, PayrollConfig.bulk_operation_chunk_size):
+            links = PayrollBenefitConsumption.objects.filter(
+                payroll_id__in=payroll_ids,
+                benefit__code__in=chunk,
+                is_deleted=False,
+                benefit__is_deleted=False,
+            ).values_list('payroll_id', 'benefit__code', 'benefit_id')
+            for payroll_id, code, benefit_id in links:
+                benefit_ids[(str(payroll_id), code)] = benefit_id
+        return benefit_ids
+
+    def _reject_benefits(self, benefit_ids):
+        if not benefit_ids:
+            return
+        benefit_ids = list(BenefitConsumption.objects.filter(
+            id__in=benefit_ids,
+            status=BenefitConsumptionStatus.APPROVE_FOR_PAYMENT,
+            is_deleted=False,
+        ).values_list('id', flat=True))
+        PayrollBenefitTotalsService.record_status_change(
+            benefit_ids, BenefitConsumptionStatus.APPROVE_FOR_PAYMENT, BenefitConsumptionStatus.REJECTED
+        )
+        update_in_chunks_with_history(
+            BenefitConsumption,
+            benefit_ids,
+            self.user,
+            PayrollConfig.bulk_operation_chunk_size,
+            status=BenefitConsumptionStatus.REJECTED,
+        )
+
+
+class PaymentGatewayLogService:
+    """
+    Append-only log of the payment gateway interactions. Only a compact summary pointer is kept
+    in the benefit and payroll json_ext, the full gateway output is stored in PaymentGatewayLog.
+    """
+
+    @classmethod
+    def log(cls, payroll, operation, results):
+        """
+        Store the gateway output for many benefits at once, ``results`` is an iterable of (benefit, output) pairs.
+        """
+        PaymentGatewayLog.objects.bulk_create([
+            PaymentGatewayLog(
+                payroll_id=payroll.id,
+                benefit_id=benefit.id if benefit else None,
+                operation=operation,
+                success=bool(output),
+                response=cls._to_response(output),
+            ) for benefit, output in results
+        ], batch_size=PayrollConfig.bulk_operation_chunk_size)
+
+    @classmethod
+    def log_response(cls, payroll, operation, output):
+        cls.log(payroll, operation, [(None, output)])
+
+    @classmethod
+    def get_summary(cls, operation, success):
+        return {'operation': operation, 'success': bool(success), 'date': datetime.datetime.now().isoformat()}
+
+    @classmethod
+    def prune(cls, older_than, chunk_size=None):
+        """
+        Delete gateway logs and callbacks created before ``older_than`` in chunks, returns the number of removed rows.
+        """
+        chunk_size = chunk_size or PayrollConfig.bulk_operation_chunk_size
+        removed = 0
+        for model, date_field in ((PaymentGatewayLog, 'date_created'), (PaymentGatewayCallback, 'date_received')):
+            while True:
+                ids = list(model.objects.filter(
+                    **{f'{date_field}__lt': older_than}
+                ).order_by('id').values_list('id', flat=True)[:chunk_size])
+                if not ids:
+                    break
+                removed += model.objects.filter(id__in=ids).delete()[0]
+        return removed
+
+    @classmethod
+    def _to_response(cls, output):
+        return output if isinstance(output, dict) else {'result': output}
+
+
 class CsvReconciliationService:
+    FORMAT_CSV = 'csv'
+    FORMAT_PARQUET = 'parquet'
+    FILE_FORMATS = (FORMAT_CSV, FORMAT_PARQUET)
+    EXPORT_DIRECTORY = 'exports'
+    # Parquet type of the amounts, as stored in BenefitConsumption.amount
+    AMOUNT_PRECISION = 18
+    AMOUNT_SCALE = 2
+
     def __init__(self, user: InteractiveUser):
         self.user = user
 
-    def download_reconciliation(self, payroll_id) -> BytesIO:
+    @classmethod
+    def get_file_format(cls, file_name=None, file_format=None):
+        """
+        Resolve the reconciliation file format, the requested format takes precedence over the file extension.
+        Files without the .parquet extension are read as CSV.
+        """
+        if not file_format:
+            is_parquet = bool(file_name) and file_name.lower().endswith(f'.{cls.FORMAT_PARQUET}')
+            file_format = cls.FORMAT_PARQUET if is_parquet else cls.FORMAT_CSV
+        file_format = file_format.lower()
+        if file_format not in cls.FILE_FORMATS:
+            raise ValueError('csv_reconciliation.validation.unsupported_file_format')
+        return file_format
+
+    def get_reconciliation_export(self, payroll_id, file_format=FORMAT_CSV) -> DefaultStorageFileHandler:
+        """
+        Return the stored reconciliation export of the payroll. The export is generated on the first request
+        for the current version of the payroll benefits and served from the storage afterwards,
+        the exports of previous versions are removed once a new one is stored.
+        """
+        file_format = self.get_file_format(file_format=file_format)
+        payroll = self._resolve_payroll(payroll_id)
+        version = self._get_export_version(payroll, self._get_benefit_consumption_qs(payroll))
+        file_name = f"{self.EXPORT_DIRECTORY}/reconciliation_{version}.{file_format}"
+        file_handler = DefaultStorageFileHandler(PayrollConfig.get_payroll_payment_file_path(payroll.id, file_name))
+        try:
+            file_handler.check_file_path()
+        except FileExistsError:
+            return file_handler
+        in_memory_file = self.download_reconciliation(payroll.id, file_format)
+        try:
+            file_handler.save_file(in_memory_file)
+        except FileExistsError:
+            # stored meanwhile by a concurrent request for the same version
+            return file_handler
+        # also removes the copy stored under an alternative name when a concurrent request saved first
+        self._remove_outdated_exports(payroll, version)
+        return file_handler
+
+    def download_reconciliation(self, payroll_id, file_format=FORMAT_CSV) -> BytesIO:
+        file_format = self.get_file_format(file_format=file_format)
         payroll = self._resolve_payroll(payroll_id)
         bc_qs = self._get_benefit_consumption_qs(payroll)
         # Retrieve the basic fields
@@ -321,68 +1036,257 @@ class CsvReconciliationService:
             df[key] = [extra_info_dict.get(key, None) for extra_info_dict in extra_info_dicts]
 
         in_memory_file = BytesIO()
-        # BytesIO is duck-typed as a file object, so it can be passed to df.to_csv
-        # noinspection PyTypeChecker
-        df.to_csv(in_memory_file, index=False)
+        if file_format == self.FORMAT_PARQUET:
+            pyarrow = self._import_pyarrow()
+            pyarrow.parquet.write_table(self._to_arrow_table(pyarrow, df), in_memory_file)
+        else:
+            # BytesIO is duck-typed as a file object, so it can be passed to df.to_csv
+            # noinspection PyTypeChecker
+            df.to_csv(in_memory_file, index=False)
         return in_memory_file
 
-    def upload_reconciliation(self, payroll_id, file, upload):
+    @deferred_indexing()
+    def upload_reconciliation(self, payroll_id, file, upload, file_format=None):
         payroll = self._resolve_payroll(payroll_id)
         upload.payroll = payroll
         upload.status = upload.Status.IN_PROGRESS
         upload.save(username=self.user.login_name)
         if not file:
             raise ValueError(_('csv_reconciliation.validation.file_required'))
-        df = pd.read_csv(file)
-        self._validate_dataframe(df)
-        df.rename(columns={v: k for k, v in PayrollConfig.csv_reconciliation_field_mapping.items()}, inplace=True)
+        file_format = self.get_file_format(file.name, file_format)
 
         affected_rows = 0
         skipped_items = 0
-        total_number_of_benefits_in_file = len(df)
-
-        df[PayrollConfig.csv_reconciliation_errors_column] = df.apply(lambda row: self._reconcile_row(payroll, row),
-                                                                      axis=1)
+        total_number_of_benefits_in_file = 0
+        all_reconciled = True
+        errors = {}
+        # processed rows are written chunk by chunk, kept in memory up to the spool size only
+        result_file = SpooledTemporaryFile(max_size=PayrollConfig.csv_reconciliation_spool_max_size, mode='w+b')
+        parquet_writer = None
+        for position, df in enumerate(self._read_chunks(file, file_format)):
+            if position == 0 and PayrollConfig.csv_reconciliation_errors_column in df.columns:
+                raise ValueError(_("Column errors in csv."))
+            if df.empty:
+                continue
+            if PayrollConfig.csv_reconciliation_status_column in df.columns:
+                all_reconciled = all_reconciled and bool(
+                    (df[PayrollConfig.csv_reconciliation_status_column] == BenefitConsumptionStatus.RECONCILED).all()
+                )
+            df.rename(columns={v: k for k, v in PayrollConfig.csv_reconciliation_field_mapping.items()}, inplace=True)
+            benefits, payroll_benefit_ids = self._prefetch_benefit_consumptions(payroll, df)
+            reconciled_ids = []
+            df[PayrollConfig.csv_reconciliation_errors_column] = df.apply(
+                lambda row: self._reconcile_row(payroll, row, benefits, payroll_benefit_ids, reconciled_ids), axis=1
+            )
+            if reconciled_ids:
+                # the payroll totals are moved once per chunk
+                PayrollBenefitTotalsService.record_status_change(
+                    reconciled_ids, BenefitConsumptionStatus.ACCEPTED, BenefitConsumptionStatus.RECONCILED
+                )
+
+            chunk_errors = df[PayrollConfig.csv_reconciliation_errors_column].apply(lambda x: bool(x))
+            total_number_of_benefits_in_file += len(df)
+            skipped_items += int(chunk_errors.sum())
+            affected_rows += int((~chunk_errors).sum())
+            errors.update(df[chunk_errors].set_index(PayrollConfig.csv_reconciliation_code_column)[
+                PayrollConfig.csv_reconciliation_errors_column
+            ].to_dict())
 
-        for __, row in df.iterrows():
-            if not pd.isna(row[PayrollConfig.csv_reconciliation_errors_column]):
-                skipped_items += 1
+            df.rename(columns=PayrollConfig.csv_reconciliation_field_mapping, inplace=True)
+            if file_format == self.FORMAT_PARQUET:
+                parquet_writer = self._write_parquet_chunk(result_file, df, parquet_writer)
             else:
-                affected_rows += 1
+                df.to_csv(result_file, index=False, header=position == 0)
+
+        if parquet_writer:
+            parquet_writer.close()
+        if total_number_of_benefits_in_file == 0:
+            raise ValueError(_("Import file is empty"))
+        if all_reconciled:
+            raise ValueError(_("All of the Benefit Consumptions have been already reconciled."))
 
         summary = {
             'affected_rows': affected_rows,
             'total_number_of_benefits_in_file': total_number_of_benefits_in_file,
             'skipped_items': skipped_items
         }
-
-        error_df = df[df[PayrollConfig.csv_reconciliation_errors_column].apply(lambda x: bool(x))]
-        if not error_df.empty:
-            in_memory_file = BytesIO()
-            df.rename(columns={k: v for k, v in PayrollConfig.csv_reconciliation_field_mapping.items()}, inplace=True)
-            df.to_csv(in_memory_file, index=False)
-            return in_memory_file, error_df.set_index(PayrollConfig.csv_reconciliation_code_column)[
-                PayrollConfig.csv_reconciliation_errors_column
-            ].to_dict(), summary
+        if errors:
+            result_file.seek(0)
+            return result_file, errors, summary
+        result_file.close()
+        file.seek(0)
         return file, None, summary
 
+    def _read_chunks(self, file, file_format):
+        if file_format == self.FORMAT_PARQUET:
+            return self._read_parquet_chunks(file)
+        return self._read_csv_chunks(file)
+
+    def _read_csv_chunks(self, file):
+        """
+        Read the reconciliation file in chunks of csv_reconciliation_chunk_size rows with explicit column types:
+        codes and receipts as strings, statuses as categories and amounts as decimals.
+        """
+        string_columns, category_columns, amount_column = self._get_column_types()
+        dtype = {column: str for column in string_columns}
+        dtype.update({column: 'category' for column in category_columns})
+        converters = {amount_column: self._to_decimal} if amount_column else None
+        return pd.read_csv(
+            file,
+            chunksize=PayrollConfig.csv_reconciliation_chunk_size,
+            dtype=dtype,
+            converters=converters,
+        )
+
+    def _read_parquet_chunks(self, file):
+        """
+        Read the reconciliation file by record batches of csv_reconciliation_chunk_size rows. The column types
+        are stored in the file, only the codes, receipts and amounts of other types are converted.
+        """
+        pyarrow = self._import_pyarrow()
+        string_columns, __, amount_column = self._get_column_types()
+        parquet_file = pyarrow.parquet.ParquetFile(file)
+        for batch in parquet_file.iter_batches(batch_size=PayrollConfig.csv_reconciliation_chunk_size):
+            df = batch.to_pandas()
+            for column in string_columns:
+                if column in df.columns and not pyarrow.types.is_string(batch.schema.field(column).type):
+                    df[column] = df[column].map(self._to_str)
+            if amount_column in df.columns and not pyarrow.types.is_decimal(batch.schema.field(amount_column).type):
+                df[amount_column] = df[amount_column].map(self._to_decimal)
+            yield df
+
+    def _write_parquet_chunk(self, result_file, df, parquet_writer):
+        pyarrow = self._import_pyarrow()
+        if parquet_writer is None:
+            parquet_writer = pyarrow.parquet.ParquetWriter(result_file, self._get_arrow_schema(pyarrow, df.columns))
+        parquet_writer.write_table(self._to_arrow_table(pyarrow, df, parquet_writer.schema))
+        return parquet_writer
+
+    def _get_arrow_schema(self, pyarrow, columns):
+        """
+        Schema of the Parquet reconciliation files, fixed before the first chunk is written so that every chunk
+        fits it: decimal amounts, lists of errors and text for all the other columns, as in the CSV files.
+        """
+        amount_column = PayrollConfig.csv_reconciliation_field_mapping.get('amount')
+        fields = []
+        for column in columns:
+            if column == amount_column:
+                column_type = pyarrow.decimal128(self.AMOUNT_PRECISION, self.AMOUNT_SCALE)
+            elif column == PayrollConfig.csv_reconciliation_errors_column:
+                column_type = pyarrow.list_(pyarrow.string())
+            else:
+                column_type = pyarrow.string()
+            fields.append(pyarrow.field(column, column_type))
+        return pyarrow.schema(fields)
+
+    def _to_arrow_table(self, pyarrow, df, schema=None):
+        schema = schema or self._get_arrow_schema(pyarrow, df.columns)
+        for field in schema:
+            if pyarrow.types.is_decimal(field.type):
+                df[field.name] = df[field.name].map(self._to_amount)
+            elif pyarrow.types.is_string(field.type):
+                df[field.name] = df[field.name].astype(object).map(self._to_str)
+        return pyarrow.Table.from_pandas(df[schema.names], schema=schema, preserve_index=False)
+
+    def _get_column_types(self):
+        mapping = PayrollConfig.csv_reconciliation_field_mapping
+        string_columns = [
+            column for column in (
+                mapping.get('code'),
+                mapping.get('receipt'),
+                mapping.get('type'),
+                PayrollConfig.csv_reconciliation_paid_extra_field,
+            ) if column
+        ]
+        category_columns = [
+            column for column in (
+                mapping.get('status'),
+                mapping.get('payrollbenefitconsumption__payroll__status'),
+            ) if column
+        ]
+        return string_columns, category_columns, mapping.get('amount')
+
+    @staticmethod
+    def _import_pyarrow():
+        try:
+            import pyarrow
+            import pyarrow.parquet
+        except ImportError:
+            raise ValueError('csv_reconciliation.validation.parquet_not_supported')
+        return pyarrow
+
+    @staticmethod
+    def _is_missing(value):
+        return value is None or (pd.api.types.is_scalar(value) and pd.isna(value))
+
+    @classmethod
+    def _to_str(cls, value):
+        return None if cls._is_missing(value) else str(value)
+
+    @classmethod
+    def _to_amount(cls, value):
+        amount = cls._to_decimal(value)
+        return None if amount is None else amount.quantize(Decimal(1).scaleb(-cls.AMOUNT_SCALE))
+
+    @classmethod
+    def _to_decimal(cls, value):
+        if cls._is_missing(value) or value == '':
+            return None
+        try:
+            return Decimal(str(value))
+        except InvalidOperation:
+            return None
+
+    def _prefetch_benefit_consumptions(self, payroll, df):
+        codes = df['code'].dropna().unique().tolist() if 'code' in df.columns else []
+        benefits = {}
+        for chunk in chunked_iterable(codes, PayrollConfig.bulk_operation_chunk_size):
+            for benefit in BenefitConsumption.objects.filter(code__in=chunk, is_deleted=False):
+                benefits.setdefault(benefit.code, benefit)
+        payroll_benefit_ids = set()
+        for chunk in chunked_iterable([benefit.id for benefit in benefits.values()],
+                                      PayrollConfig.bulk_operation_chunk_size):
+            payroll_benefit_ids.update(PayrollBenefitConsumption.objects.filter(
+                payroll=payroll, benefit_id__in=chunk
+            ).values_list('benefit_id', flat=True))
+        return benefits, payroll_benefit_ids
+
+    def _get_export_version(self, payroll, bc_qs):
+        # any saved or bulk updated benefit, or individual, moves the latest modification date
+        stamp = bc_qs.aggregate(
+            count=Count('id'),
+            last_updated=Max('date_updated'),
+            individual_last_updated=Max('individual__date_updated'),
+        )
+        content = '|'.join(str(value) for value in (
+            stamp['count'],
+            stamp['last_updated'],
+            stamp['individual_last_updated'],
+            payroll.date_updated,
+            sorted(PayrollConfig.csv_reconciliation_field_mapping.items()),
+        ))
+        return hashlib.sha256(content.encode('utf-8')).hexdigest()[:16]
+
+    def _remove_outdated_exports(self, payroll, version):
+        directory = PayrollConfig.get_payroll_payment_file_path(payroll.id, self.EXPORT_DIRECTORY)
+        try:
+            __, file_names = DefaultStorageFileHandler.list_files(directory)
+        except FileNotFoundError:
+            return
+        except NotImplementedError:
+            # the storage backend cannot list files, outdated exports are left in place
+            logger.warning(f"Could not list the reconciliation exports of payroll {payroll.id}")
+            return
+        for file_name in file_names:
+            if not file_name.startswith(f"reconciliation_{version}."):
+                DefaultStorageFileHandler(f"{directory}/{file_name}").remove_file()
+
     def _get_benefit_consumption_qs(self, payroll):
         qs = BenefitConsumption.objects.filter(payrollbenefitconsumption__payroll=payroll, is_deleted=False)
         if not qs.exists():
             raise ValueError('csv_reconciliation.validation.no_benefit_consumption_for_payroll')
         return qs
 
-    def _validate_dataframe(self, df):
-        if df is None:
-            raise ValueError(_("Unknown error while loading import file"))
-        if df.empty:
-            raise ValueError(_("Import file is empty"))
-        if PayrollConfig.csv_reconciliation_errors_column in df.columns:
-            raise ValueError(_("Column errors in csv."))
-        if 'Status' in df.columns:
-            if (df[PayrollConfig.csv_reconciliation_status_column] == BenefitConsumptionStatus.RECONCILED).all():
-                raise ValueError(_("All of the Benefit Consumptions have been already reconciled."))
-
     def _fill_paid_column(self, row):
         if (PayrollConfig.csv_reconciliation_status_column in row
                 and row[PayrollConfig.csv_reconciliation_status_column] == BenefitConsumptionStatus.RECONCILED):
@@ -398,19 +1302,20 @@ class CsvReconciliationService:
             raise ValueError('csv_reconciliation.validation.payroll_not_found')
         return payroll
 
-    def _reconcile_row(self, payroll, row):
+    def _reconcile_row(self, payroll, row, benefits, payroll_benefit_ids, reconciled_ids):
         errors = []
-        bc = BenefitConsumption.objects.filter(code=row['code'], is_deleted=False).first()
+        bc = benefits.get(row['code'])
         if not bc:
             errors.append(_('benefit_consumption_not_found'))
-        if not bc.payrollbenefitconsumption_set.filter(payroll=payroll).exists():
+        elif bc.id not in payroll_benefit_ids:
             errors.append(_('benefit_consumption_not_in_payroll'))
         if (row[PayrollConfig.csv_reconciliation_paid_extra_field]
                 and row[PayrollConfig.csv_reconciliation_paid_extra_field]
                 not in [PayrollConfig.csv_reconciliation_paid_yes, PayrollConfig.csv_reconciliation_paid_no]):
             errors.append(_('paid_column_invalid_value'))
 
-        if not row[PayrollConfig.csv_reconciliation_receipt_column]:
+        if pd.isna(row[PayrollConfig.csv_reconciliation_receipt_column]) \
+                or not row[PayrollConfig.csv_reconciliation_receipt_column]:
             errors.append(_('receipt_required'))
 
         if bc and bc.status != row['status']:
@@ -420,6 +1325,7 @@ class CsvReconciliationService:
                 and (row[PayrollConfig.csv_reconciliation_paid_extra_field] == PayrollConfig.csv_reconciliation_paid_yes
                      and bc.status == BenefitConsumptionStatus.ACCEPTED)):
             self._reconcile_bc(row, bc)
+            reconciled_ids.append(bc.id)
 
         return errors if errors else None
 
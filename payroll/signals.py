@@ -1,5 +1,8 @@
 import logging
 
+from django.db import transaction
+from django.utils.functional import cached_property
+
 from core.models import User
 from core.service_signals import ServiceSignalBindType
 from core.signals import bind_service_signal
@@ -8,146 +11,141 @@ from tasks_management.models import Task
 from payroll.apps import PayrollConfig
 from payroll.models import Payroll, BenefitConsumption, BenefitConsumptionStatus
 from payroll.payments_registry import PaymentMethodStorage
-from payroll.services import PayrollService
+from payroll.services import PayrollService, PayrollBenefitTotalsService, BenefitConsumptionService
 from payroll.strategies import StrategyOfPaymentInterface
+from payroll.tasks import process_payroll_task_completion
 
 
 logger = logging.getLogger(__name__)
 imis_modules = openimis_apps()
 
 
-def bind_service_signals():
-    def on_task_complete_accept_payroll(**kwargs):
-        def accept_payroll(payroll, strategy, user):
-            if strategy:
-                strategy.accept_payroll(payroll, user)
-
-        def reject_payroll(payroll, strategy, user):
-            if strategy:
-                strategy.reject_payroll(payroll, user)
-
-        try:
-            result = kwargs.get('result', None)
-            task = result['data']['task']
-            user = User.objects.get(id=result['data']['user']['id'])
-            if result \
-                    and result['success'] \
-                    and task['business_event'] == PayrollConfig.payroll_accept_event:
-                task_status = task['status']
-                payroll = Payroll.objects.get(id=task['entity_id'])
-                strategy = PaymentMethodStorage.get_chosen_payment_method(payroll.payment_method)
-                if task_status == Task.Status.COMPLETED:
-                    accept_payroll(payroll, strategy, user)
-                if task_status == Task.Status.FAILED:
-                    reject_payroll(payroll, strategy, user)
-        except Exception as exc:
-            logger.error("Error while executing on_task_complete_accept_payroll", exc_info=exc)
-
-    def on_task_complete_payroll_reconcilation(**kwargs):
-        def reconcile_payroll(payroll, user):
-            strategy = PaymentMethodStorage.get_chosen_payment_method(payroll.payment_method)
-            if strategy:
-                strategy.reconcile_payroll(payroll, user)
-        try:
-            result = kwargs.get('result', None)
-            task = result['data']['task']
-            user = User.objects.get(id=result['data']['user']['id'])
-            if result \
-                    and result['success'] \
-                    and task['business_event'] == PayrollConfig.payroll_reconciliation_event:
-                task_status = task['status']
-                if task_status == Task.Status.COMPLETED:
-                    payroll = Payroll.objects.get(id=task['entity_id'])
-                    reconcile_payroll(payroll, user)
-        except Exception as exc:
-            logger.error("Error while executing on_task_complete_payroll_reconciliation", exc_info=exc)
-
-    def on_task_complete_payroll_reject_approved_payroll(**kwargs):
-        def reject_approved_payroll(payroll, user):
-            strategy = PaymentMethodStorage.get_chosen_payment_method(payroll.payment_method)
-            if strategy:
-                strategy.reject_approved_payroll(payroll, user)
-        try:
-            result = kwargs.get('result', None)
-            task = result['data']['task']
-            user = User.objects.get(id=result['data']['user']['id'])
-            if result \
-                    and result['success'] \
-                    and task['business_event'] == PayrollConfig.payroll_reject_event:
-                task_status = task['status']
-                if task_status == Task.Status.COMPLETED:
-                    payroll = Payroll.objects.get(id=task['entity_id'])
-                    reject_approved_payroll(payroll, user)
-        except Exception as exc:
-            logger.error("Error while executing on_task_complete_reject_approved_payroll", exc_info=exc)
-
-    def on_task_delete_payroll(**kwargs):
-        def delete_payroll(payroll, user):
-            strategy = PaymentMethodStorage.get_chosen_payment_method(payroll.payment_method)
-            if strategy:
-                strategy.remove_benefits_from_rejected_payroll(payroll=payroll)
-                PayrollService(user).delete_instance(payroll)
-        try:
-            result = kwargs.get('result', None)
-            task = result['data']['task']
-            user = User.objects.get(id=result['data']['user']['id'])
-            if result \
-                    and result['success'] \
-                    and task['business_event'] == PayrollConfig.payroll_delete_event:
-                task_status = task['status']
-                if task_status == Task.Status.COMPLETED:
-                    payroll = Payroll.objects.get(id=task['entity_id'])
-                    delete_payroll(payroll, user)
-        except Exception as exc:
-            logger.error("Error while executing on_task_complete_delete_payroll", exc_info=exc)
-
-    def on_task_delete_benefit(**kwargs):
-        def delete_benefit(benefit, user):
-            StrategyOfPaymentInterface.remove_benefit_from_payroll(benefit=benefit)
-        try:
-            result = kwargs.get('result', None)
-            task = result['data']['task']
-            user = User.objects.get(id=result['data']['user']['id'])
-            if result \
-                    and result['success'] \
-                    and task['business_event'] == PayrollConfig.benefit_delete_event:
-                task_status = task['status']
-                if task_status == Task.Status.COMPLETED:
-                    benefit = BenefitConsumption.objects.get(id=task['entity_id'])
-                    delete_benefit(benefit, user)
-                if task_status == Task.Status.FAILED:
-                    benefit = BenefitConsumption.objects.get(id=task['entity_id'])
-                    benefit.status = BenefitConsumptionStatus.ACCEPTED
-                    benefit.save(username=user.username)
-        except Exception as exc:
-            logger.error("Error while executing on_task_complete_delete_benefit", exc_info=exc)
-
-    bind_service_signal(
-        'task_service.complete_task',
-        on_task_complete_accept_payroll,
-        bind_type=ServiceSignalBindType.AFTER
-    )
-
-    bind_service_signal(
-        'task_service.complete_task',
-        on_task_complete_payroll_reconcilation,
-        bind_type=ServiceSignalBindType.AFTER
-    )
-
-    bind_service_signal(
-        'task_service.complete_task',
-        on_task_complete_payroll_reject_approved_payroll,
-        bind_type=ServiceSignalBindType.AFTER
-    )
+class CompletedTask:
+    """
+    Task completion data parsed once from the service signal result.
+    The user is only fetched when a handler actually needs it.
+    """
+
+    def __init__(self, task_id, business_event, status, entity_id, user_id):
+        self.id = task_id
+        self.business_event = business_event
+        self.status = status
+        self.entity_id = entity_id
+        self.user_id = user_id
+
+    @classmethod
+    def from_result(cls, result):
+        task = result['data']['task']
+        return cls(task['id'], task['business_event'], task['status'], task['entity_id'],
+                   result['data']['user']['id'])
+
+    @cached_property
+    def user(self):
+        return User.objects.get(id=self.user_id)
+
+
+def on_accept_payroll_task(completed_task):
+    if completed_task.status not in (Task.Status.COMPLETED, Task.Status.FAILED):
+        return
+    payroll = Payroll.objects.get(id=completed_task.entity_id)
+    strategy = PaymentMethodStorage.get_chosen_payment_method(payroll.payment_method)
+    if not strategy:
+        return
+    if completed_task.status == Task.Status.COMPLETED:
+        strategy.accept_payroll(payroll, completed_task.user)
+    else:
+        strategy.reject_payroll(payroll, completed_task.user)
+
+
+def on_payroll_reconciliation_task(completed_task):
+    if completed_task.status != Task.Status.COMPLETED:
+        return
+    payroll = Payroll.objects.get(id=completed_task.entity_id)
+    strategy = PaymentMethodStorage.get_chosen_payment_method(payroll.payment_method)
+    if strategy:
+        strategy.reconcile_payroll(payroll, completed_task.user)
+
+
+def on_reject_approved_payroll_task(completed_task):
+    if completed_task.status != Task.Status.COMPLETED:
+        return
+    payroll = Payroll.objects.get(id=completed_task.entity_id)
+    strategy = PaymentMethodStorage.get_chosen_payment_method(payroll.payment_method)
+    if strategy:
+        strategy.reject_approved_payroll(payroll, completed_task.user)
+
+
+def on_delete_payroll_task(completed_task):
+    if completed_task.status != Task.Status.COMPLETED:
+        return
+    payroll = Payroll.objects.get(id=completed_task.entity_id)
+    strategy = PaymentMethodStorage.get_chosen_payment_method(payroll.payment_method)
+    if strategy:
+        strategy.remove_benefits_from_rejected_payroll(payroll=payroll)
+        PayrollService(completed_task.user).delete_instance(payroll)
+
+
+def on_delete_benefit_task(completed_task):
+    if completed_task.status == Task.Status.COMPLETED:
+        benefit = BenefitConsumption.objects.get(id=completed_task.entity_id)
+        StrategyOfPaymentInterface.remove_benefit_from_payroll(benefit=benefit)
+    if completed_task.status == Task.Status.FAILED:
+        benefit = BenefitConsumption.objects.get(id=completed_task.entity_id)
+        previous_status = benefit.status
+        benefit.status = BenefitConsumptionStatus.ACCEPTED
+        benefit.save(username=completed_task.user.username)
+        PayrollBenefitTotalsService.record_status_change(
+            [benefit.id], previous_status, BenefitConsumptionStatus.ACCEPTED
+        )
+
+
+def on_delete_benefit_batch_task(completed_task):
+    if completed_task.status not in (Task.Status.COMPLETED, Task.Status.FAILED):
+        return
+    benefit_ids = Task.objects.get(id=completed_task.id).json_ext['benefit_ids']
+    if completed_task.status == Task.Status.COMPLETED:
+        StrategyOfPaymentInterface.remove_benefits_from_payrolls(benefit_ids)
+    else:
+        BenefitConsumptionService(completed_task.user).revert_pending_deletion(benefit_ids)
+
+
+def get_task_completion_handlers():
+    return {
+        PayrollConfig.payroll_accept_event: on_accept_payroll_task,
+        PayrollConfig.payroll_reconciliation_event: on_payroll_reconciliation_task,
+        PayrollConfig.payroll_reject_event: on_reject_approved_payroll_task,
+        PayrollConfig.payroll_delete_event: on_delete_payroll_task,
+        PayrollConfig.benefit_delete_event: on_delete_benefit_task,
+        PayrollConfig.benefit_batch_delete_event: on_delete_benefit_batch_task,
+    }
+
+
+def on_task_complete(**kwargs):
+    result = kwargs.get('result', None)
+    if not result or not result.get('success'):
+        return
+    try:
+        completed_task = CompletedTask.from_result(result)
+        handler = get_task_completion_handlers().get(completed_task.business_event)
+        if not handler:
+            return
+        if PayrollConfig.async_task_completion:
+            transaction.on_commit(lambda: process_payroll_task_completion.delay(
+                str(completed_task.id),
+                completed_task.business_event,
+                completed_task.status,
+                str(completed_task.entity_id),
+                str(completed_task.user_id),
+            ))
+        else:
+            handler(completed_task)
+    except Exception as exc:
+        logger.error("Error while executing payroll task completion handler", exc_info=exc)
 
-    bind_service_signal(
-        'task_service.complete_task',
-        on_task_delete_payroll,
-        bind_type=ServiceSignalBindType.AFTER
-    )
 
+def bind_service_signals():
     bind_service_signal(
         'task_service.complete_task',
-        on_task_delete_benefit,
+        on_task_complete,
         bind_type=ServiceSignalBindType.AFTER
     )
@@ -7,6 +7,10 @@ class StrategyOfPaymentInterface(object, metaclass=abc.ABCMeta):
     def initialize_payment_gateway(cls, payment_point=None):
         pass
 
+    @classmethod
+    def reset_payment_gateways(cls):
+        pass
+
     @classmethod
     def accept_payroll(cls, payroll, user, **kwargs):
         pass
@@ -54,10 +58,13 @@ class StrategyOfPaymentInterface(object, metaclass=abc.ABCMeta):
             detail_payment_invoices.delete()
             PaymentInvoice.objects.filter(id__in=payment_invoice_ids).delete()
 
+        reverted = {}
         for benefit in benefit_data:
+            reverted.setdefault(benefit.status, []).append(benefit.id)
             benefit.receipt = None
             benefit.status = BenefitConsumptionStatus.ACCEPTED
             benefit.save(username=user.username)
+        cls._record_status_changes(reverted, BenefitConsumptionStatus.ACCEPTED)
         cls.change_status_of_payroll(payroll, PayrollStatus.PENDING_APPROVAL, user)
         PayrollService(user).create_accept_payroll_task(payroll.id, model_representation(payroll))
 
@@ -65,6 +72,10 @@ class StrategyOfPaymentInterface(object, metaclass=abc.ABCMeta):
     def acknowledge_of_reponse_view(cls, payroll, response_from_gateway, user, rejected_bills):
         pass
 
+    @classmethod
+    def acknowledge_of_gateway_callbacks(cls, payroll, user):
+        pass
+
     @classmethod
     def reconcile_payroll(cls, payroll, user):
         pass
@@ -85,6 +96,7 @@ class StrategyOfPaymentInterface(object, metaclass=abc.ABCMeta):
             Bill,
             BillItem
         )
+        from payroll.services import PayrollBenefitTotalsService
 
         benefit_data = BenefitConsumption.objects.filter(
             payrollbenefitconsumption__payroll=payroll,
@@ -93,6 +105,7 @@ class StrategyOfPaymentInterface(object, metaclass=abc.ABCMeta):
 
         if len(benefit_data) > 0:
             benefits, related_bills = zip(*benefit_data)
+            PayrollBenefitTotalsService.record_removal(set(benefits))
 
             BenefitAttachment.objects.filter(
                 benefit_id__in=benefits
@@ -115,6 +128,15 @@ class StrategyOfPaymentInterface(object, metaclass=abc.ABCMeta):
 
     @classmethod
     def remove_benefit_from_payroll(cls, benefit):
+        cls.remove_benefits_from_payrolls([benefit.id])
+
+    @classmethod
+    def remove_benefits_from_payrolls(cls, benefit_ids):
+        """
+        Remove the attachments, bill items, bills, payroll links and the benefits themselves
+        for the given benefits, with one set of deletes per chunk of benefits.
+        """
+        from payroll.apps import PayrollConfig
         from payroll.models import (
             BenefitAttachment,
             BenefitConsumption,
@@ -124,30 +146,41 @@ class StrategyOfPaymentInterface(object, metaclass=abc.ABCMeta):
             Bill,
             BillItem
         )
+        from payroll.services import PayrollBenefitTotalsService
+        from payroll.utils import chunked_iterable
 
-        benefit_data = BenefitConsumption.objects.filter(
-            id=benefit.id,
-            is_deleted=False
-        ).values_list('id', 'benefitattachment__bill')
+        for chunk in chunked_iterable(benefit_ids, PayrollConfig.bulk_operation_chunk_size):
+            benefit_data = BenefitConsumption.objects.filter(
+                id__in=chunk,
+                is_deleted=False
+            ).values_list('id', 'benefitattachment__bill')
 
-        if len(benefit_data) > 0:
-            benefits, related_bills = zip(*benefit_data)
+            if len(benefit_data) > 0:
+                benefits, related_bills = zip(*benefit_data)
+                related_bills = [bill_id for bill_id in related_bills if bill_id]
+                PayrollBenefitTotalsService.record_removal(set(benefits))
 
-            BenefitAttachment.objects.filter(
-                benefit_id__in=benefits
-            ).delete()
+                BenefitAttachment.objects.filter(
+                    benefit_id__in=benefits
+                ).delete()
 
-            BillItem.objects.filter(
-                bill__id__in=related_bills
-            ).delete()
+                BillItem.objects.filter(
+                    bill__id__in=related_bills
+                ).delete()
 
-            Bill.objects.filter(
-                id__in=related_bills
-            ).delete()
+                Bill.objects.filter(
+                    id__in=related_bills
+                ).delete()
 
-            PayrollBenefitConsumption.objects.filter(benefit=benefit).delete()
+                PayrollBenefitConsumption.objects.filter(benefit_id__in=benefits).delete()
 
-            BenefitConsumption.objects.filter(
-                id__in=benefits,
-                is_deleted=False
-            ).delete()
+                BenefitConsumption.objects.filter(
+                    id__in=benefits,
+                    is_deleted=False
+                ).delete()
+
+    @classmethod
+    def _record_status_changes(cls, benefit_ids_by_previous_status, status):
+        from payroll.services import PayrollBenefitTotalsService
+        for previous_status, benefit_ids in benefit_ids_by_previous_status.items():
+            PayrollBenefitTotalsService.record_status_change(benefit_ids, previous_status, status)
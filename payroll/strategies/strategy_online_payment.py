@@ -14,13 +14,49 @@ class StrategyOnlinePayment(StrategyOfPaymentInterface):
     WORKFLOW_NAME = "payment-adaptor"
     WORKFLOW_GROUP = "openimis-coremis-payment-adaptor"
     PAYMENT_GATEWAY = None
+    # connectors keyed by strategy and payment point name, the gateway configuration is resolved per name
+    _PAYMENT_GATEWAYS = {}
 
     @classmethod
     def initialize_payment_gateway(cls, payment_point=None):
+        cls.PAYMENT_GATEWAY = cls.get_payment_gateway(payment_point)
+
+    @classmethod
+    def get_payment_gateway(cls, payment_point=None, gateway_name=None):
+        """
+        Return the cached connector of the payment point gateway, or of the named gateway the benefits are routed to.
+        """
         from payroll.payment_gateway import PaymentGatewayConfig
-        gateway_config = PaymentGatewayConfig(payment_point)
-        payment_gateway_connector_class = gateway_config.get_payment_gateway_connector()
-        cls.PAYMENT_GATEWAY = payment_gateway_connector_class(payment_point)
+        PaymentGatewayConfig.sync()
+        name = gateway_name or (payment_point.name if payment_point else None)
+        key = (cls.__name__, name)
+        payment_gateway = cls._PAYMENT_GATEWAYS.get(key)
+        if payment_gateway is None:
+            if gateway_name:
+                gateway_config = PaymentGatewayConfig.for_gateway(gateway_name)
+            else:
+                gateway_config = PaymentGatewayConfig.for_payment_point(payment_point)
+            payment_gateway_connector_class = gateway_config.get_payment_gateway_connector()
+            if gateway_name:
+                payment_gateway = payment_gateway_connector_class(payment_point, gateway_name=gateway_name)
+            else:
+                payment_gateway = payment_gateway_connector_class(payment_point)
+            cls._PAYMENT_GATEWAYS[key] = payment_gateway
+        return payment_gateway
+
+    @classmethod
+    def get_payment_gateway_router(cls, payment_point=None):
+        from payroll.payment_gateway import PaymentGatewayRouter
+
+        def get_connector(gateway_name):
+            return cls.get_payment_gateway(payment_point, gateway_name)
+
+        return PaymentGatewayRouter(payment_point, get_connector)
+
+    @classmethod
+    def reset_payment_gateways(cls):
+        cls._PAYMENT_GATEWAYS.clear()
+        cls.PAYMENT_GATEWAY = None
 
     @classmethod
     def accept_payroll(cls, payroll, user, **kwargs):
@@ -35,6 +71,19 @@ class StrategyOnlinePayment(StrategyOfPaymentInterface):
         # save response coming from payment gateway in json_ext
         cls._save_payroll_data(payroll, user, response_from_gateway)
 
+    @classmethod
+    @transaction.atomic
+    def acknowledge_of_gateway_callbacks(cls, payroll, user):
+        # the invoice results are already stored as PaymentGatewayCallback rows, a single pending
+        # reconciliation task covers all the callback batches of the payroll
+        from payroll.models import Payroll
+        # batches of the same payroll acknowledged concurrently wait for each other
+        list(Payroll.objects.select_for_update().filter(id=payroll.id).values_list('id', flat=True))
+        if cls._has_pending_reconciliation_task(payroll):
+            logger.info(f"Reconciliation task of payroll {payroll.id} already pending, callbacks acknowledged")
+            return
+        cls._create_payroll_reconcilation_task(payroll, user)
+
     @classmethod
     @transaction.atomic
     def reconcile_payroll(cls, payroll, user):
@@ -56,19 +105,36 @@ class StrategyOnlinePayment(StrategyOfPaymentInterface):
 
     @classmethod
     def approve_for_payment_benefit_consumption(cls, benefits, user):
+        from payroll.indexing import deferred_indexing
+        with deferred_indexing():
+            cls._approve_for_payment_benefit_consumption(benefits, user)
+
+    @classmethod
+    def _approve_for_payment_benefit_consumption(cls, benefits, user):
         from payroll.models import BenefitConsumptionStatus
+        approved = {}
         for benefit in benefits:
             try:
+                previous_status = benefit.status
                 benefit.status = BenefitConsumptionStatus.APPROVE_FOR_PAYMENT
                 benefit.save(username=user.login_name)
+                approved.setdefault(previous_status, []).append(benefit.id)
             except Exception as e:
                 logger.debug(f"Failed to approve benefit consumption {benefit.code}: {str(e)}")
+        cls._record_status_changes(approved, BenefitConsumptionStatus.APPROVE_FOR_PAYMENT)
 
     @classmethod
     def reconcile_benefit_consumption(cls, benefits, user):
+        from payroll.indexing import deferred_indexing
+        with deferred_indexing():
+            cls._reconcile_benefit_consumption(benefits, user)
+
+    @classmethod
+    def _reconcile_benefit_consumption(cls, benefits, user):
         from payroll.models import BenefitConsumptionStatus
         from payroll.apps import PayrollConfig
         from invoice.models import Bill
+        reconciled = {}
         for benefit in benefits:
             try:
                 receipt = CodeGenerator.generate_unique_code(
@@ -77,9 +143,11 @@ class StrategyOnlinePayment(StrategyOfPaymentInterface):
                     'receipt',
                     PayrollConfig.receipt_length,
                 )
+                previous_status = benefit.status
                 benefit.receipt = receipt
                 benefit.status = BenefitConsumptionStatus.RECONCILED
                 benefit.save(username=user.login_name)
+                reconciled.setdefault(previous_status, []).append(benefit.id)
                 bill = Bill.objects.filter(
                     benefitattachment__benefit=benefit,
                     is_deleted=False
@@ -88,6 +156,7 @@ class StrategyOnlinePayment(StrategyOfPaymentInterface):
                     cls._create_bill_payment_for_paid_bill(benefit, bill, user)
             except Exception as e:
                 logger.debug(f"Failed to approve benefit consumption {benefit.code}: {str(e)}")
+        cls._record_status_changes(reconciled, BenefitConsumptionStatus.RECONCILED)
 
     @classmethod
     def _create_bill_payment_for_paid_bill(cls, benefit, bill, user):
@@ -130,11 +199,10 @@ class StrategyOnlinePayment(StrategyOfPaymentInterface):
 
     @classmethod
     def _get_payroll_bills_amount(cls, payroll):
-        from payroll.models import Payroll
-        payroll_with_benefit_sum = Payroll.objects.filter(id=payroll.id).annotate(
-            total_benefit_amount=Sum('payrollbenefitconsumption__benefit__amount')
-        ).first()
-        return payroll_with_benefit_sum.total_benefit_amount
+        from payroll.models import PayrollBenefitTotal
+        return PayrollBenefitTotal.objects.filter(payroll_id=payroll.id).aggregate(
+            total_benefit_amount=Sum('total_amount')
+        )['total_benefit_amount']
 
     @classmethod
     def _get_benefits_to_string(cls, benefits):
@@ -144,16 +212,19 @@ class StrategyOnlinePayment(StrategyOfPaymentInterface):
 
     @classmethod
     def _send_payment_data_to_gateway(cls, payroll, user):
-        from payroll.models import BenefitConsumptionStatus
+        from payroll.models import BenefitConsumptionStatus, PaymentGatewayLog
+        from payroll.services import PaymentGatewayLogService
         benefits = cls.get_benefits_attached_to_payroll(payroll, BenefitConsumptionStatus.ACCEPTED)
-        payment_gateway_connector = cls.PAYMENT_GATEWAY
+        router = cls.get_payment_gateway_router(payroll.payment_point)
+        gateway_results = router.dispatch(router.partition(benefits), 'send_payment')
         benefits_to_approve = []
-        for benefit in benefits:
-            if payment_gateway_connector.send_payment(benefit.code, benefit.amount):
+        for benefit, is_sent in gateway_results:
+            if is_sent:
                 benefits_to_approve.append(benefit)
             else:
                 # Handle the case where a benefit payment is rejected
                 logger.info(f"Payment for benefit ({benefit.code}) was rejected.")
+        PaymentGatewayLogService.log(payroll, PaymentGatewayLog.Operation.PAYMENT, gateway_results)
         if benefits_to_approve:
             cls.approve_for_payment_benefit_consumption(benefits_to_approve, user)
 
@@ -164,12 +235,31 @@ class StrategyOnlinePayment(StrategyOfPaymentInterface):
 
     @classmethod
     def _save_payroll_data(cls, payroll, user, response_from_gateway):
+        from payroll.models import PaymentGatewayLog
+        from payroll.services import PaymentGatewayLogService
+        PaymentGatewayLogService.log_response(payroll, PaymentGatewayLog.Operation.CALLBACK, response_from_gateway)
         json_ext = payroll.json_ext if payroll.json_ext else {}
-        json_ext['response_from_gateway'] = response_from_gateway
+        json_ext.pop('response_from_gateway', None)
+        json_ext['gateway_log'] = PaymentGatewayLogService.get_summary(
+            PaymentGatewayLog.Operation.CALLBACK, response_from_gateway
+        )
         payroll.json_ext = json_ext
         payroll.save(username=user.username)
         cls._create_payroll_reconcilation_task(payroll, user)
 
+    @classmethod
+    def _has_pending_reconciliation_task(cls, payroll):
+        from django.contrib.contenttypes.models import ContentType
+        from payroll.apps import PayrollConfig
+        from tasks_management.models import Task
+        return Task.objects.filter(
+            entity_type=ContentType.objects.get_for_model(payroll),
+            entity_id=str(payroll.id),
+            business_event=PayrollConfig.payroll_reconciliation_event,
+            status__in=[Task.Status.RECEIVED, Task.Status.ACCEPTED],
+            is_deleted=False,
+        ).exists()
+
     @classmethod
     @register_service_signal('online_payments.create_task')
     def _create_payroll_reconcilation_task(cls, payroll, user):
@@ -1,9 +1,14 @@
+import datetime
 import logging
-from celery import shared_task
+from celery import chord, shared_task
+from django.core.cache import cache
+from django.db.models import Count, Sum
 
 from core.models import User
-from payroll.models import Payroll, PayrollStatus, BenefitConsumptionStatus
-from payroll.strategies import StrategyOnlinePayment
+from payroll.apps import PayrollConfig
+from payroll.indexing import bulk_index, deferred_indexing
+from payroll.models import Payroll, PayrollStatus, BenefitConsumption, BenefitConsumptionStatus, PaymentGatewayLog
+from payroll.strategies import StrategyOfPaymentInterface, StrategyOnlinePayment
 from payroll.payments_registry import PaymentMethodStorage
 
 logger = logging.getLogger(__name__)
@@ -12,41 +17,160 @@ logger = logging.getLogger(__name__)
 @shared_task
 def send_requests_to_gateway_payment(payroll_id, user_id):
     payroll = Payroll.objects.get(id=payroll_id)
-    strategy = PaymentMethodStorage.get_chosen_payment_method(payroll.payment_method)
+    strategy = PaymentMethodStorage.get_chosen_payment_method_with_gateway(
+        payroll.payment_method, payroll.payment_point
+    )
     if strategy:
         user = User.objects.get(id=user_id)
-        strategy.initialize_payment_gateway(payroll.payment_point)
         strategy.make_payment_for_payroll(payroll, user)
 
 
 @shared_task
 def send_request_to_reconcile(payroll_id, user_id):
+    from payroll.services import PaymentGatewayLogService
     payroll = Payroll.objects.get(id=payroll_id)
     user = User.objects.get(id=user_id)
     strategy = StrategyOnlinePayment
     strategy.initialize_payment_gateway(payroll.payment_point)
     strategy.change_status_of_payroll(payroll, PayrollStatus.RECONCILED, user)
     benefits = strategy.get_benefits_attached_to_payroll(payroll, BenefitConsumptionStatus.APPROVE_FOR_PAYMENT)
-    payment_gateway_connector = strategy.PAYMENT_GATEWAY
+    router = strategy.get_payment_gateway_router(payroll.payment_point)
+    gateway_results = router.dispatch(router.partition(benefits), 'reconcile')
     benefits_to_reconcile = []
-    for benefit in benefits:
-        is_reconciled = payment_gateway_connector.reconcile(benefit.code, benefit.amount)
-        # Initialize json_ext if it is None
-        if benefit.json_ext is None:
-            benefit.json_ext = {}
+    for benefit, is_reconciled in gateway_results:
+        # only a compact summary is kept on the benefit, the gateway output goes to the gateway log
+        benefit.json_ext = {
+            **(benefit.json_ext or {}),
+            'gateway_reconciliation_success': bool(is_reconciled),
+            'gateway_log': PaymentGatewayLogService.get_summary(PaymentGatewayLog.Operation.RECONCILIATION,
+                                                                is_reconciled),
+        }
         if is_reconciled:
-            new_json_ext = benefit.json_ext.copy() if benefit.json_ext else {}
-            new_json_ext['output_gateway'] = is_reconciled
-            new_json_ext['gateway_reconciliation_success'] = True
-            benefit.json_ext = {**benefit.json_ext, **new_json_ext}
             benefits_to_reconcile.append(benefit)
         else:
             # Handle the case where a benefit payment is rejected
-            new_json_ext = benefit.json_ext.copy() if benefit.json_ext else {}
-            new_json_ext['output_gateway'] = is_reconciled
-            new_json_ext['gateway_reconciliation_success'] = False
-            benefit.json_ext = {**benefit.json_ext, **new_json_ext}
             benefit.save(username=user.login_name)
             logger.info(f"Payment for benefit ({benefit.code}) was rejected.")
+    PaymentGatewayLogService.log(payroll, PaymentGatewayLog.Operation.RECONCILIATION, gateway_results)
     if benefits_to_reconcile:
         strategy.reconcile_benefit_consumption(benefits_to_reconcile, user)
+
+
+def dispatch_benefit_generation_shards(payroll_id, user_id, shards, date_from, date_to, task_data=None):
+    """
+    Run the payment plan calculation for every beneficiary shard on the celery workers
+    and merge the generated totals into the payroll once all shards are done.
+    ``task_data`` is the data of the accept payroll task created after the merge.
+    """
+    date_from = date_from.isoformat() if date_from else None
+    date_to = date_to.isoformat() if date_to else None
+    header = [
+        generate_benefits_for_shard.s(str(payroll_id), str(user_id), shard, date_from, date_to)
+        for shard in shards
+    ]
+    body = merge_benefit_generation_shards.s(str(payroll_id), str(user_id), task_data or {})
+    body.on_error(fail_benefit_generation.s(payroll_id=str(payroll_id), user_id=str(user_id)))
+    chord(header)(body)
+
+
+@shared_task
+@deferred_indexing()
+def generate_benefits_for_shard(payroll_id, user_id, beneficiary_ids, date_from, date_to):
+    from calculation.services import get_calculation_object
+    from social_protection.models import Beneficiary
+
+    payroll = Payroll.objects.get(id=payroll_id)
+    payment_plan = payroll.payment_plan
+    beneficiaries_queryset = Beneficiary.objects.filter(id__in=beneficiary_ids)
+    calculation = get_calculation_object(payment_plan.calculation)
+    calculation.calculate_if_active_for_object(
+        payment_plan,
+        user_id=user_id,
+        start_date=datetime.date.fromisoformat(date_from) if date_from else None,
+        end_date=datetime.date.fromisoformat(date_to) if date_to else None,
+        beneficiaries_queryset=beneficiaries_queryset,
+        payroll=payroll,
+        payment_cycle=payroll.payment_cycle
+    )
+    totals = BenefitConsumption.objects.filter(
+        payrollbenefitconsumption__payroll_id=payroll_id,
+        individual_id__in=beneficiaries_queryset.values('individual_id'),
+        is_deleted=False,
+    ).aggregate(benefits=Count('id'), amount=Sum('amount'))
+    return {'benefits': totals['benefits'], 'amount': str(totals['amount'] or 0)}
+
+
+@shared_task
+def merge_benefit_generation_shards(shard_results, payroll_id, user_id, task_data=None):
+    from decimal import Decimal
+    from payroll.services import PayrollBenefitTotalsService, PayrollService
+
+    payroll = Payroll.objects.get(id=payroll_id)
+    user = User.objects.get(id=user_id)
+    json_ext = payroll.json_ext if payroll.json_ext else {}
+    json_ext['benefit_generation'] = {
+        'shards': len(shard_results),
+        'benefits': sum(result['benefits'] for result in shard_results),
+        'amount': str(sum(Decimal(result['amount']) for result in shard_results)),
+    }
+    payroll.json_ext = json_ext
+    payroll.save(username=user.username)
+    PayrollBenefitTotalsService.rebuild([payroll.id])
+    PayrollService(user).create_accept_payroll_task(payroll.id, task_data or {})
+    logger.info(f"Benefit generation for payroll {payroll_id} finished in {len(shard_results)} shards")
+
+
+@shared_task
+def fail_benefit_generation(request, exc, traceback, payroll_id=None, user_id=None):
+    """
+    Error callback of the shard chord. The benefits generated by the successful shards are removed
+    and the payroll is rejected, no accept task is created for it.
+    """
+    from payroll.services import PayrollBenefitTotalsService
+
+    logger.error(f"Benefit generation for payroll {payroll_id} failed: {exc}")
+    payroll = Payroll.objects.get(id=payroll_id)
+    user = User.objects.get(id=user_id)
+    json_ext = payroll.json_ext if payroll.json_ext else {}
+    json_ext['benefit_generation'] = {'failed': True, 'error': str(exc)}
+    payroll.json_ext = json_ext
+    payroll.save(username=user.username)
+    StrategyOfPaymentInterface.reject_payroll(payroll, user)
+    PayrollBenefitTotalsService.rebuild([payroll.id])
+
+
+@shared_task(bind=True, max_retries=None)
+def process_payroll_task_completion(self, task_id, business_event, status, entity_id, user_id):
+    """
+    Execute the payroll side effects of a completed task on a worker. The execution is keyed by the task id
+    and status: completions already executed are skipped, and a completion being executed by another worker
+    is retried once the short-lived execution lock expires or is released.
+    """
+    from payroll.signals import CompletedTask, get_task_completion_handlers
+
+    handler = get_task_completion_handlers().get(business_event)
+    if not handler:
+        return
+    done_key = f"payroll_task_completion:{task_id}:{status}"
+    lock_key = f"{done_key}:lock"
+    if cache.get(done_key):
+        logger.info(f"Completion of task {task_id} ({status}) already processed, skipping")
+        return
+    lock_timeout = PayrollConfig.task_completion_lock_timeout
+    if not cache.add(lock_key, True, lock_timeout):
+        logger.info(f"Completion of task {task_id} ({status}) is being processed, retrying later")
+        raise self.retry(countdown=lock_timeout)
+    try:
+        handler(CompletedTask(task_id, business_event, status, entity_id, user_id))
+        cache.set(done_key, True, PayrollConfig.task_completion_execution_key_timeout)
+    finally:
+        cache.delete(lock_key)
+
+
+@shared_task
+def flush_deferred_index(pending):
+    from django.apps import apps
+
+    bulk_index({apps.get_model(model_label): ids for model_label, ids in pending.items()})
+    for model_label, ids in pending.items():
+        logger.info(f"Bulk indexed {len(ids)} {model_label} documents")
@@ -2,3 +2,20 @@
 
 from payroll.tests.payment_point_gql_tests import PaymentPointGQLTestCase
 from payroll.tests.payroll_gql_tests import PayrollGQLTestCase
+from payroll.tests.utils_tests import ChunkedIterableTest
+from payroll.tests.payroll_benefit_totals_tests import PayrollBenefitTotalsServiceTest
+from payroll.tests.payments_registry_tests import PaymentsMethodRegistryTest
+from payroll.tests.payment_gateway_callback_tests import PaymentGatewayCallbackServiceTest
+from payroll.tests.validation_tests import PayrollValidationTest
+from payroll.tests.benefit_generation_tests import BenefitGenerationShardsTest
+from payroll.tests.indexing_tests import PayrollIndexChangesTest
+from payroll.tests.bulk_services_tests import PayrollBulkServiceTest
+from payroll.tests.idempotent_callback_tests import IdempotentGatewayCallbackTest
+from payroll.tests.task_completion_tests import PayrollTaskCompletionTest
+from payroll.tests.deferred_indexing_tests import DeferredIndexingTest, FlushDeferredIndexTest
+from payroll.tests.gql_pagination_tests import KeysetPaginationGQLTestCase
+from payroll.tests.reconciliation_export_tests import ReconciliationExportTest
+from payroll.tests.reconciliation_upload_tests import ReconciliationUploadTest
+from payroll.tests.parquet_reconciliation_tests import ParquetReconciliationTest
+from payroll.tests.benefits_summary_tests import BenefitsSummaryServiceTest
+from payroll.tests.benefit_batch_delete_tests import BenefitBatchDeleteTest
@@ -0,0 +1,113 @@
+import copy
+from unittest import mock
+
+from django.test import TestCase
+
+from core.test_helpers import LogInHelper
+from individual.models import Individual
+from individual.tests.data import service_add_individual_payload
+from payroll.apps import PayrollConfig
+from payroll.models import BenefitConsumption, BenefitConsumptionStatus, Payroll
+from payroll.services import BenefitConsumptionService, PayrollService
+from payroll.signals import CompletedTask, on_delete_benefit_batch_task
+from payroll.tests.data import benefit_consumption_data_test
+from tasks_management.models import Task
+
+
+class BenefitBatchDeleteTest(TestCase):
+    user = None
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = LogInHelper().get_or_create_user_api()
+        cls.individual = Individual(**service_add_individual_payload)
+        cls.individual.save(username=cls.user.username)
+
+    def setUp(self):
+        self.payrolls = []
+        for number in range(2):
+            payroll = Payroll(name=f"TestPayrollBatchDelete{number}")
+            payroll.save(username=self.user.username)
+            self.payrolls.append(payroll)
+        self.benefits = [self.__create_benefit(f"BC-BATCH-DELETE-{number}") for number in range(4)]
+        for benefit, payroll in zip(self.benefits, [self.payrolls[0], self.payrolls[0], self.payrolls[1]]):
+            PayrollService(self.user).attach_benefit_to_payroll(payroll.id, benefit.id)
+        self.ids = [benefit.id for benefit in self.benefits]
+        self.service = BenefitConsumptionService(self.user)
+
+    def test_delete_batch_creates_one_task_per_payroll(self):
+        result = self.service.delete_batch(self.ids)
+
+        self.assertTrue(result['success'])
+        tasks = Task.objects.filter(business_event=PayrollConfig.benefit_batch_delete_event, is_deleted=False)
+        self.assertEqual(
+            {task.entity_id: sorted(task.json_ext['benefit_ids']) for task in tasks},
+            {
+                str(self.payrolls[0].id): sorted(str(benefit.id) for benefit in self.benefits[:2]),
+                str(self.payrolls[1].id): [str(self.benefits[2].id)],
+            }
+        )
+        self.assertTrue(Task.objects.filter(
+            business_event=PayrollConfig.benefit_delete_event, entity_id=str(self.benefits[3].id)
+        ).exists())
+        self.assertEqual(len(result['data']['task_ids']), 3)
+        pending = BenefitConsumption.objects.filter(id__in=self.ids, status=BenefitConsumptionStatus.PENDING_DELETION)
+        self.assertEqual(pending.count(), 4)
+
+    def test_delete_batch_of_missing_benefit_changes_nothing(self):
+        result = self.service.delete_batch([*self.ids, '00000000-0000-0000-0000-000000000000'])
+
+        self.assertFalse(result['success'])
+        self.assertFalse(BenefitConsumption.objects.filter(
+            id__in=self.ids, status=BenefitConsumptionStatus.PENDING_DELETION
+        ).exists())
+        self.assertFalse(Task.objects.filter(business_event=PayrollConfig.benefit_batch_delete_event).exists())
+
+    def test_revert_pending_deletion(self):
+        self.service.delete_batch(self.ids)
+        self.service.revert_pending_deletion(self.ids[:2])
+
+        self.assertEqual(
+            set(BenefitConsumption.objects.filter(id__in=self.ids).values_list('id', 'status')),
+            {
+                (self.ids[0], BenefitConsumptionStatus.ACCEPTED),
+                (self.ids[1], BenefitConsumptionStatus.ACCEPTED),
+                (self.ids[2], BenefitConsumptionStatus.PENDING_DELETION),
+                (self.ids[3], BenefitConsumptionStatus.PENDING_DELETION),
+            }
+        )
+
+    def test_failed_batch_task_reverts_its_benefits(self):
+        self.service.delete_batch(self.ids)
+        task = Task.objects.get(business_event=PayrollConfig.benefit_batch_delete_event,
+                                entity_id=str(self.payrolls[1].id))
+
+        on_delete_benefit_batch_task(self.__completed(task, Task.Status.FAILED))
+
+        self.benefits[2].refresh_from_db()
+        self.assertEqual(self.benefits[2].status, BenefitConsumptionStatus.ACCEPTED)
+        self.benefits[0].refresh_from_db()
+        self.assertEqual(self.benefits[0].status, BenefitConsumptionStatus.PENDING_DELETION)
+
+    @mock.patch('payroll.signals.StrategyOfPaymentInterface.remove_benefits_from_payrolls')
+    def test_completed_batch_task_removes_its_benefits(self, remove_benefits_from_payrolls):
+        self.service.delete_batch(self.ids)
+        task = Task.objects.get(business_event=PayrollConfig.benefit_batch_delete_event,
+                                entity_id=str(self.payrolls[0].id))
+
+        on_delete_benefit_batch_task(self.__completed(task, Task.Status.COMPLETED))
+
+        remove_benefits_from_payrolls.assert_called_once()
+        self.assertEqual(sorted(remove_benefits_from_payrolls.call_args[0][0]),
+                         sorted(str(benefit.id) for benefit in self.benefits[:2]))
+
+    def __completed(self, task, status):
+        return CompletedTask(task.id, task.business_event, status, task.entity_id, self.user.id)
+
+    def __create_benefit(self, code):
+        payload = copy.deepcopy(benefit_consumption_data_test)
+        payload['code'] = code
+        benefit = BenefitConsumption(**payload, individual=self.individual)
+        benefit.save(username=self.user.username)
+        return benefit
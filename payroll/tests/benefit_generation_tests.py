@@ -0,0 +1,61 @@
+from unittest import mock
+
+from django.test import TestCase
+
+from core.test_helpers import LogInHelper
+from payroll.apps import PayrollConfig
+from payroll.models import Payroll, PayrollStatus
+from payroll.tasks import (
+    dispatch_benefit_generation_shards,
+    fail_benefit_generation,
+    merge_benefit_generation_shards,
+)
+from tasks_management.models import Task
+
+
+class BenefitGenerationShardsTest(TestCase):
+    user = None
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = LogInHelper().get_or_create_user_api()
+
+    def setUp(self):
+        self.payroll = Payroll(name="TestPayrollShards")
+        self.payroll.save(username=self.user.username)
+
+    @mock.patch('payroll.tasks.chord')
+    def test_dispatch_one_task_per_shard_with_error_callback(self, chord):
+        shards = [['b1', 'b2'], ['b3']]
+        dispatch_benefit_generation_shards(self.payroll.id, self.user.id, shards, None, None, {'name': 'x'})
+
+        header = chord.call_args[0][0]
+        self.assertEqual([signature.args[2] for signature in header], shards)
+        body = chord.return_value.call_args[0][0]
+        self.assertEqual(body.args, (str(self.payroll.id), str(self.user.id), {'name': 'x'}))
+        self.assertEqual(len(body.options['link_error']), 1)
+
+    def test_merge_creates_accept_task(self):
+        merge_benefit_generation_shards(
+            [{'benefits': 2, 'amount': '100.00'}, {'benefits': 1, 'amount': '50.00'}],
+            str(self.payroll.id), str(self.user.id), {'name': self.payroll.name}
+        )
+
+        self.payroll.refresh_from_db()
+        self.assertEqual(self.payroll.json_ext['benefit_generation'],
+                         {'shards': 2, 'benefits': 3, 'amount': '150.00'})
+        self.assertTrue(Task.objects.filter(
+            entity_id=str(self.payroll.id), business_event=PayrollConfig.payroll_accept_event
+        ).exists())
+
+    def test_failure_rejects_payroll_without_accept_task(self):
+        fail_benefit_generation(None, ValueError('shard failed'), None,
+                                payroll_id=str(self.payroll.id), user_id=str(self.user.id))
+
+        self.payroll.refresh_from_db()
+        self.assertEqual(self.payroll.status, PayrollStatus.REJECTED)
+        self.assertTrue(self.payroll.json_ext['benefit_generation']['failed'])
+        self.assertFalse(Task.objects.filter(
+            entity_id=str(self.payroll.id), business_event=PayrollConfig.payroll_accept_event
+        ).exists())
@@ -0,0 +1,83 @@
+import copy
+from decimal import Decimal
+from unittest import mock
+
+from django.core.cache import cache
+from django.db.models import Q
+from django.test import TestCase
+
+from core.test_helpers import LogInHelper
+from individual.models import Individual
+from individual.tests.data import service_add_individual_payload
+from payroll.models import BenefitConsumption, BenefitConsumptionStatus, Payroll
+from payroll.services import BenefitsSummaryService, PayrollBenefitTotalsService, PayrollService
+from payroll.tests.data import benefit_consumption_data_test
+
+
+class BenefitsSummaryServiceTest(TestCase):
+    user = None
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = LogInHelper().get_or_create_user_api()
+        cls.individual = Individual(**service_add_individual_payload)
+        cls.individual.save(username=cls.user.username)
+
+    def setUp(self):
+        cache.delete(BenefitsSummaryService.CACHE_VERSION_KEY)
+        self.payroll = Payroll(name="TestPayrollSummary")
+        self.payroll.save(username=self.user.username)
+        self.benefits = []
+        for number in range(2):
+            payload = copy.deepcopy(benefit_consumption_data_test)
+            payload['code'] = f"BC-SUMMARY-{number}"
+            benefit = BenefitConsumption(**payload, individual=self.individual)
+            benefit.save(username=self.user.username)
+            PayrollService(self.user).attach_benefit_to_payroll(self.payroll.id, benefit.id)
+            self.benefits.append(benefit)
+        PayrollBenefitTotalsService.rebuild([self.payroll.id])
+
+    def test_unfiltered_summary_reads_totals(self):
+        with mock.patch.object(BenefitsSummaryService, '_get_rows_from_benefits') as get_rows_from_benefits:
+            summary = BenefitsSummaryService.get_summary(
+                payroll_id=self.payroll.id, cache_key_data={'payroll': self.payroll.id}
+            )
+        get_rows_from_benefits.assert_not_called()
+        self.assertEqual(summary['total_amount_due'], Decimal('1000.00'))
+        self.assertEqual(summary['statuses'], [
+            {'status': BenefitConsumptionStatus.ACCEPTED, 'count': 2, 'amount': Decimal('1000.00')}
+        ])
+
+    def test_individual_summary_reads_benefits(self):
+        with mock.patch.object(BenefitsSummaryService, '_get_rows_from_totals') as get_rows_from_totals:
+            summary = BenefitsSummaryService.get_summary(
+                individual_id=self.individual.id, payroll_id=self.payroll.id,
+                cache_key_data={'individual': self.individual.id, 'payroll': self.payroll.id}
+            )
+        get_rows_from_totals.assert_not_called()
+        self.assertEqual(summary['total_amount_due'], Decimal('1000.00'))
+
+    def test_validity_filtered_summary_reads_benefits(self):
+        with mock.patch.object(BenefitsSummaryService, '_get_rows_from_totals') as get_rows_from_totals:
+            summary = BenefitsSummaryService.get_summary(
+                validity_filters=[Q(code=self.benefits[0].code)], payroll_id=self.payroll.id,
+                cache_key_data={'code': self.benefits[0].code, 'payroll': self.payroll.id}
+            )
+        get_rows_from_totals.assert_not_called()
+        self.assertEqual(summary['total_amount_due'], Decimal('500.00'))
+
+    def test_totals_change_bumps_cache_version(self):
+        cache_key_data = {'payroll': self.payroll.id}
+        BenefitsSummaryService.get_summary(payroll_id=self.payroll.id, cache_key_data=cache_key_data)
+        version = cache.get(BenefitsSummaryService.CACHE_VERSION_KEY)
+
+        BenefitConsumption.objects.filter(id=self.benefits[0].id).update(status=BenefitConsumptionStatus.RECONCILED)
+        PayrollBenefitTotalsService.record_status_change(
+            [self.benefits[0].id], BenefitConsumptionStatus.ACCEPTED, BenefitConsumptionStatus.RECONCILED
+        )
+
+        self.assertNotEqual(cache.get(BenefitsSummaryService.CACHE_VERSION_KEY), version)
+        summary = BenefitsSummaryService.get_summary(payroll_id=self.payroll.id, cache_key_data=cache_key_data)
+        self.assertEqual(summary['total_amount_received'], Decimal('500.00'))
+        self.assertEqual(summary['total_amount_due'], Decimal('500.00'))
@@ -0,0 +1,82 @@
+from unittest import mock
+
+from django.test import TestCase
+
+from core.signals import REGISTERED_SERVICE_SIGNALS
+from core.test_helpers import LogInHelper
+from payroll.apps import PayrollConfig
+from payroll.models import Payroll
+from payroll.services import PayrollService
+from tasks_management.models import Task, TaskGroup
+
+
+class PayrollBulkServiceTest(TestCase):
+    user = None
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = LogInHelper().get_or_create_user_api()
+
+    def setUp(self):
+        self.payrolls = []
+        for i in range(2):
+            payroll = Payroll(name=f"TestPayrollBulk{i}")
+            payroll.save(username=self.user.username)
+            self.payrolls.append(payroll)
+        self.ids = [payroll.id for payroll in self.payrolls]
+
+    def test_delete_bulk_creates_one_task_per_payroll(self):
+        result = PayrollService(self.user).delete_bulk(self.ids)
+
+        self.assertTrue(result['success'])
+        tasks = Task.objects.filter(business_event=PayrollConfig.payroll_delete_event,
+                                    entity_id__in=[str(id) for id in self.ids])
+        self.assertEqual(tasks.count(), 2)
+        self.assertTrue(all(task.status == Task.Status.RECEIVED for task in tasks))
+        self.assertEqual(tasks.first().history.count(), 1)
+
+    def test_bulk_tasks_are_assigned_to_task_group_of_source(self):
+        task_group = TaskGroup(code="payroll_reject_group", completion_policy=TaskGroup.TaskGroupCompletionPolicy.ANY,
+                               json_ext={'task_sources': ['payroll_reject']})
+        task_group.save(username=self.user.username)
+
+        PayrollService(self.user).reject_approved_payroll_bulk(self.ids)
+
+        tasks = Task.objects.filter(business_event=PayrollConfig.payroll_reject_event,
+                                    entity_id__in=[str(id) for id in self.ids])
+        self.assertEqual({(task.task_group_id, task.status) for task in tasks},
+                         {(task_group.id, Task.Status.ACCEPTED)})
+
+    def test_bulk_signal_is_sent_once_with_created_tasks(self):
+        received = []
+
+        def receiver(sender, **kwargs):
+            received.append(kwargs['result'])
+
+        signal = REGISTERED_SERVICE_SIGNALS['payroll_service.bulk_create_tasks'].after_service_signal
+        signal.connect(receiver)
+        try:
+            PayrollService(self.user).close_payroll_bulk(self.ids)
+        finally:
+            signal.disconnect(receiver)
+
+        self.assertEqual(len(received), 1)
+        self.assertEqual({task.entity_id for task in received[0]}, {str(id) for id in self.ids})
+
+    def test_missing_payroll_returns_error_without_tasks(self):
+        missing_id = 'a8bb2ba7-1a0c-4c4b-8d3b-4d4b3f4f1a11'
+        result = PayrollService(self.user).delete_bulk([*self.ids, missing_id])
+
+        self.assertFalse(result['success'])
+        self.assertFalse(Task.objects.filter(entity_id__in=[str(id) for id in self.ids]).exists())
+
+    @mock.patch('payroll.services.group')
+    def test_make_payment_bulk_dispatches_one_group(self, group):
+        result = PayrollService(self.user).make_payment_for_payroll_bulk(self.ids)
+
+        self.assertTrue(result['success'])
+        group.assert_called_once()
+        signatures = list(group.call_args[0][0])
+        self.assertEqual({signature.args[0] for signature in signatures}, {str(id) for id in self.ids})
+        group.return_value.apply_async.assert_called_once()
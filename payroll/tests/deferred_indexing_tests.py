@@ -0,0 +1,84 @@
+from unittest import mock
+
+from django.test import TestCase
+
+from payroll.apps import PayrollConfig
+from payroll.indexing import deferred_indexing, is_indexing_deferred, register_for_indexing
+from payroll.models import BenefitConsumption, Payroll
+from payroll.tasks import flush_deferred_index
+
+
+@mock.patch('payroll.indexing.is_indexing_enabled', return_value=True)
+class DeferredIndexingTest(TestCase):
+
+    @mock.patch('payroll.indexing._schedule_flush')
+    def test_nested_blocks_are_flushed_once(self, schedule_flush, _):
+        with deferred_indexing():
+            register_for_indexing(Payroll, ['p1'])
+            with deferred_indexing():
+                register_for_indexing(Payroll, ['p2'])
+                register_for_indexing(BenefitConsumption, ['b1'])
+            schedule_flush.assert_not_called()
+            self.assertTrue(is_indexing_deferred())
+
+        self.assertFalse(is_indexing_deferred())
+        schedule_flush.assert_called_once_with({
+            Payroll._meta.label: {'p1', 'p2'},
+            BenefitConsumption._meta.label: {'b1'},
+        })
+
+    @mock.patch('payroll.indexing._schedule_flush')
+    def test_failed_block_is_not_flushed(self, schedule_flush, _):
+        with self.assertRaises(ValueError):
+            with deferred_indexing():
+                register_for_indexing(Payroll, ['p1'])
+                raise ValueError('failed')
+
+        self.assertFalse(is_indexing_deferred())
+        schedule_flush.assert_not_called()
+
+    @mock.patch('payroll.tasks.flush_deferred_index.delay')
+    def test_flush_is_scheduled_on_commit(self, delay, _):
+        with self.captureOnCommitCallbacks(execute=True):
+            with deferred_indexing():
+                register_for_indexing(Payroll, ['p1'])
+            delay.assert_not_called()
+
+        delay.assert_called_once_with({Payroll._meta.label: ['p1']})
+
+
+class FlushDeferredIndexTest(TestCase):
+
+    def setUp(self):
+        self.documents = {}
+
+    def test_refresh_is_disabled_once_above_threshold(self):
+        ids = [f'id{i}' for i in range(3)]
+        with mock.patch.object(PayrollConfig, 'opensearch_bulk_refresh_threshold', 3), \
+                mock.patch.object(PayrollConfig, 'opensearch_bulk_index_chunk_size', 2), \
+                mock.patch('payroll.indexing._get_document_classes', side_effect=self.__get_document_classes):
+            flush_deferred_index({Payroll._meta.label: ids})
+
+        document = self.documents[Payroll]
+        self.assertEqual(document.update.call_count, 2)
+        self.assertEqual(document._index.put_settings.call_args_list, [
+            mock.call(body={'index': {'refresh_interval': '-1'}}),
+            mock.call(body={'index': {'refresh_interval': None}}),
+        ])
+        document._index.refresh.assert_called_once()
+
+    def test_refresh_interval_is_kept_below_threshold(self):
+        with mock.patch.object(PayrollConfig, 'opensearch_bulk_refresh_threshold', 3), \
+                mock.patch('payroll.indexing._get_document_classes', side_effect=self.__get_document_classes):
+            flush_deferred_index({Payroll._meta.label: ['p1'], BenefitConsumption._meta.label: ['b1']})
+
+        for document in self.documents.values():
+            document.update.assert_called_once()
+            document._index.put_settings.assert_not_called()
+            document._index.refresh.assert_called_once()
+
+    def __get_document_classes(self, model):
+        document = mock.MagicMock()
+        document._index._name = model._meta.model_name
+        self.documents[model] = document
+        return [mock.Mock(return_value=document)]
@@ -0,0 +1,131 @@
+import copy
+from unittest import mock
+
+from graphene import Schema
+from graphene.test import Client
+from graphql_relay.utils import base64
+
+from core.apps import CoreConfig
+from core.models.openimis_graphql_test_case import openIMISGraphQLTestCase, BaseTestContext
+from core.test_helpers import create_admin_role, create_test_interactive_user
+from individual.models import Individual
+from individual.tests.data import service_add_individual_payload
+from payroll.models import BenefitConsumption, Payroll
+from payroll.schema import Query, Mutation
+from payroll.services import PayrollService
+from payroll.tests.data import benefit_consumption_data_test
+
+gql_benefit_consumption_by_payroll_keyset_query = """
+query q($payrollUuid: UUID!, $first: Int, $last: Int, $after: String, $totalCountMode: TotalCountModeEnum) {
+  benefitConsumptionByPayroll(
+    payrollUuid: $payrollUuid, keyset: true, first: $first, last: $last, after: $after,
+    totalCountMode: $totalCountMode
+  ) {
+    totalCount
+    pageInfo {
+      hasNextPage
+      hasPreviousPage
+      endCursor
+    }
+    edges {
+      cursor
+      node {
+        code
+      }
+    }
+  }
+}
+"""
+
+
+class KeysetPaginationGQLTestCase(openIMISGraphQLTestCase):
+    user = None
+    gql_client = None
+    gql_context = None
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = create_test_interactive_user(username='username_keyset', roles=[create_admin_role().id])
+        cls.gql_client = Client(Schema(query=Query, mutation=Mutation))
+        cls.gql_context = BaseTestContext(cls.user)
+        cls.individual = Individual(**service_add_individual_payload)
+        cls.individual.save(username=cls.user.username)
+
+    def setUp(self):
+        self.payroll = Payroll(name="TestPayrollKeyset")
+        self.payroll.save(username=self.user.username)
+        for number in range(3):
+            payload = copy.deepcopy(benefit_consumption_data_test)
+            payload['code'] = f"BC-KEYSET-{number}"
+            benefit = BenefitConsumption(**payload, individual=self.individual)
+            benefit.save(username=self.user.username)
+            PayrollService(self.user).attach_benefit_to_payroll(self.payroll.id, benefit.id)
+        self.codes_by_id = dict(BenefitConsumption.objects.filter(
+            code__startswith="BC-KEYSET-"
+        ).order_by('id').values_list('id', 'code'))
+
+    def test_pages_follow_primary_key(self):
+        expected = list(self.codes_by_id.values())
+
+        first_page = self.__query(first=2)
+        self.assertEqual(self.__codes(first_page), expected[:2])
+        self.assertEqual(first_page['totalCount'], 3)
+        self.assertTrue(first_page['pageInfo']['hasNextPage'])
+        self.assertFalse(first_page['pageInfo']['hasPreviousPage'])
+
+        second_page = self.__query(first=2, after=first_page['pageInfo']['endCursor'])
+        self.assertEqual(self.__codes(second_page), expected[2:])
+        self.assertFalse(second_page['pageInfo']['hasNextPage'])
+        self.assertTrue(second_page['pageInfo']['hasPreviousPage'])
+
+    def test_cursor_holds_prefixed_key(self):
+        page = self.__query(first=1)
+        first_id = next(iter(self.codes_by_id))
+        self.assertEqual(page['edges'][0]['cursor'], base64(f'keyset:{first_id}'))
+
+    def test_offset_cursor_is_rejected(self):
+        output = self.__execute(first=2, after=base64('arrayconnection:1'))
+        self.assertIn('Invalid keyset cursor', output['errors'][0]['message'])
+
+    def test_backward_pagination_is_rejected(self):
+        output = self.__execute(last=2)
+        self.assertIn("'last' and 'before' are not supported", output['errors'][0]['message'])
+
+    def test_skipped_total_count(self):
+        self.assertIsNone(self.__query(first=1, totalCountMode='SKIP')['totalCount'])
+
+    @mock.patch('payroll.gql_pagination.connections')
+    def test_approximate_count_falls_back_to_exact_count(self, connections):
+        connections.__getitem__.return_value.vendor = 'sqlite'
+        self.assertEqual(self.__query(first=1, totalCountMode='APPROXIMATE')['totalCount'], 3)
+
+    @mock.patch('core.data_masking.masking_decorator.MaskingClassStorage.get_masking_class')
+    def test_keyset_rows_are_masked(self, get_masking_class):
+        masking_class = get_masking_class.return_value
+        masking_class.masking_enabled = True
+        masking_class.apply_mask.side_effect = lambda node: setattr(node, 'code', '***')
+
+        def has_perms(user, perms, *args, **kwargs):
+            return perms != CoreConfig.gql_query_enable_viewing_masked_data_perms
+
+        with mock.patch.object(type(self.user), 'has_perms', autospec=True, side_effect=has_perms):
+            page = self.__query(first=2)
+
+        self.assertEqual(self.__codes(page), ['***', '***'])
+
+    def __query(self, **variables):
+        output = self.__execute(**variables)
+        self.assertIsNone(output.get('errors'))
+        return output['data']['benefitConsumptionByPayroll']
+
+    def __execute(self, **variables):
+        return self.gql_client.execute(
+            gql_benefit_consumption_by_payroll_keyset_query,
+            context=self.gql_context.get_request(),
+            variable_values={'payrollUuid': str(self.payroll.id), **variables},
+        )
+
+    @staticmethod
+    def __codes(page):
+        return [edge['node']['code'] for edge in page['edges']]
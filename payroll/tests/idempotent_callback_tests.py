@@ -0,0 +1,54 @@
+from django.core.cache import cache
+from django.test import RequestFactory, SimpleTestCase
+from rest_framework.response import Response
+
+from payroll.views import idempotent_gateway_callback
+
+
+class IdempotentGatewayCallbackTest(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        self.calls = 0
+        self.factory = RequestFactory()
+
+    def test_retry_returns_stored_response(self):
+        view = self.__view(lambda: Response({'success': True}, status=200))
+        view(self.__request('key-1'))
+        response = view(self.__request('key-1'))
+
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(response.data, {'success': True})
+
+    def test_key_is_released_when_view_raises(self):
+        def fail():
+            raise RuntimeError('worker failure')
+
+        with self.assertRaises(RuntimeError):
+            self.__view(fail)(self.__request('key-2'))
+        response = self.__view(lambda: Response({'success': True}, status=200))(self.__request('key-2'))
+
+        self.assertEqual(self.calls, 2)
+        self.assertEqual(response.status_code, 200)
+
+    def test_key_is_released_for_non_2xx_response(self):
+        self.__view(lambda: Response({'success': False}, status=400))(self.__request('key-3'))
+        response = self.__view(lambda: Response({'success': True}, status=200))(self.__request('key-3'))
+
+        self.assertEqual(self.calls, 2)
+        self.assertEqual(response.status_code, 200)
+
+    def test_request_in_progress_gets_conflict(self):
+        cache.add('payroll_gateway_callback:callback:gateway-1:key-4', {'in_progress': True}, 60)
+        response = self.__view(lambda: Response({'success': True}, status=200))(self.__request('key-4'))
+
+        self.assertEqual(self.calls, 0)
+        self.assertEqual(response.status_code, 409)
+
+    def __view(self, get_response):
+        def callback(request):
+            self.calls += 1
+            return get_response()
+        return idempotent_gateway_callback(callback)
+
+    def __request(self, key):
+        return self.factory.post('/', HTTP_IDEMPOTENCY_KEY=key, HTTP_X_GATEWAY_ID='gateway-1')
@@ -0,0 +1,68 @@
+from unittest import mock
+
+from django.test import TestCase
+
+from core.test_helpers import LogInHelper
+from payroll.indexing import (
+    capture_payroll_index_changes,
+    remember_payroll_indexed_values,
+    update_related_payroll_fields,
+)
+from payroll.models import Payroll, PayrollStatus
+
+
+class PayrollIndexChangesTest(TestCase):
+    user = None
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = LogInHelper().get_or_create_user_api()
+
+    def setUp(self):
+        self.payroll = Payroll(name="TestPayrollIndexing")
+        self.payroll.save(username=self.user.username)
+
+    def test_changes_are_compared_with_loaded_values(self):
+        payroll = Payroll.objects.get(id=self.payroll.id)
+        remember_payroll_indexed_values(Payroll, payroll)
+        payroll.name = "TestPayrollIndexingRenamed"
+        with self.assertNumQueries(0):
+            capture_payroll_index_changes(Payroll, payroll)
+        self.assertEqual(payroll._index_changes, {'name': "TestPayrollIndexingRenamed"})
+
+    def test_deferred_values_are_read_from_database(self):
+        payroll = Payroll.objects.only('id', 'name').get(id=self.payroll.id)
+        remember_payroll_indexed_values(Payroll, payroll)
+        payroll.status = PayrollStatus.APPROVE_FOR_PAYMENT
+        with self.assertNumQueries(1):
+            capture_payroll_index_changes(Payroll, payroll)
+        self.assertEqual(payroll._index_changes, {'status': PayrollStatus.APPROVE_FOR_PAYMENT})
+
+    def test_partial_update_falls_back_when_payroll_id_is_not_mapped(self):
+        document = self.__mock_document('payroll_not_mapped', mapped=False, updated=0)
+        self.payroll._index_changes = {'name': "Renamed"}
+        self.assertFalse(update_related_payroll_fields(document, self.payroll, mock.Mock()))
+        document._index.updateByQuery.assert_not_called()
+
+    def test_partial_update_falls_back_when_documents_are_missed(self):
+        document = self.__mock_document('payroll_missed', mapped=True, updated=1)
+        related = mock.Mock(**{'count.return_value': 3})
+        self.payroll._index_changes = {'name': "Renamed"}
+        self.assertFalse(update_related_payroll_fields(document, self.payroll, related))
+
+    def test_partial_update_of_all_documents(self):
+        document = self.__mock_document('payroll_updated', mapped=True, updated=3)
+        related = mock.Mock(**{'count.return_value': 3})
+        self.payroll._index_changes = {'name': "Renamed"}
+        self.assertTrue(update_related_payroll_fields(document, self.payroll, related))
+
+    def __mock_document(self, index_name, mapped, updated):
+        document = mock.MagicMock()
+        document._index._name = index_name
+        document._index.get_field_mapping.return_value = {
+            f'{index_name}-1': {'mappings': {'payroll.id': {'full_name': 'payroll.id'}} if mapped else {}}
+        }
+        document._index.updateByQuery.return_value.update_from_dict.return_value.script.return_value \
+            .params.return_value.execute.return_value = mock.Mock(updated=updated)
+        return document
@@ -0,0 +1,125 @@
+import copy
+import importlib.util
+import sys
+from decimal import Decimal
+from io import BytesIO
+from unittest import mock, skipUnless
+
+import pandas as pd
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase
+
+from core.test_helpers import LogInHelper
+from individual.models import Individual
+from individual.tests.data import service_add_individual_payload
+from payroll.apps import PayrollConfig
+from payroll.models import BenefitConsumption, BenefitConsumptionStatus, CsvReconciliationUpload, Payroll
+from payroll.services import CsvReconciliationService, PayrollService
+from payroll.tests.data import benefit_consumption_data_test
+from payroll.views import CSVReconciliationAPIView
+
+PYARROW_INSTALLED = importlib.util.find_spec('pyarrow') is not None
+
+
+class ParquetReconciliationTest(TestCase):
+    user = None
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = LogInHelper().get_or_create_user_api()
+        cls.individual = Individual(**service_add_individual_payload)
+        cls.individual.save(username=cls.user.username)
+
+    def setUp(self):
+        self.payroll = Payroll(name="TestPayrollParquet")
+        self.payroll.save(username=self.user.username)
+        payload = copy.deepcopy(benefit_consumption_data_test)
+        payload['code'] = "BC-PARQUET"
+        self.benefit = BenefitConsumption(**payload, individual=self.individual)
+        self.benefit.save(username=self.user.username)
+        PayrollService(self.user).attach_benefit_to_payroll(self.payroll.id, self.benefit.id)
+        self.service = CsvReconciliationService(self.user)
+
+    @skipUnless(PYARROW_INSTALLED, "pyarrow is not installed")
+    def test_round_trip_keeps_column_types(self):
+        import pyarrow
+        import pyarrow.parquet
+
+        exported = self.service.download_reconciliation(self.payroll.id, CsvReconciliationService.FORMAT_PARQUET)
+        exported.seek(0)
+        table = pyarrow.parquet.read_table(exported)
+        self.assertTrue(pyarrow.types.is_string(table.schema.field('Code').type))
+        self.assertTrue(pyarrow.types.is_string(table.schema.field('Paid').type))
+        self.assertEqual(table.schema.field('Amount').type, pyarrow.decimal128(18, 2))
+        self.assertTrue(pyarrow.types.is_string(table.schema.field('Status').type))
+
+        df = table.to_pandas()
+        df['Paid'] = 'Yes'
+        uploaded = BytesIO()
+        pyarrow.parquet.write_table(pyarrow.Table.from_pandas(df, preserve_index=False), uploaded)
+        file = SimpleUploadedFile('reconciliation.parquet', uploaded.getvalue())
+        __, errors, summary = self.service.upload_reconciliation(self.payroll.id, file, CsvReconciliationUpload())
+
+        self.assertIsNone(errors)
+        self.assertEqual(summary['affected_rows'], 1)
+        self.benefit.refresh_from_db()
+        self.assertEqual(self.benefit.status, BenefitConsumptionStatus.RECONCILED)
+
+    @skipUnless(PYARROW_INSTALLED, "pyarrow is not installed")
+    def test_result_file_of_several_chunks_keeps_first_chunk_schema(self):
+        import pyarrow
+        import pyarrow.parquet
+
+        self.benefit.amount = Decimal('123456.78')
+        self.benefit.save(username=self.user.username)
+        # the first chunk has a narrower amount and no value in the extra column
+        df = pd.DataFrame({
+            'Code': ['BC-PARQUET-MISSING', 'BC-PARQUET'],
+            'Status': ['ACCEPTED', 'ACCEPTED'],
+            'Amount': [Decimal('5.00'), Decimal('123456.78')],
+            'Receipt': ['R-1', 'R-2'],
+            'Paid': ['Yes', 'Yes'],
+            'Note': [None, 'paid in cash'],
+        })
+        uploaded = BytesIO()
+        pyarrow.parquet.write_table(pyarrow.Table.from_pandas(df, preserve_index=False), uploaded)
+        file = SimpleUploadedFile('reconciliation.parquet', uploaded.getvalue())
+
+        with mock.patch.object(PayrollConfig, 'csv_reconciliation_chunk_size', 1):
+            result_file, errors, summary = self.service.upload_reconciliation(
+                self.payroll.id, file, CsvReconciliationUpload()
+            )
+
+        self.assertEqual(errors, {'BC-PARQUET-MISSING': ['benefit_consumption_not_found']})
+        self.assertEqual(summary['affected_rows'], 1)
+        table = pyarrow.parquet.read_table(result_file)
+        self.assertEqual(table.schema.field('Amount').type, pyarrow.decimal128(18, 2))
+        self.assertEqual(table.column('Amount').to_pylist(), [Decimal('5.00'), Decimal('123456.78')])
+        self.assertEqual(table.column('Note').to_pylist(), [None, 'paid in cash'])
+
+    def test_missing_pyarrow_is_reported(self):
+        with mock.patch.dict(sys.modules, {'pyarrow': None, 'pyarrow.parquet': None}):
+            with self.assertRaisesMessage(ValueError, 'csv_reconciliation.validation.parquet_not_supported'):
+                self.service.download_reconciliation(self.payroll.id, CsvReconciliationService.FORMAT_PARQUET)
+
+            response = self.__get_blank_export(CsvReconciliationService.FORMAT_PARQUET)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['error'], 'csv_reconciliation.validation.parquet_not_supported')
+
+    @mock.patch.object(CsvReconciliationService, 'get_reconciliation_export')
+    def test_export_content_type(self, get_reconciliation_export):
+        get_reconciliation_export.return_value.get_file_response_csv.side_effect = lambda *args: HttpResponse()
+
+        response = self.__get_blank_export(CsvReconciliationService.FORMAT_PARQUET)
+        self.assertEqual(response['Content-Type'], 'application/vnd.apache.parquet')
+        response = self.__get_blank_export(CsvReconciliationService.FORMAT_CSV)
+        self.assertEqual(response['Content-Type'], 'text/csv')
+
+    def __get_blank_export(self, file_format):
+        request = RequestFactory().get('/', {
+            'payroll_id': str(self.payroll.id), 'blank': 'true', 'file_format': file_format
+        })
+        request.user = self.user
+        return CSVReconciliationAPIView().get(request)
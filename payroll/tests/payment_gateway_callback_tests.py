@@ -0,0 +1,103 @@
+import copy
+from datetime import timedelta
+
+from django.test import TestCase
+from django.utils import timezone
+
+from core.test_helpers import LogInHelper
+from individual.models import Individual
+from individual.tests.data import service_add_individual_payload
+from payroll.apps import PayrollConfig
+from payroll.models import (
+    BenefitConsumption,
+    BenefitConsumptionStatus,
+    Payroll,
+    PaymentGatewayCallback,
+    PaymentGatewayLog
+)
+from payroll.services import (
+    PaymentGatewayCallbackService,
+    PaymentGatewayLogService,
+    PayrollBenefitTotalsService,
+    PayrollService,
+)
+from payroll.tests.data import benefit_consumption_data_test
+from tasks_management.models import Task
+
+
+class PaymentGatewayCallbackServiceTest(TestCase):
+    user = None
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = LogInHelper().get_or_create_user_api()
+        cls.individual = cls.__create_test_individual()
+
+    def setUp(self):
+        self.payroll = Payroll(name="TestPayrollCallbacks")
+        self.payroll.save(username=self.user.username)
+        self.benefits = [self.__create_benefit(f"BC-CALLBACK-{i}") for i in range(2)]
+        for benefit in self.benefits:
+            PayrollService(self.user).attach_benefit_to_payroll(self.payroll.id, benefit.id)
+        PayrollBenefitTotalsService.rebuild([self.payroll.id])
+
+    def test_ingest_stores_results_and_rejects_failed_invoices(self):
+        payroll_id = str(self.payroll.id)
+        summary = PaymentGatewayCallbackService(self.user).ingest([
+            {'payroll_id': payroll_id, 'invoice_id': 'BC-CALLBACK-0', 'success': True},
+            {'payroll_id': payroll_id, 'invoice_id': 'BC-CALLBACK-1', 'success': False, 'response': {'code': 'E1'}},
+            {'payroll_id': payroll_id, 'invoice_id': 'BC-UNKNOWN', 'success': True},
+        ])
+
+        self.assertEqual(summary, {'received': 3, 'rejected': 1, 'unmatched': ['BC-UNKNOWN']})
+        self.assertEqual(PaymentGatewayCallback.objects.filter(payroll=self.payroll).count(), 3)
+        self.benefits[0].refresh_from_db()
+        self.benefits[1].refresh_from_db()
+        self.assertEqual(self.benefits[0].status, BenefitConsumptionStatus.APPROVE_FOR_PAYMENT)
+        self.assertEqual(self.benefits[1].status, BenefitConsumptionStatus.REJECTED)
+
+    def test_batches_of_a_payroll_share_one_pending_reconciliation_task(self):
+        self.payroll.payment_method = 'StrategyOnlinePayment'
+        self.payroll.save(username=self.user.username)
+        payroll_id = str(self.payroll.id)
+        for invoice_id in ('BC-CALLBACK-0', 'BC-CALLBACK-1'):
+            PaymentGatewayCallbackService(self.user).ingest([
+                {'payroll_id': payroll_id, 'invoice_id': invoice_id, 'success': True},
+            ])
+
+        self.assertEqual(Task.objects.filter(
+            entity_id=payroll_id, business_event=PayrollConfig.payroll_reconciliation_event
+        ).count(), 1)
+
+    def test_ingest_requires_known_payroll(self):
+        with self.assertRaises(ValueError):
+            PaymentGatewayCallbackService(self.user).ingest([
+                {'payroll_id': '00000000-0000-0000-0000-000000000000', 'invoice_id': 'BC-CALLBACK-0', 'success': True},
+            ])
+
+    def test_gateway_log_is_pruned_after_retention(self):
+        PaymentGatewayLogService.log(self.payroll, PaymentGatewayLog.Operation.PAYMENT,
+                                     [(benefit, True) for benefit in self.benefits])
+        PaymentGatewayLog.objects.filter(benefit=self.benefits[0]).update(
+            date_created=timezone.now() - timedelta(days=10)
+        )
+
+        removed = PaymentGatewayLogService.prune(timezone.now() - timedelta(days=5))
+
+        self.assertEqual(removed, 1)
+        self.assertEqual(PaymentGatewayLog.objects.filter(payroll=self.payroll).count(), 1)
+
+    def __create_benefit(self, code):
+        payload = copy.deepcopy(benefit_consumption_data_test)
+        payload['code'] = code
+        payload['status'] = BenefitConsumptionStatus.APPROVE_FOR_PAYMENT
+        benefit = BenefitConsumption(**payload, individual=self.individual)
+        benefit.save(username=self.user.username)
+        return benefit
+
+    @classmethod
+    def __create_test_individual(cls):
+        individual = Individual(**service_add_individual_payload)
+        individual.save(username=cls.user.username)
+        return individual
@@ -0,0 +1,28 @@
+from django.test import TestCase
+
+from payroll.payments_registry import PaymentsMethodRegistryPoint, PaymentMethodStorage
+from payroll.strategies import StrategyOfflinePayment, StrategyOnlinePayment
+
+
+class PaymentsMethodRegistryTest(TestCase):
+
+    def setUp(self):
+        self.registered_payment_methods = dict(PaymentsMethodRegistryPoint.REGISTERED_PAYMENT_METHODS)
+        PaymentsMethodRegistryPoint.REGISTERED_PAYMENT_METHODS.clear()
+
+    def tearDown(self):
+        PaymentsMethodRegistryPoint.REGISTERED_PAYMENT_METHODS.clear()
+        PaymentsMethodRegistryPoint.REGISTERED_PAYMENT_METHODS.update(self.registered_payment_methods)
+
+    def test_register_payment_method_deduplicates_by_name(self):
+        PaymentsMethodRegistryPoint.register_payment_method([StrategyOfflinePayment(), StrategyOnlinePayment()])
+        online_payment = StrategyOnlinePayment()
+        PaymentsMethodRegistryPoint.register_payment_method([online_payment])
+
+        payment_methods = PaymentMethodStorage.get_all_available_payment_methods()
+        self.assertEqual(len(payment_methods), 2)
+        self.assertIs(PaymentMethodStorage.get_chosen_payment_method('StrategyOnlinePayment'), online_payment)
+
+    def test_get_chosen_payment_method_unknown_name(self):
+        PaymentsMethodRegistryPoint.register_payment_method([StrategyOfflinePayment()])
+        self.assertIsNone(PaymentMethodStorage.get_chosen_payment_method('StrategyMobilePayment'))
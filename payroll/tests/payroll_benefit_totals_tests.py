@@ -0,0 +1,101 @@
+import copy
+from decimal import Decimal
+from unittest import mock
+
+from django.test import TestCase
+
+from core.test_helpers import LogInHelper
+from individual.models import Individual
+from individual.tests.data import service_add_individual_payload
+from payroll.models import BenefitConsumption, BenefitConsumptionStatus, Payroll, PayrollBenefitTotal
+from payroll.services import PayrollBenefitTotalsService, PayrollService
+from payroll.tests.data import benefit_consumption_data_test
+
+
+class PayrollBenefitTotalsServiceTest(TestCase):
+    user = None
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = LogInHelper().get_or_create_user_api()
+        cls.individual = cls.__create_test_individual()
+
+    def setUp(self):
+        self.payroll = Payroll(name="TestPayrollTotals")
+        self.payroll.save(username=self.user.username)
+        self.benefits = [self.__create_benefit(f"BC-TOTALS-{i}") for i in range(3)]
+        for benefit in self.benefits:
+            PayrollService(self.user).attach_benefit_to_payroll(self.payroll.id, benefit.id)
+        PayrollBenefitTotalsService.rebuild([self.payroll.id])
+
+    def test_attachment_is_not_counted_before_rebuild(self):
+        payroll = Payroll(name="TestPayrollTotalsAttach")
+        payroll.save(username=self.user.username)
+        benefit = self.__create_benefit("BC-TOTALS-ATTACH")
+        PayrollService(self.user).attach_benefit_to_payroll(payroll.id, benefit.id)
+        self.assertEqual(PayrollBenefitTotalsService.get_totals(payroll_id=payroll.id), {})
+
+    def test_rebuild_counts_attached_benefits(self):
+        totals = PayrollBenefitTotalsService.get_totals(payroll_id=self.payroll.id)
+        self.assertEqual(totals[BenefitConsumptionStatus.ACCEPTED]['count'], 3)
+        self.assertEqual(totals[BenefitConsumptionStatus.ACCEPTED]['amount'], Decimal('1500.00'))
+
+    def test_status_change_moves_totals(self):
+        benefit_ids = [benefit.id for benefit in self.benefits[:2]]
+        BenefitConsumption.objects.filter(id__in=benefit_ids).update(status=BenefitConsumptionStatus.RECONCILED)
+        PayrollBenefitTotalsService.record_status_change(
+            benefit_ids, BenefitConsumptionStatus.ACCEPTED, BenefitConsumptionStatus.RECONCILED
+        )
+        totals = PayrollBenefitTotalsService.get_totals(payroll_id=self.payroll.id)
+        self.assertEqual(totals[BenefitConsumptionStatus.ACCEPTED]['count'], 1)
+        self.assertEqual(totals[BenefitConsumptionStatus.RECONCILED]['count'], 2)
+        self.assertEqual(totals[BenefitConsumptionStatus.RECONCILED]['amount'], Decimal('1000.00'))
+
+    def test_status_change_invalidates_summary_cache_once(self):
+        benefit_ids = [benefit.id for benefit in self.benefits]
+        BenefitConsumption.objects.filter(id__in=benefit_ids).update(status=BenefitConsumptionStatus.RECONCILED)
+        with mock.patch('payroll.services.BenefitsSummaryService.invalidate_cache') as invalidate_cache:
+            PayrollBenefitTotalsService.record_status_change(
+                benefit_ids, BenefitConsumptionStatus.ACCEPTED, BenefitConsumptionStatus.RECONCILED
+            )
+        invalidate_cache.assert_called_once()
+
+    def test_move_only_decrements_source_payroll(self):
+        target = Payroll(name="TestPayrollTotalsTarget")
+        target.save(username=self.user.username)
+        other = Payroll(name="TestPayrollTotalsOther")
+        other.save(username=self.user.username)
+        # the first benefit is also linked to another payroll, its totals must not change
+        PayrollService(self.user).attach_benefit_to_payroll(other.id, self.benefits[0].id)
+        PayrollBenefitTotalsService.rebuild([self.payroll.id, target.id, other.id])
+
+        PayrollService(self.user)._move_benefit_consumptions(target, self.payroll.id)
+
+        source_totals = PayrollBenefitTotalsService.get_totals(payroll_id=self.payroll.id)
+        self.assertEqual(source_totals.get(BenefitConsumptionStatus.ACCEPTED, {}).get('count', 0), 0)
+        target_totals = PayrollBenefitTotalsService.get_totals(payroll_id=target.id)
+        self.assertEqual(target_totals[BenefitConsumptionStatus.ACCEPTED]['count'], 3)
+        self.assertEqual(target_totals[BenefitConsumptionStatus.ACCEPTED]['amount'], Decimal('1500.00'))
+        other_totals = PayrollBenefitTotalsService.get_totals(payroll_id=other.id)
+        self.assertEqual(other_totals[BenefitConsumptionStatus.ACCEPTED]['count'], 1)
+        self.assertEqual(other_totals[BenefitConsumptionStatus.ACCEPTED]['amount'], Decimal('500.00'))
+
+    def test_rebuild_fixes_drift(self):
+        PayrollBenefitTotal.objects.filter(payroll_id=self.payroll.id).update(benefit_count=42)
+        PayrollBenefitTotalsService.rebuild([self.payroll.id])
+        totals = PayrollBenefitTotalsService.get_totals(payroll_id=self.payroll.id)
+        self.assertEqual(totals[BenefitConsumptionStatus.ACCEPTED]['count'], 3)
+
+    def __create_benefit(self, code):
+        payload = copy.deepcopy(benefit_consumption_data_test)
+        payload['code'] = code
+        benefit = BenefitConsumption(**payload, individual=self.individual)
+        benefit.save(username=self.user.username)
+        return benefit
+
+    @classmethod
+    def __create_test_individual(cls):
+        individual = Individual(**service_add_individual_payload)
+        individual.save(username=cls.user.username)
+        return individual
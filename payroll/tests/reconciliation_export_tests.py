@@ -0,0 +1,102 @@
+import copy
+import shutil
+import tempfile
+from io import BytesIO
+from unittest import mock
+
+from django.core.files.storage import default_storage
+from django.test import TestCase, override_settings
+
+from core.test_helpers import LogInHelper
+from individual.models import Individual
+from individual.tests.data import service_add_individual_payload
+from payroll.apps import PayrollConfig
+from payroll.models import BenefitConsumption, Payroll
+from payroll.services import CsvReconciliationService, PayrollService
+from payroll.tests.data import benefit_consumption_data_test
+
+
+class ReconciliationExportTest(TestCase):
+    user = None
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = LogInHelper().get_or_create_user_api()
+        cls.individual = Individual(**service_add_individual_payload)
+        cls.individual.save(username=cls.user.username)
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        media_root_override = override_settings(MEDIA_ROOT=self.media_root)
+        media_root_override.enable()
+        self.addCleanup(media_root_override.disable)
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+
+        self.payroll = Payroll(name="TestPayrollExport")
+        self.payroll.save(username=self.user.username)
+        payload = copy.deepcopy(benefit_consumption_data_test)
+        payload['code'] = "BC-EXPORT"
+        self.benefit = BenefitConsumption(**payload, individual=self.individual)
+        self.benefit.save(username=self.user.username)
+        PayrollService(self.user).attach_benefit_to_payroll(self.payroll.id, self.benefit.id)
+        self.service = CsvReconciliationService(self.user)
+
+    @mock.patch.object(CsvReconciliationService, 'download_reconciliation', side_effect=lambda *args: BytesIO(b'a,b'))
+    def test_export_is_generated_once_per_version(self, download_reconciliation):
+        first = self.service.get_reconciliation_export(self.payroll.id)
+        self.assertEqual(download_reconciliation.call_count, 1)
+        self.assertTrue(default_storage.exists(first.file_path))
+
+        cached = self.service.get_reconciliation_export(self.payroll.id)
+        self.assertEqual(download_reconciliation.call_count, 1)
+        self.assertEqual(cached.file_path, first.file_path)
+
+    @mock.patch.object(CsvReconciliationService, 'download_reconciliation', side_effect=lambda *args: BytesIO(b'a,b'))
+    def test_changed_benefit_replaces_export(self, download_reconciliation):
+        first = self.service.get_reconciliation_export(self.payroll.id)
+
+        self.benefit.amount = 42
+        self.benefit.save(username=self.user.username)
+        second = self.service.get_reconciliation_export(self.payroll.id)
+
+        self.assertEqual(download_reconciliation.call_count, 2)
+        self.assertNotEqual(second.file_path, first.file_path)
+        self.assertFalse(default_storage.exists(first.file_path))
+        directory = PayrollConfig.get_payroll_payment_file_path(
+            self.payroll.id, CsvReconciliationService.EXPORT_DIRECTORY
+        )
+        self.assertEqual(default_storage.listdir(directory)[1], [second.file_path.rsplit('/', 1)[1]])
+
+    def test_export_stored_by_concurrent_request_is_served(self):
+        concurrent_requests = []
+
+        def download_reconciliation(payroll_id, file_format):
+            if not concurrent_requests:
+                # a concurrent request stores the same version while this one generates it
+                concurrent_requests.append(self.service.get_reconciliation_export(payroll_id, file_format))
+                return BytesIO(b'late')
+            return BytesIO(b'concurrent')
+
+        with mock.patch.object(CsvReconciliationService, 'download_reconciliation',
+                               side_effect=download_reconciliation):
+            export = self.service.get_reconciliation_export(self.payroll.id)
+
+        self.assertEqual(export.file_path, concurrent_requests[0].file_path)
+        self.assertEqual(export.get_file_content(), b'concurrent')
+        directory = PayrollConfig.get_payroll_payment_file_path(
+            self.payroll.id, CsvReconciliationService.EXPORT_DIRECTORY
+        )
+        self.assertEqual(len(default_storage.listdir(directory)[1]), 1)
+
+    @mock.patch.object(CsvReconciliationService, 'download_reconciliation', side_effect=lambda *args: BytesIO(b'a,b'))
+    def test_failed_save_keeps_previous_export(self, download_reconciliation):
+        first = self.service.get_reconciliation_export(self.payroll.id)
+
+        self.benefit.amount = 42
+        self.benefit.save(username=self.user.username)
+        with mock.patch('payroll.services.DefaultStorageFileHandler.save_file', side_effect=OSError('disk full')):
+            with self.assertRaises(OSError):
+                self.service.get_reconciliation_export(self.payroll.id)
+
+        self.assertTrue(default_storage.exists(first.file_path))
@@ -0,0 +1,71 @@
+import copy
+from unittest import mock
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase
+
+from core.test_helpers import LogInHelper
+from individual.models import Individual
+from individual.tests.data import service_add_individual_payload
+from payroll.apps import PayrollConfig
+from payroll.models import BenefitConsumption, BenefitConsumptionStatus, CsvReconciliationUpload, Payroll
+from payroll.services import CsvReconciliationService, PayrollBenefitTotalsService, PayrollService
+from payroll.tests.data import benefit_consumption_data_test
+
+
+class ReconciliationUploadTest(TestCase):
+    user = None
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = LogInHelper().get_or_create_user_api()
+        cls.individual = Individual(**service_add_individual_payload)
+        cls.individual.save(username=cls.user.username)
+
+    def setUp(self):
+        self.payroll = Payroll(name="TestPayrollUpload")
+        self.payroll.save(username=self.user.username)
+        self.benefits = []
+        for number in range(3):
+            payload = copy.deepcopy(benefit_consumption_data_test)
+            payload['code'] = f"BC-UPLOAD-{number}"
+            benefit = BenefitConsumption(**payload, individual=self.individual)
+            benefit.save(username=self.user.username)
+            PayrollService(self.user).attach_benefit_to_payroll(self.payroll.id, benefit.id)
+            self.benefits.append(benefit)
+        PayrollBenefitTotalsService.rebuild([self.payroll.id])
+        self.service = CsvReconciliationService(self.user)
+        self.upload = CsvReconciliationUpload()
+
+    def test_rows_are_reconciled_by_chunk(self):
+        rows = [(benefit.code, 'ACCEPTED', 'Yes') for benefit in self.benefits]
+        rows.append(('BC-UPLOAD-MISSING', 'ACCEPTED', 'Yes'))
+        with mock.patch.object(PayrollConfig, 'csv_reconciliation_chunk_size', 2), \
+                mock.patch.object(PayrollBenefitTotalsService, 'record_status_change',
+                                  wraps=PayrollBenefitTotalsService.record_status_change) as record_status_change:
+            __, errors, summary = self.service.upload_reconciliation(self.payroll.id, self.__file(rows), self.upload)
+
+        self.assertEqual(record_status_change.call_count, 2)
+        self.assertEqual(summary, {'affected_rows': 3, 'total_number_of_benefits_in_file': 4, 'skipped_items': 1})
+        self.assertEqual(errors, {'BC-UPLOAD-MISSING': ['benefit_consumption_not_found']})
+        self.assertEqual(
+            BenefitConsumption.objects.filter(
+                code__startswith="BC-UPLOAD-", status=BenefitConsumptionStatus.RECONCILED
+            ).count(), 3
+        )
+        totals = PayrollBenefitTotalsService.get_totals(payroll_id=self.payroll.id)
+        self.assertEqual(totals[BenefitConsumptionStatus.RECONCILED]['count'], 3)
+
+    def test_all_reconciled_file_is_rejected(self):
+        rows = [(benefit.code, 'RECONCILED', 'Yes') for benefit in self.benefits]
+        with self.assertRaisesMessage(ValueError, "All of the Benefit Consumptions have been already reconciled."):
+            self.service.upload_reconciliation(self.payroll.id, self.__file(rows), self.upload)
+
+    def test_empty_file_is_rejected(self):
+        with self.assertRaisesMessage(ValueError, "Import file is empty"):
+            self.service.upload_reconciliation(self.payroll.id, self.__file([]), self.upload)
+
+    def __file(self, rows):
+        lines = ['Code,Status,Receipt,Paid'] + [f'{code},{status},R-{code},{paid}' for code, status, paid in rows]
+        return SimpleUploadedFile('reconciliation.csv', '\n'.join(lines).encode('utf-8'), content_type='text/csv')
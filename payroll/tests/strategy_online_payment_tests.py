@@ -1,8 +1,12 @@
+import threading
 from unittest.mock import patch, MagicMock
+from django.core.cache import cache
 from django.test import TestCase, override_settings
 
 from payroll.strategies.strategy_online_payment import StrategyOnlinePayment
+from payroll.payment_gateway.payment_gateway_config import PaymentGatewayConfig
 from payroll.payment_gateway.payment_gateway_connector import PaymentGatewayConnector
+from payroll.payment_gateway.payment_gateway_router import PaymentGatewayRouter
 from payroll.tests.helpers import PaymentPointHelper
 
 
@@ -40,13 +44,14 @@ class TestStrategyOnlinePayment(TestCase):
     @classmethod
     def setUpClass(cls):
         super().setUpClass()
-        StrategyOnlinePayment.PAYMENT_GATEWAY = None
+        StrategyOnlinePayment.reset_payment_gateways()
         cls.payment_point_helper = PaymentPointHelper()
         cls.mock_custom_payment_point = cls.payment_point_helper.get_or_create_payment_point_api()
         cls.mock_custom_payment_point.name = 'testPaymentPoint1'
 
     def setUp(self):
-        StrategyOnlinePayment.PAYMENT_GATEWAY = None
+        PaymentGatewayConfig.invalidate()
+        StrategyOnlinePayment.reset_payment_gateways()
 
     @patch('payroll.payment_gateway.payment_gateway_config.PayrollConfig')
     def test_initialize_payment_gateway_without_payment_point(self, mock_payroll_config):
@@ -82,3 +87,75 @@ class TestStrategyOnlinePayment(TestCase):
 
         # Verify that _send_payment_data_to_gateway was called with the right parameters
         mock_send_payment.assert_called_once_with(mock_payroll, mock_user)
+
+    @override_settings(PAYMENT_GATEWAYS=CUSTOM_PAYMENT_GATEWAYS)
+    def test_initialize_payment_gateway_reuses_connector(self):
+        StrategyOnlinePayment.initialize_payment_gateway(self.mock_custom_payment_point)
+        first_gateway = StrategyOnlinePayment.PAYMENT_GATEWAY
+
+        StrategyOnlinePayment.initialize_payment_gateway(self.mock_custom_payment_point)
+
+        self.assertIs(StrategyOnlinePayment.PAYMENT_GATEWAY, first_gateway)
+
+    @override_settings(PAYMENT_GATEWAYS={
+        'testPaymentPoint1': {**CUSTOM_PAYMENT_GATEWAYS['testPaymentPoint1'], 'payment_gateway_auth_type': 'basic',
+                              'payment_gateway_basic_auth_username': 'user',
+                              'payment_gateway_basic_auth_password': 'secret'}
+    })
+    def test_payment_gateway_config_is_memoized(self):
+        config = PaymentGatewayConfig.for_payment_point(self.mock_custom_payment_point)
+
+        self.assertIs(PaymentGatewayConfig.for_payment_point(self.mock_custom_payment_point), config)
+        self.assertEqual(config.get_headers()['Authorization'], 'Basic dXNlcjpzZWNyZXQ=')
+        with self.assertRaises(AttributeError):
+            config.api_key = 'changed'
+
+        PaymentGatewayConfig.invalidate()
+        self.assertIsNot(PaymentGatewayConfig.for_payment_point(self.mock_custom_payment_point), config)
+
+    @override_settings(PAYMENT_GATEWAYS=CUSTOM_PAYMENT_GATEWAYS)
+    @patch('payroll.payment_gateway.payment_gateway_config.PayrollConfig.reload_config')
+    def test_payment_gateway_config_follows_cached_version(self, mock_reload_config):
+        config = PaymentGatewayConfig.for_payment_point(self.mock_custom_payment_point)
+        StrategyOnlinePayment.initialize_payment_gateway(self.mock_custom_payment_point)
+        gateway = StrategyOnlinePayment.PAYMENT_GATEWAY
+
+        # another process invalidated the configurations
+        cache.set(PaymentGatewayConfig.VERSION_CACHE_KEY, 'other-process-version', None)
+
+        StrategyOnlinePayment.initialize_payment_gateway(self.mock_custom_payment_point)
+        self.assertIsNot(StrategyOnlinePayment.PAYMENT_GATEWAY, gateway)
+        self.assertIsNot(PaymentGatewayConfig.for_payment_point(self.mock_custom_payment_point), config)
+        mock_reload_config.assert_called_once()
+
+    @override_settings(PAYMENT_GATEWAYS={
+        **CUSTOM_PAYMENT_GATEWAYS,
+        'mobileGateway': {
+            'payment_gateway_class': 'payroll.tests.strategy_online_payment_tests.DefaultPaymentGatewayConnector',
+            'payment_gateway_max_workers': 2,
+        },
+    })
+    def test_router_dispatches_each_partition_to_its_gateway(self):
+        benefits = [MagicMock(code=f"BC-{i}", amount=100) for i in range(3)]
+        router = StrategyOnlinePayment.get_payment_gateway_router(self.mock_custom_payment_point)
+
+        results = router.dispatch({
+            PaymentGatewayRouter.DEFAULT_GATEWAY: benefits[:1],
+            'mobileGateway': benefits[1:],
+        }, 'send_payment')
+
+        self.assertEqual([benefit for benefit, __ in results], benefits)
+        self.assertEqual(results[0][1]['payment_id'], 'custom-123')
+        self.assertEqual([result['payment_id'] for __, result in results[1:]], ['default-123', 'default-123'])
+
+    @override_settings(PAYMENT_GATEWAYS=CUSTOM_PAYMENT_GATEWAYS)
+    def test_connector_session_is_per_thread(self):
+        connector = StrategyOnlinePayment.get_payment_gateway(self.mock_custom_payment_point)
+        sessions = []
+        thread = threading.Thread(target=lambda: sessions.append(connector.session))
+        thread.start()
+        thread.join()
+
+        self.assertIs(connector.session, connector.session)
+        self.assertIsNot(sessions[0], connector.session)
+        self.assertEqual(sessions[0].headers['Authorization'], 'Bearer custom-api-key')
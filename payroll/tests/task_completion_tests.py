@@ -0,0 +1,80 @@
+from unittest import mock
+
+from celery.exceptions import Retry
+from django.core.cache import cache
+from django.test import TestCase
+
+from payroll.apps import PayrollConfig
+from payroll.signals import get_task_completion_handlers, on_task_complete, on_accept_payroll_task
+from payroll.tasks import process_payroll_task_completion
+
+TASK_ID = '5c8e8a0e-3d4c-4a3c-9a8f-3f2e6a1b7c01'
+ENTITY_ID = '0f7d5a1e-5b3a-4c8e-8e0a-1d2c3b4a5f60'
+USER_ID = 'b1c2d3e4-f5a6-4b7c-8d9e-0a1b2c3d4e5f'
+EVENT = 'payroll.test_event'
+
+
+def _result(business_event=EVENT, status='COMPLETED'):
+    return {
+        'success': True,
+        'data': {
+            'task': {'id': TASK_ID, 'business_event': business_event, 'status': status, 'entity_id': ENTITY_ID},
+            'user': {'id': USER_ID},
+        },
+    }
+
+
+class PayrollTaskCompletionTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.handler = mock.Mock()
+        patcher = mock.patch('payroll.signals.get_task_completion_handlers', return_value={EVENT: self.handler})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_handlers_are_registered_per_business_event(self):
+        # imported before the patch of setUp, this is the actual dispatch table
+        handlers = get_task_completion_handlers()
+        self.assertIs(handlers[PayrollConfig.payroll_accept_event], on_accept_payroll_task)
+        self.assertEqual(len(handlers), 6)
+
+    def test_sync_completion_runs_handler(self):
+        with mock.patch.object(PayrollConfig, 'async_task_completion', False):
+            on_task_complete(result=_result())
+
+        completed_task = self.handler.call_args[0][0]
+        self.assertEqual((completed_task.id, completed_task.status, completed_task.entity_id),
+                         (TASK_ID, 'COMPLETED', ENTITY_ID))
+
+    def test_unknown_event_is_ignored(self):
+        on_task_complete(result=_result(business_event='other.event'))
+        self.handler.assert_not_called()
+
+    @mock.patch('payroll.signals.process_payroll_task_completion')
+    def test_async_completion_is_enqueued_after_commit(self, task):
+        with mock.patch.object(PayrollConfig, 'async_task_completion', True):
+            with self.captureOnCommitCallbacks(execute=True):
+                on_task_complete(result=_result())
+                task.delay.assert_not_called()
+
+        self.handler.assert_not_called()
+        task.delay.assert_called_once_with(TASK_ID, EVENT, 'COMPLETED', ENTITY_ID, USER_ID)
+
+    def test_completion_is_executed_once(self):
+        process_payroll_task_completion(TASK_ID, EVENT, 'COMPLETED', ENTITY_ID, USER_ID)
+        process_payroll_task_completion(TASK_ID, EVENT, 'COMPLETED', ENTITY_ID, USER_ID)
+        self.assertEqual(self.handler.call_count, 1)
+
+    def test_failed_completion_is_executed_again(self):
+        self.handler.side_effect = [RuntimeError('handler failure'), None]
+        with self.assertRaises(RuntimeError):
+            process_payroll_task_completion(TASK_ID, EVENT, 'COMPLETED', ENTITY_ID, USER_ID)
+        process_payroll_task_completion(TASK_ID, EVENT, 'COMPLETED', ENTITY_ID, USER_ID)
+        self.assertEqual(self.handler.call_count, 2)
+
+    def test_completion_in_progress_is_retried(self):
+        cache.add(f"payroll_task_completion:{TASK_ID}:COMPLETED:lock", True, 60)
+        with mock.patch.object(process_payroll_task_completion, 'retry', side_effect=Retry()):
+            with self.assertRaises(Retry):
+                process_payroll_task_completion(TASK_ID, EVENT, 'COMPLETED', ENTITY_ID, USER_ID)
+        self.handler.assert_not_called()
@@ -0,0 +1,16 @@
+from django.test import TestCase
+
+from payroll.utils import chunked_iterable
+
+
+class ChunkedIterableTest(TestCase):
+    def test_chunks_preserve_order_and_size(self):
+        chunks = list(chunked_iterable(range(7), 3))
+        self.assertEqual(chunks, [[0, 1, 2], [3, 4, 5], [6]])
+
+    def test_empty_iterable(self):
+        self.assertEqual(list(chunked_iterable([], 3)), [])
+
+    def test_generator_input(self):
+        chunks = list(chunked_iterable((i for i in range(4)), 2))
+        self.assertEqual(chunks, [[0, 1], [2, 3]])
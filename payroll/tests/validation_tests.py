@@ -0,0 +1,36 @@
+from django.test import TestCase
+
+from core.test_helpers import LogInHelper
+from invoice.models import Bill
+from payroll.models import Payroll
+from payroll.validation import validate_one_payroll_per_bill, validate_payroll_unique_name
+
+
+class PayrollValidationTest(TestCase):
+    user = None
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = LogInHelper().get_or_create_user_api()
+
+    def setUp(self):
+        self.payroll = Payroll(name="TestPayrollValidation")
+        self.payroll.save(username=self.user.username)
+
+    def test_unique_name(self):
+        self.assertEqual(len(validate_payroll_unique_name({'name': "TestPayrollValidation"})), 1)
+        self.assertEqual(validate_payroll_unique_name({'name': "TestPayrollValidationOther"}), [])
+
+    def test_unique_name_ignores_validated_payroll(self):
+        self.assertEqual(validate_payroll_unique_name({'name': "TestPayrollValidation"}, uuid=self.payroll.id), [])
+
+    def test_one_payroll_per_bill_without_bills(self):
+        self.assertEqual(validate_one_payroll_per_bill({'bills': []}), [])
+
+    def test_one_payroll_per_bill_with_empty_queryset(self):
+        bills = Bill.objects.filter(code="TestPayrollValidationMissingBill")
+        # a single exists() query, the bills are not loaded
+        with self.assertNumQueries(1):
+            self.assertEqual(validate_one_payroll_per_bill({'bills': bills}), [])
+        self.assertIsNone(bills._result_cache)
@@ -1,5 +1,8 @@
 import random
+from itertools import islice
+
 from django.apps import apps
+from django.db.models import F
 
 
 class CodeGenerator:
@@ -20,3 +23,42 @@ class CodeGenerator:
             return model.objects.filter(**{code_field_name: code}).exists()
         except model.DoesNotExist:
             return False
+
+
+def chunked_iterable(iterable, chunk_size):
+    """
+    Yield lists of at most ``chunk_size`` consecutive items of ``iterable``.
+    """
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, chunk_size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def update_in_chunks_with_history(model, ids, user, chunk_size, **values):
+    """
+    Apply ``values`` to the ``model`` rows identified by ``ids`` with one UPDATE statement per chunk
+    and write the corresponding historical records in bulk. Returns the number of updated rows.
+    """
+    from core import datetime
+    from payroll.indexing import register_for_indexing
+
+    updated = 0
+    now = datetime.datetime.now()
+    for chunk in chunked_iterable(ids, chunk_size):
+        updated += model.objects.filter(id__in=chunk).update(
+            **values,
+            user_updated=user,
+            date_updated=now,
+            version=F('version') + 1,
+        )
+        model.history.bulk_history_create(
+            list(model.objects.filter(id__in=chunk)),
+            update=True,
+            default_user=user,
+        )
+        # queryset updates do not send the signals the search index listens to
+        register_for_indexing(model, chunk)
+    return updated
@@ -1,8 +1,12 @@
 from django.core.exceptions import ValidationError
 from django.utils.translation import gettext as _
 
+from django.db.models import QuerySet
+
 from core.validation import BaseModelValidation
+from payroll.apps import PayrollConfig
 from payroll.models import PaymentPoint, Payroll, PayrollBill, BenefitConsumption
+from payroll.utils import chunked_iterable
 
 
 class PaymentPointValidation(BaseModelValidation):
@@ -58,22 +62,43 @@ def are_bills_in_data(data):
 
 def validate_one_payroll_per_bill(data):
     bills = data.get('bills', [])
-    query = PayrollBill.objects.filter(bill__in=bills, is_deleted=False)
-    if query.exists():
-        payroll_bill_ids = list(query.values_list('id', flat=True))
+    # querysets are checked with a single subquery without loading the bills, explicit lists with bounded IN lists
+    if isinstance(bills, QuerySet):
+        if not bills.exists():
+            return []
+        bill_chunks = [bills]
+    else:
+        if not bills:
+            return []
+        bill_chunks = chunked_iterable(bills, PayrollConfig.bulk_operation_chunk_size)
+    # the reported ids are capped, the payload of a conflicting bulk creation stays small
+    max_ids = PayrollConfig.validation_error_max_ids
+    payroll_bill_ids = []
+    for chunk in bill_chunks:
+        payroll_bill_ids += PayrollBill.objects.filter(
+            bill__in=chunk, is_deleted=False
+        ).values_list('id', flat=True)[:max_ids + 1 - len(payroll_bill_ids)]
+        if len(payroll_bill_ids) > max_ids:
+            break
+    if payroll_bill_ids:
+        reported_ids = ", ".join(str(payroll_bill_id) for payroll_bill_id in payroll_bill_ids[:max_ids])
+        if len(payroll_bill_ids) > max_ids:
+            reported_ids += ", ..."
         return [{"message": _("payroll.validation.payroll.bill_already_assigned") % {
-            "bill_ids": payroll_bill_ids,
+            "bill_ids": reported_ids,
         }}]
     return []
 
 
 def validate_payroll_unique_name(data, uuid=None):
     name = data.get("name")
-    instance = Payroll.objects.filter(name=name, is_deleted=False).first()
-    if instance and instance.uuid != uuid:
-        return [{"message": _("payroll.validation.payroll.name_exists" % {  # noqa: F504
+    query = Payroll.objects.filter(name=name, is_deleted=False)
+    if uuid:
+        query = query.exclude(id=uuid)
+    if query.exists():
+        return [{"message": _("payroll.validation.payroll.name_exists") % {
             'name': name
-        })}]
+        }}]
     return []
 
 
@@ -1,5 +1,7 @@
+import functools
 import logging
 
+from django.core.cache import cache
 from django.db import transaction
 from rest_framework import views
 from rest_framework.decorators import api_view, permission_classes
@@ -10,13 +12,48 @@ from core.views import check_user_rights
 from payroll.apps import PayrollConfig
 from payroll.models import Payroll, CsvReconciliationUpload
 from payroll.payments_registry import PaymentMethodStorage
-from payroll.services import CsvReconciliationService
+from payroll.services import CsvReconciliationService, PaymentGatewayCallbackService
 
 logger = logging.getLogger(__name__)
 
 
+def idempotent_gateway_callback(view):
+    """
+    Deduplicate gateway callbacks sent with an `Idempotency-Key` header. The key is scoped by the gateway
+    (`X-Gateway-Id` header, or the authenticated user) and the outcome is kept in the Django cache, so a retried
+    request returns the original response without being processed again. Only successful responses are stored,
+    the short-lived in progress marker is removed when the request fails so that it can be retried.
+    """
+    @functools.wraps(view)
+    def wrapper(request, *args, **kwargs):
+        request_key = request.headers.get('Idempotency-Key')
+        if not request_key:
+            return view(request, *args, **kwargs)
+        gateway = request.headers.get('X-Gateway-Id') or request.user.id
+        cache_key = f"payroll_gateway_callback:{view.__name__}:{gateway}:{request_key}"
+        if not cache.add(cache_key, {'in_progress': True}, PayrollConfig.gateway_callback_in_progress_timeout):
+            stored = cache.get(cache_key) or {'in_progress': True}
+            if stored.get('in_progress'):
+                return Response({'success': False, 'error': 'Request with this idempotency key is in progress'},
+                                status=409)
+            return Response(stored['data'], status=stored['status'])
+        stored = False
+        try:
+            response = view(request, *args, **kwargs)
+            if 200 <= response.status_code < 300:
+                cache.set(cache_key, {'in_progress': False, 'data': response.data, 'status': response.status_code},
+                          PayrollConfig.gateway_callback_idempotency_timeout)
+                stored = True
+            return response
+        finally:
+            if not stored:
+                cache.delete(cache_key)
+    return wrapper
+
+
 @api_view(["POST"])
 @permission_classes([check_user_rights(PayrollConfig.gql_payroll_create_perms, )])
+@idempotent_gateway_callback
 def send_callback_to_openimis(request):
     try:
         user = request.user
@@ -41,6 +78,23 @@ def send_callback_to_openimis(request):
         return Response({'success': False, 'error': str(exc)}, status=500)
 
 
+@api_view(["POST"])
+@permission_classes([check_user_rights(PayrollConfig.gql_payroll_create_perms, )])
+@idempotent_gateway_callback
+def send_batch_callback_to_openimis(request):
+    try:
+        if not isinstance(request.data, dict):
+            raise ValueError('payment_gateway_callback.validation.results_required')
+        summary = PaymentGatewayCallbackService(request.user).ingest(request.data.get('results'))
+        return Response({'success': True, 'error': None, **summary}, status=201)
+    except ValueError as exc:
+        logger.error("Error while sending batch callback to openIMIS", exc_info=exc)
+        return Response({'success': False, 'error': str(exc)}, status=400)
+    except Exception as exc:
+        logger.error("Unexpected error while sending batch callback to openIMIS", exc_info=exc)
+        return Response({'success': False, 'error': str(exc)}, status=500)
+
+
 def _resolve_send_callback_to_imis_args(request):
     payroll_id = request.data.get('payroll_id')
     response_from_gateway = request.data.get('response_from_gateway')
@@ -57,6 +111,10 @@ def _resolve_send_callback_to_imis_args(request):
 
 class CSVReconciliationAPIView(views.APIView):
     permission_classes = [check_user_rights(PayrollConfig.gql_csv_reconciliation_create_perms, )]
+    content_types = {
+        CsvReconciliationService.FORMAT_CSV: 'text/csv',
+        CsvReconciliationService.FORMAT_PARQUET: 'application/vnd.apache.parquet',
+    }
 
     def get(self, request):
         try:
@@ -65,11 +123,12 @@ class CSVReconciliationAPIView(views.APIView):
             get_blank_bool = get_blank.lower() == 'true'
 
             if get_blank_bool:
+                # `format` is reserved by the rest framework content negotiation
+                file_format = CsvReconciliationService.get_file_format(file_format=request.GET.get('file_format'))
                 service = CsvReconciliationService(request.user)
-                in_memory_file = service.download_reconciliation(payroll_id)
-                response = Response(headers={'Content-Disposition': 'attachment; filename="reconciliation.csv"'},
-                                    content_type='text/csv')
-                response.content = in_memory_file.getvalue()
+                file_handler = service.get_reconciliation_export(payroll_id, file_format)
+                response = file_handler.get_file_response_csv(f"reconciliation.{file_format}")
+                response['Content-Type'] = self.content_types[file_format]
                 return response
             else:
                 file_name = request.GET.get('payroll_file_name')
@@ -98,7 +157,8 @@ class CSVReconciliationAPIView(views.APIView):
             file_handler = DefaultStorageFileHandler(target_file_path)
             file_handler.check_file_path()
             service = CsvReconciliationService(request.user)
-            file_to_upload, errors, summary = service.upload_reconciliation(payroll_id, file, upload)
+            file_to_upload, errors, summary = service.upload_reconciliation(
+                payroll_id, file, upload, request.GET.get('file_format'))
             if errors:
                 upload.status = CsvReconciliationUpload.Status.PARTIAL_SUCCESS
                 upload.error = errors
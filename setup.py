@@ -29,6 +29,9 @@ setup(
         'openimis-be-invoice',
         'openimis-be-payment_cycle',
     ],
+    extras_require={
+        'parquet': ['pyarrow'],
+    },
     classifiers=[
         'Environment :: Web Environment',
         'Framework :: Django',